@@ -0,0 +1,89 @@
+"""
+Benchmark du coût par écriture de la sélection des comptes
+
+Compare l'ancienne approche (reconstruction du plan comptable et filtrage
+par startswith à chaque écriture) avec l'index précalculé AccountIndex.
+
+Usage:
+    python benchmarks/bench_account_index.py [--entries 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.accounting_data import AccountingData
+
+
+def _legacy_relevant_accounts(journal_code):
+    """Réplique de l'ancienne implémentation (plan reconstruit à chaque appel)"""
+    plan_comptable = AccountingData.get_plan_comptable()
+    if journal_code == "AC":
+        return [acc for acc in plan_comptable.keys() if acc.startswith(("60", "61", "62", "401"))]
+    elif journal_code == "VE":
+        return [acc for acc in plan_comptable.keys() if acc.startswith(("41", "70"))]
+    elif journal_code == "BQ":
+        return [acc for acc in plan_comptable.keys() if acc.startswith(("5", "40", "41", "6", "7"))]
+    else:
+        return list(plan_comptable.keys())
+
+
+def _legacy_related_account(debit_account):
+    """Réplique de l'ancienne implémentation (plan reconstruit à chaque appel)"""
+    plan_comptable = AccountingData.get_plan_comptable()
+    if debit_account.startswith("6"):
+        return [acc for acc in plan_comptable.keys() if acc.startswith(("4", "5"))]
+    elif debit_account.startswith("2"):
+        return [acc for acc in plan_comptable.keys() if acc.startswith(("404", "512"))]
+    elif debit_account.startswith("401"):
+        return [acc for acc in plan_comptable.keys() if acc.startswith("5")]
+    else:
+        return [acc for acc in plan_comptable.keys() if not acc.startswith(debit_account[:3])]
+
+
+def bench_legacy(journal_codes, entries):
+    """Sélection débit/crédit avec l'ancienne approche"""
+    start = time.perf_counter()
+    for journal_code in journal_codes:
+        relevant_accounts = _legacy_relevant_accounts(journal_code)
+        debit_account = random.choice(relevant_accounts)
+        credit_accounts = _legacy_related_account(debit_account)
+        random.choice(credit_accounts)
+    return (time.perf_counter() - start) / entries
+
+
+def bench_index(journal_codes, entries):
+    """Sélection débit/crédit avec l'index précalculé"""
+    start = time.perf_counter()
+    account_index = AccountingData.get_index()
+    for journal_code in journal_codes:
+        relevant_accounts = account_index.relevant_accounts(journal_code)
+        debit_account = random.choice(relevant_accounts)
+        credit_accounts = account_index.related_accounts_for(debit_account)
+        random.choice(credit_accounts)
+    return (time.perf_counter() - start) / entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000, help="Nombre d'écritures simulées")
+    args = parser.parse_args()
+
+    journals = tuple(AccountingData.get_journals().keys())
+    journal_codes = [random.choice(journals) for _ in range(args.entries)]
+
+    legacy = bench_legacy(journal_codes, args.entries)
+    indexed = bench_index(journal_codes, args.entries)
+
+    print(f"Écritures simulées : {args.entries}")
+    print(f"Avant (plan reconstruit) : {legacy * 1e6:8.2f} µs/écriture")
+    print(f"Après (index précalculé) : {indexed * 1e6:8.2f} µs/écriture")
+    print(f"Gain : x{legacy / indexed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
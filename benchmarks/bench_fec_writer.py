@@ -0,0 +1,106 @@
+"""
+Benchmark de la mise en forme des lignes FEC
+
+Compare, sur les mêmes lots, l'écriture historique (un dictionnaire par
+ligne, format_decimal, csv.DictWriter), csv.writer sur les colonnes et le
+rédacteur dédié exporters.fec_writer, et vérifie que les trois produisent
+exactement les mêmes octets.
+
+Usage:
+    python benchmarks/bench_fec_writer.py [--lines 1000000]
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporters.fec_writer import FEC_COLUMNS, FEC_HEADER, format_lines
+from generator import FECGenerator
+from utils.formatters import format_decimal
+
+
+def write_dictwriter(batches):
+    """Réplique de l'écriture historique (dictionnaire par ligne + DictWriter)"""
+    buffer = io.StringIO(newline='')
+    writer = csv.DictWriter(buffer, fieldnames=FEC_COLUMNS, delimiter='|')
+    writer.writeheader()
+    for batch in batches:
+        for t in batch.iter_records():
+            writer.writerow({
+                "JournalCode": t['journal_code'],
+                "JournalLib": t['journal_lib'],
+                "EcritureNum": f"{t['journal_code']}{t['ecr_id']:05d}",
+                "EcritureDate": t['ecr_date'],
+                "CompteNum": t['account'],
+                "CompteLib": t['account_lib'],
+                "CompAuxNum": t['comp_aux'],
+                "CompAuxLib": t['comp_aux_lib'],
+                "PieceRef": t['piece_ref'],
+                "PieceDate": t['piece_date'],
+                "EcritureLib": t['label'],
+                "Debit": format_decimal(t['debit']),
+                "Credit": format_decimal(t['credit']),
+                "EcritureLet": t['lettering'],
+                "DateLet": t['date_lettering'],
+                "ValidDate": t['valid_date'],
+                "Montantdevise": "",
+                "Idevise": ""
+            })
+    return buffer.getvalue()
+
+
+def write_csv_columns(batches):
+    """csv.writer sur les colonnes FEC du lot"""
+    buffer = io.StringIO(newline='')
+    writer = csv.writer(buffer, delimiter='|')
+    writer.writerow(FEC_COLUMNS)
+    for batch in batches:
+        writer.writerows(zip(*batch.fec_columns().values()))
+    return buffer.getvalue()
+
+
+def write_fast(batches):
+    """Rédacteur FEC dédié"""
+    return FEC_HEADER + "".join(format_lines(batch) for batch in batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000, help="Nombre de lignes écrites")
+    parser.add_argument("--skip-legacy", action="store_true", help="Ne pas mesurer l'écriture historique")
+    args = parser.parse_args()
+
+    generator = FECGenerator(transaction_count=args.lines // 2, engine="numpy", seed=0)
+    batches = list(generator.iter_batches())
+    lines = sum(len(batch) for batch in batches)
+
+    writers = [("csv.writer (colonnes)", write_csv_columns), ("fec_writer", write_fast)]
+    if not args.skip_legacy:
+        writers.insert(0, ("DictWriter (historique)", write_dictwriter))
+
+    results = []
+    for name, writer in writers:
+        start = time.perf_counter()
+        text = writer(batches)
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed, hashlib.sha256(text.encode("ascii")).hexdigest()))
+
+    print(f"Lignes : {lines}")
+    reference = results[0][1]
+    for name, elapsed, _ in results:
+        print(f"{name:<24} {elapsed:7.2f} s  {lines / elapsed:12,.0f} lignes/s  x{reference / elapsed:.1f}")
+
+    if len({digest for _, _, digest in results}) != 1:
+        print("ÉCHEC: les sorties diffèrent")
+        sys.exit(1)
+    print("Sorties identiques")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark du temps de démarrage (python -X importtime)
+
+Mesure le coût des imports de points d'entrée dans un interpréteur neuf,
+vérifie qu'il reste sous un budget et qu'aucune dépendance lourde
+(pandas, openpyxl, pyarrow, faker) n'est chargée.
+Le code de sortie est non nul si le budget est dépassé.
+
+Usage:
+    python benchmarks/bench_import_time.py [--modules main exporters] [--budget-ms 250] [--runs 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules qui ne doivent pas être chargés au démarrage
+FORBIDDEN_MODULES = ("pandas", "openpyxl", "pyarrow", "faker")
+
+
+def measure_imports(module):
+    """
+    Importe un module dans un nouvel interpréteur avec -X importtime
+
+    Args:
+        module (str): Module à importer
+
+    Returns:
+        dict: Module -> (temps cumulé en µs, import de premier niveau)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # L'indentation du nom donne la profondeur d'import (deux espaces par niveau)
+        top_level = not name[1:].startswith(" ")
+        timings[name.strip()] = (int(cumulative_us), top_level)
+    return timings
+
+
+def check_module(module, budget_ms, runs, top):
+    """
+    Mesure un point d'entrée et retourne les écarts au budget
+
+    Args:
+        module (str): Module à importer
+        budget_ms (float): Budget de démarrage en millisecondes
+        runs (int): Nombre de mesures (la meilleure est retenue)
+        top (int): Nombre de modules les plus coûteux affichés
+
+    Returns:
+        list: Messages d'échec (vide si le budget est respecté)
+    """
+    best_total = None
+    best_timings = None
+    for _ in range(runs):
+        timings = measure_imports(module)
+        total = sum(cumulative for cumulative, top_level in timings.values() if top_level)
+        if best_total is None or total < best_total:
+            best_total, best_timings = total, timings
+
+    print(f"Import de {module!r} : {best_total / 1000:.1f} ms (budget {budget_ms:.0f} ms)")
+    print("Modules les plus coûteux (cumulé) :")
+    ranked = sorted(best_timings.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (cumulative, _) in ranked[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    loaded = sorted({name.split(".")[0] for name in best_timings} & set(FORBIDDEN_MODULES))
+    if loaded:
+        failures.append(f"{module}: dépendances lourdes chargées au démarrage : {', '.join(loaded)}")
+    if best_total / 1000 > budget_ms:
+        failures.append(f"{module}: budget dépassé : {best_total / 1000:.1f} ms > {budget_ms:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["main", "exporters"], help="Points d'entrée à importer")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Budget de démarrage en millisecondes")
+    parser.add_argument("--runs", type=int, default=5, help="Nombre de mesures (la meilleure est retenue)")
+    parser.add_argument("--top", type=int, default=5, help="Nombre de modules les plus coûteux affichés")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        failures.extend(check_module(module, args.budget_ms, args.runs, args.top))
+
+    for failure in failures:
+        print(f"ÉCHEC: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
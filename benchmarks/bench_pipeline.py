@@ -0,0 +1,299 @@
+"""
+Benchmark par étape de la chaîne de génération FEC
+
+Mesure séparément chaque étape (génération des écritures, injection des
+anomalies, vérification et correction de l'équilibre, export CSV, validation
+du CSV exporté par utils.fec_reader, export Excel, export Parquet) à plusieurs
+volumes, avec le débit en lignes par seconde et le pic de mémoire résidente
+(RSS) de chaque étape. Les résultats sont enregistrés en JSON et peuvent être
+comparés à une référence : le script échoue si une étape régresse au-delà de
+la tolérance.
+
+Il n'y a pas d'étape de tri : les écritures sont générées directement dans
+l'ordre final (journal, numéro d'écriture), sans tri global.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10000 1000000 10000000]
+        [--stages generate anomalies balance csv validate excel parquet] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--save-baseline benchmarks/baseline.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporters.csv_exporter import export_to_csv
+from exporters.excel_exporter import export_to_excel
+from generator import ENGINES, FECGenerator
+from models.transaction_batch import TransactionBatch
+from utils.anomalies import inject_anomalies
+from utils.fec_reader import validate_fec_file
+from utils.validators import fix_unbalanced_batch, validate_batch
+
+# Étapes mesurées, dans l'ordre de la chaîne
+STAGES = ("generate", "anomalies", "balance", "csv", "validate", "excel", "parquet")
+
+# Volumes par défaut (nombre d'écritures, deux lignes par écriture)
+DEFAULT_SIZES = (10000, 1000000, 10000000)
+
+# Intervalle d'échantillonnage de la mémoire résidente (secondes)
+RSS_INTERVAL = 0.005
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Mémoire résidente actuelle du processus en octets (None hors Linux)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def max_rss():
+    """Pic de mémoire résidente du processus depuis son démarrage, en octets"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """
+    Pic de mémoire résidente pendant un bloc, échantillonné par un thread
+
+    Sans /proc (hors Linux), le pic est celui du processus depuis son démarrage.
+    """
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, current_rss())
+        else:
+            self.peak = max_rss()
+
+
+def measure(stage, size, lines, function, repeat=1):
+    """
+    Mesure une étape (meilleur temps sur repeat exécutions)
+
+    Args:
+        stage (str): Nom de l'étape
+        size (int): Nombre d'écritures
+        lines (int): Nombre de lignes traitées
+        function (callable): Étape à mesurer, appelée sans argument ; retourne
+            le nombre d'octets écrits ou None
+        repeat (int, optional): Nombre d'exécutions. Par défaut à 1.
+
+    Returns:
+        tuple: (résultat, dict) - Résultat de la dernière exécution et mesures de l'étape
+    """
+    best = None
+    peak = 0
+    for _ in range(repeat):
+        with PeakRSS() as rss, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        peak = max(peak, rss.peak)
+
+    record = {
+        "stage": stage,
+        "size": size,
+        "lines": lines,
+        "seconds": round(best, 6),
+        "lines_per_sec": round(lines / best, 1) if best else None,
+        "peak_rss_mb": round(peak / 2**20, 1),
+    }
+    if isinstance(result, int):
+        record["bytes"] = result
+        record["mb_per_sec"] = round(result / 2**20 / best, 1) if best else None
+    return result, record
+
+
+def run_size(size, stages, args, directory):
+    """
+    Exécute les étapes demandées pour un volume
+
+    Chaque étape reçoit la sortie de la précédente : les écritures générées sans
+    anomalie, puis altérées, puis rééquilibrées avant les exports.
+
+    Returns:
+        list: Mesures des étapes
+    """
+    records = []
+
+    def run(stage, function, lines):
+        result, record = measure(stage, size, lines, function, args.repeat)
+        records.append(record)
+        print(f"{size:>10,} {stage:<10} {record['seconds']:9.3f} s  {record['lines_per_sec'] or 0:13,.0f} lignes/s  "
+              f"{record['peak_rss_mb']:8.1f} Mo", flush=True)
+        return result
+
+    generator = FECGenerator(transaction_count=size, engine=args.engine, seed=args.seed,
+                             anomaly_rate=0, workers=args.workers)
+    # La génération est toujours exécutée : les autres étapes en dépendent
+    batch = run("generate", generator.generate_transactions, 2 * size) if "generate" in stages \
+        else generator.generate_transactions()
+    lines = len(batch)
+
+    if "anomalies" in stages:
+        # Lot recopié à chaque exécution : les mesures répétées partent des mêmes écritures
+        source = batch
+        batch = run("anomalies", lambda: inject_anomalies(
+            TransactionBatch.concat([source, source[:0]]), args.anomaly_rate, np.random.default_rng(args.seed)),
+            lines)
+
+    if "balance" in stages:
+        def balance():
+            valid, _ = validate_batch(batch)
+            if not valid:
+                fix_unbalanced_batch(batch)
+        run("balance", balance, lines)
+
+    if "csv" in stages or "validate" in stages:
+        filename = os.path.join(directory, f"fec_{size}.csv")
+        if "csv" in stages:
+            run("csv", lambda: os.path.getsize(export_to_csv(batch, filename, balance=False)), lines)
+        else:
+            # CSV à valider, écrit hors mesure
+            with contextlib.redirect_stdout(io.StringIO()):
+                export_to_csv(batch, filename, balance=False)
+        if "validate" in stages:
+            size_bytes = os.path.getsize(filename)
+
+            def validate():
+                validate_fec_file(filename)
+                return size_bytes
+            run("validate", validate, lines)
+        os.remove(filename)
+
+    if "excel" in stages:
+        filename = os.path.join(directory, f"fec_{size}.xlsx")
+        run("excel", lambda: os.path.getsize(export_to_excel(batch, filename, balance=False)), lines)
+        os.remove(filename)
+
+    if "parquet" in stages:
+        try:
+            from exporters.parquet_exporter import export_to_parquet
+        except ImportError:
+            print(f"{size:>10,} {'parquet':<10} ignorée (pyarrow non installé)", flush=True)
+        else:
+            filename = os.path.join(directory, f"fec_{size}.parquet")
+            run("parquet", lambda: os.path.getsize(export_to_parquet(batch, filename, balance=False)), lines)
+            os.remove(filename)
+
+    return records
+
+
+def compare(records, baseline, tolerance, rss_tolerance):
+    """
+    Compare les mesures à une référence
+
+    Args:
+        records (list): Mesures courantes
+        baseline (dict): Résultats de référence (même format JSON)
+        tolerance (float): Ralentissement admis (0.25 : +25 % de temps)
+        rss_tolerance (float): Hausse admise du pic de mémoire
+
+    Returns:
+        list: Descriptions des régressions
+    """
+    reference = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for record in records:
+        base = reference.get((record["size"], record["stage"]))
+        if base is None:
+            continue
+        label = f"{record['stage']} @ {record['size']:,}"
+        if record["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(f"{label}: {record['seconds']:.3f} s (référence {base['seconds']:.3f} s, "
+                               f"{record['seconds'] / base['seconds'] - 1:+.0%})")
+        if record["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance):
+            regressions.append(f"{label}: {record['peak_rss_mb']:.1f} Mo (référence {base['peak_rss_mb']:.1f} Mo, "
+                               f"{record['peak_rss_mb'] / base['peak_rss_mb'] - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Nombres d'écritures mesurés")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Étapes mesurées")
+    parser.add_argument("--engine", choices=ENGINES, default="numpy", help="Moteur de génération")
+    parser.add_argument("--workers", type=int, default=1, help="Processus de génération (moteur numpy)")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05, help="Taux d'anomalies injectées")
+    parser.add_argument("--seed", type=int, default=0, help="Graine de génération")
+    parser.add_argument("--repeat", type=int, default=1, help="Exécutions par étape (meilleur temps retenu)")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", help="Résultats JSON de référence à comparer")
+    parser.add_argument("--save-baseline", help="Enregistre les résultats comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Ralentissement admis par étape (0.25 : +25 %%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.5, help="Hausse admise du pic de mémoire par étape")
+    args = parser.parse_args()
+
+    print(f"{'Écritures':>10} {'Étape':<10} {'Temps':>11}  {'Débit':>22}  {'Pic RSS':>11}")
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            records.extend(run_size(size, args.stages, args, directory))
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "engine": args.engine,
+        "workers": args.workers,
+        "anomaly_rate": args.anomaly_rate,
+        "seed": args.seed,
+        "results": records,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"Résultats enregistrés: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(records, baseline, args.tolerance, args.rss_tolerance)
+        if regressions:
+            print("ÉCHEC: régressions par rapport à la référence")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("Aucune régression par rapport à la référence")
+
+
+if __name__ == "__main__":
+    main()
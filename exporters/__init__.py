@@ -3,11 +3,33 @@ Modules d'exportation pour le générateur FEC
 """
 
 from .csv_exporter import export_to_csv, generate_multiple_fecs
-from .excel_exporter import export_to_excel, generate_multiple_fecs_excel
+from .fanout import export_many
+from .parallel import generate_companies, ordered_map
+
+# Exports chargés à la demande : les exports Excel et Parquet (pyarrow, dépendance
+# facultative) ne sont pas utiles à une génération CSV
+_LAZY_EXPORTS = {
+    "export_to_excel": "excel_exporter",
+    "generate_multiple_fecs_excel": "excel_exporter",
+    "export_to_parquet": "parquet_exporter",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        from importlib import import_module
+        value = getattr(import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     "export_to_csv",
     "export_to_excel",
+    "export_to_parquet",
+    "export_many",
     "generate_multiple_fecs",
-    "generate_multiple_fecs_excel"
+    "generate_multiple_fecs_excel",
+    "generate_companies",
+    "ordered_map"
 ]
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Fichiers de sortie compressés (gzip, zstd) pour les exports FEC
+
+La sortie est écrite en binaire au travers d'un compteur qui calcule à la
+volée la taille et, sur demande, l'empreinte SHA-256 des octets réellement
+écrits sur le disque, sans relire le fichier.
+
+Un fichier compressé peut être prolongé : gzip et zstd admettent plusieurs
+membres (trames) concaténés, relus comme un seul flux.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+
+from .fec_writer import WRITE_BUFFER_SIZE
+
+# Compressions disponibles : extension ajoutée au nom du fichier
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def compressed_filename(filename, compression=None):
+    """
+    Ajoute l'extension de la compression au nom du fichier si elle manque
+
+    Args:
+        filename (str): Nom du fichier
+        compression (str, optional): "gzip", "zstd" ou None. Par défaut à None.
+
+    Returns:
+        str: Nom du fichier
+    """
+    if compression is None:
+        return filename
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compression inconnue: {compression!r} "
+                         f"(attendu: {', '.join(COMPRESSION_SUFFIXES)})")
+    suffix = COMPRESSION_SUFFIXES[compression]
+    return filename if filename.endswith(suffix) else filename + suffix
+
+
+def compression_of(filename):
+    """
+    Compression d'un fichier d'après son extension
+
+    Args:
+        filename (str): Nom du fichier
+
+    Returns:
+        str: "gzip", "zstd" ou None (fichier brut)
+    """
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if filename.endswith(suffix):
+            return compression
+    return None
+
+
+def open_text(filename):
+    """
+    Ouvre en lecture un fichier texte ASCII, éventuellement compressé (d'après son extension)
+
+    Args:
+        filename (str): Nom du fichier
+
+    Returns:
+        io.TextIOBase: Fichier texte, fins de ligne conservées (newline="")
+    """
+    compression = compression_of(filename)
+    if compression == "gzip":
+        return gzip.open(filename, "rt", encoding="ascii", newline="")
+    if compression == "zstd":
+        import zstandard
+        raw = open(filename, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="ascii", newline="")
+    return open(filename, encoding="ascii", newline="")
+
+
+class HashingFile:
+    """
+    Fichier binaire comptant les octets écrits et calculant, si demandé, leur empreinte SHA-256
+    """
+
+    def __init__(self, filename, checksum=False, append=False):
+        self.filename = filename
+        self.size = 0
+        self._hash = hashlib.sha256() if checksum else None
+        self._file = open(filename, "ab" if append else "wb", buffering=WRITE_BUFFER_SIZE)
+
+    @property
+    def sha256(self):
+        """Empreinte SHA-256 (hexadécimale) des octets écrits, None si elle n'est pas calculée"""
+        return self._hash.hexdigest() if self._hash is not None else None
+
+    def write(self, data):
+        if self._hash is not None:
+            self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def writable(self):
+        return True
+
+
+class OutputFile:
+    """
+    Fichier de sortie binaire, éventuellement compressé
+
+    Example:
+        with OutputFile("fec.csv.gz", "gzip", level=6, checksum=True) as output:
+            output.write(b"...")
+        print(output.size, output.sha256)
+    """
+
+    def __init__(self, filename, compression=None, level=None, checksum=False, append=False):
+        """
+        Ouvre le fichier en écriture
+
+        Args:
+            filename (str): Nom du fichier (extension de compression comprise)
+            compression (str, optional): "gzip", "zstd" ou None (fichier brut). Par défaut à None.
+            level (int, optional): Niveau de compression. Par défaut, celui de la bibliothèque.
+            checksum (bool, optional): Calcule l'empreinte SHA-256 des octets écrits. Par défaut à False.
+            append (bool, optional): Écrit à la suite du fichier existant (nouveau membre gzip
+                ou nouvelle trame zstd) ; size et sha256 ne portent que sur les octets ajoutés.
+                Par défaut à False.
+        """
+        if compression is not None and compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Compression inconnue: {compression!r} "
+                             f"(attendu: {', '.join(COMPRESSION_SUFFIXES)})")
+
+        os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
+        self.filename = filename
+        self.raw = HashingFile(filename, checksum, append)
+
+        if compression is None:
+            self._stream = self.raw
+        elif compression == "gzip":
+            # mtime fixe : une même graine donne des fichiers identiques à l'octet près
+            self._stream = gzip.GzipFile(fileobj=self.raw, mode="wb", mtime=0,
+                                         compresslevel=9 if level is None else level)
+        elif compression == "zstd":
+            # zstandard n'est chargé que pour une sortie zstd
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+            self._stream = compressor.stream_writer(self.raw, closefd=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def size(self):
+        """Taille du fichier écrit, en octets"""
+        return self.raw.size
+
+    @property
+    def sha256(self):
+        """Empreinte SHA-256 (hexadécimale) du fichier écrit, None si elle n'est pas calculée"""
+        return self.raw.sha256
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def close(self):
+        """Termine le flux compressé puis ferme le fichier"""
+        if self.raw.closed:
+            return
+        if self._stream is not self.raw:
+            self._stream.close()
+        self.raw.close()
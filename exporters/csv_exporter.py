@@ -2,93 +2,374 @@
 Fonctions d'exportation CSV pour le générateur FEC
 """
 
+import json
+import logging
 import os
-import csv
-import random
-from datetime import datetime
-from faker import Faker
+from collections import namedtuple
+
+import numpy as np
 
 # Import from parent modules using absolute imports
-from utils.formatters import format_decimal, format_fec_ecr_num
-from utils.validators import validate_fec, fix_unbalanced_entries
+from models.transaction_batch import as_batches
+from utils.instrumentation import BYTES_WRITTEN, LINES_WRITTEN, as_metrics, current_metrics
+from utils.validators import balance_batch, iter_balanced_batches
+from .compression import OutputFile, compressed_filename, COMPRESSION_SUFFIXES
+from .fec_writer import (ANOMALY_COLUMN, FEC_COLUMNS, WRITE_BUFFER_SIZE, fec_header, format_lines,
+                         format_line_list)
+from .parallel import generate_companies
+
+logger = logging.getLogger(__name__)
+
+# Lot mis en forme : texte, nombre de lignes, écritures corrigées, erreurs restantes
+# et, pour un découpage en parties, les bornes des écritures (voir entry_bounds)
+RenderedBatch = namedtuple("RenderedBatch", ["text", "lines", "fixed", "errors", "bounds"])
 
-# Initialiser le générateur de données fictives
-fake = Faker('fr_FR')
 
-def export_to_csv(transactions, filename="FEC_EXAMPLE.csv"):
+def entry_bounds(batch, lines):
     """
-    Exporte les transactions au format FEC (CSV) sans problèmes d'encodage
-    
+    Bornes des écritures d'un lot mis en forme, pour le découper sans couper d'écriture
+
     Args:
-        transactions (list): Liste des transactions
-        filename (str, optional): Nom du fichier CSV à générer. Par défaut à "FEC_EXAMPLE.csv".
-    
+        batch (TransactionBatch): Lot d'écritures complètes
+        lines (list): Lignes mises en forme (voir format_line_list)
+
     Returns:
-        str: Chemin du fichier généré
+        numpy.ndarray: Une ligne par début d'écriture, plus la fin du lot : position dans
+            le texte, nombre de lignes, débit et crédit cumulés (centimes) avant cette borne
     """
-    # Les colonnes du FEC dans l'ordre requis
-    fec_columns = [
-        "JournalCode", "JournalLib", "EcritureNum", "EcritureDate",
-        "CompteNum", "CompteLib", "CompAuxNum", "CompAuxLib",
-        "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
-        "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise"
-    ]
-    
-    # Préparation des données pour export
-    export_data = []
-    for t in transactions:
-        row = {
-            "JournalCode": t['journal_code'],
-            "JournalLib": t['journal_lib'],
-            "EcritureNum": format_fec_ecr_num(t['journal_code'], t['ecr_id']),
-            "EcritureDate": t['ecr_date'],
-            "CompteNum": t['account'],
-            "CompteLib": t['account_lib'],
-            "CompAuxNum": t['comp_aux'],
-            "CompAuxLib": t['comp_aux_lib'],
-            "PieceRef": t['piece_ref'],
-            "PieceDate": t['piece_date'],
-            "EcritureLib": t['label'],
-            "Debit": format_decimal(t['debit']),
-            "Credit": format_decimal(t['credit']),
-            "EcritureLet": t['lettering'],
-            "DateLet": t['date_lettering'],
-            "ValidDate": t['valid_date'],
-            "Montantdevise": "",
-            "Idevise": ""
-        }
-        export_data.append(row)
-    
-    # Validation et correction du FEC
-    is_valid, errors = validate_fec(export_data)
-    if not is_valid:
-        print("Correction automatique des écritures non équilibrées...")
-        export_data = fix_unbalanced_entries(export_data)
-        
-        # Vérification après correction
-        is_valid, errors = validate_fec(export_data)
-        if not is_valid:
-            print("ATTENTION: Le FEC contient toujours des erreurs après correction")
-        else:
-            print("Corrections appliquées avec succès")
-    
+    size = len(batch)
+    starts = np.append(batch.entry_starts(), size)
+    cumulated = np.zeros((size + 1, 3), dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, lines), dtype=np.int64, count=size), out=cumulated[1:, 0])
+    np.cumsum(batch.debit, out=cumulated[1:, 1])
+    np.cumsum(batch.credit, out=cumulated[1:, 2])
+    return np.column_stack((cumulated[starts, 0], starts, cumulated[starts, 1], cumulated[starts, 2]))
+
+
+def render_batch(batch, fixed_count=None, error_count=None, bounds=False, anomaly_label=False):
+    """
+    Équilibre si besoin puis met en forme un lot au format FEC (sans en-tête)
+
+    Args:
+        batch (TransactionBatch): Lot d'écritures complètes
+        fixed_count (int, optional): Écritures déjà corrigées (lot déjà équilibré)
+        error_count (int, optional): Erreurs restantes (lot déjà équilibré)
+        bounds (bool, optional): Calcule les bornes des écritures (découpage en parties).
+            Par défaut à False.
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+
+    Returns:
+        RenderedBatch: Texte CSV, nombre de lignes, écritures corrigées, erreurs restantes, bornes
+    """
+    if fixed_count is None:
+        # Vérification et correction en une seule passe, sur les centimes
+        fixed_count, error_count = balance_batch(batch)
+
+    if not bounds:
+        return RenderedBatch(format_lines(batch, anomaly_label), len(batch), fixed_count, error_count, None)
+    lines = format_line_list(batch, anomaly_label)
+    return RenderedBatch("".join(lines), len(batch), fixed_count, error_count, entry_bounds(batch, lines))
+
+
+def _render_partition(job):
+    """Génère une partition puis la met en forme (exécuté dans un processus du pool)"""
+    # Import here to avoid circular import
+    from generator import generate_partition
+    metrics = current_metrics()
+    batch = generate_partition(job)
+    fixed_count, error_count = 0, 0
+    if job.get("balance", True):
+        with metrics.stage("balance"):
+            fixed_count, error_count = balance_batch(batch)
+    with metrics.stage("render"):
+        return render_batch(batch, fixed_count, error_count, job.get("bounds", False),
+                            job.get("anomaly_label", False))
+
+
+class _PartWriter:
+    """
+    Écrit des lots mis en forme dans des fichiers d'au plus part_lines lignes
+
+    Les parties commencent chacune par l'en-tête FEC et ne coupent jamais une
+    écriture (une écriture plus longue que part_lines forme sa propre partie).
+    """
+
+    def __init__(self, stem, suffix, part_lines, compression=None, compression_level=None, header=None):
+        self.header = (header or fec_header()).encode("ascii")
+        self.stem = stem
+        self.suffix = suffix
+        self.part_lines = part_lines
+        self.compression = compression
+        self.compression_level = compression_level
+        self.parts = []
+        self._output = None
+
+    def _open_part(self):
+        filename = f"{self.stem}.part{len(self.parts) + 1:04d}{self.suffix}"
+        self._output = OutputFile(filename, self.compression, self.compression_level, checksum=True)
+        self._output.write(self.header)
+        self.parts.append({"filename": os.path.basename(filename), "lines": 0,
+                           "debit_cents": 0, "credit_cents": 0})
+
+    def _close_part(self):
+        if self._output is not None:
+            self._output.close()
+            self.parts[-1].update(bytes=self._output.size, sha256=self._output.sha256)
+            self._output = None
+
+    def write(self, chunk):
+        """Écrit un lot mis en forme (avec ses bornes), en ouvrant les parties nécessaires"""
+        bounds = chunk.bounds
+        pos, last = 0, len(bounds) - 1
+        while pos < last:
+            part = self.parts[-1] if self._output is not None else None
+            capacity = self.part_lines - (part["lines"] if part else 0)
+            # Dernière borne d'écriture tenant dans la partie en cours
+            end = int(np.searchsorted(bounds[:, 1], bounds[pos, 1] + capacity, side="right")) - 1
+            if end <= pos:
+                if part and part["lines"]:
+                    self._close_part()
+                    continue
+                end = pos + 1
+            if part is None:
+                self._open_part()
+                part = self.parts[-1]
+            self._output.write(chunk.text[bounds[pos, 0]:bounds[end, 0]].encode("ascii"))
+            part["lines"] += int(bounds[end, 1] - bounds[pos, 1])
+            part["debit_cents"] += int(bounds[end, 2] - bounds[pos, 2])
+            part["credit_cents"] += int(bounds[end, 3] - bounds[pos, 3])
+            pos = end
+
+    def close(self):
+        """Termine la dernière partie et retourne la description des parties"""
+        self._close_part()
+        return self.parts
+
+    def discard(self):
+        """Abandonne la sortie (écriture interrompue) : ferme et supprime les parties écrites"""
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+        directory = os.path.dirname(self.stem)
+        for part in self.parts:
+            _remove(os.path.join(directory, part["filename"]))
+
+
+def _remove(filename):
+    """Supprime un fichier s'il existe"""
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+def _split_filename(filename, compression):
+    """Sépare un nom de fichier en (racine, extension hors compression)"""
+    if compression is not None and filename.endswith(COMPRESSION_SUFFIXES[compression]):
+        filename = filename[:-len(COMPRESSION_SUFFIXES[compression])]
+    return os.path.splitext(filename)
+
+
+def _write_fec(chunks, filename, compression=None, compression_level=None, part_lines=None,
+               anomaly_label=False, metrics=None, append=False):
+    """
+    Écrit l'en-tête puis les blocs déjà mis en forme, dans l'ordre
+
+    Args:
+        chunks (iterable): Résultats de render_batch (avec bornes si part_lines est donné)
+        filename (str): Nom du fichier CSV à générer
+        compression (str, optional): "gzip", "zstd" ou None (fichier brut). Par défaut à None.
+        compression_level (int, optional): Niveau de compression. Par défaut, celui de la bibliothèque.
+        part_lines (int, optional): Découpe la sortie en parties d'au plus part_lines lignes,
+            décrites par un manifeste JSON. Par défaut à None (fichier unique).
+        anomaly_label (bool, optional): Les blocs comportent la colonne du type d'anomalie.
+            Par défaut à False.
+        metrics (Metrics, optional): Mesures (étape "write", lignes et octets écrits). Par défaut à None.
+        append (bool, optional): Écrit les blocs à la suite du fichier existant, sans en-tête.
+            Par défaut à False.
+
+    Si l'écriture est interrompue (erreur des blocs ou de l'écriture), la sortie
+    partielle est supprimée, ou ramenée à sa taille initiale en mode append.
+
+    Returns:
+        str: Chemin du fichier généré (du manifeste pour une sortie en parties)
+    """
+    metrics = as_metrics(metrics)
+    if append and part_lines:
+        raise ValueError("Ajout impossible à une sortie en parties (part_lines)")
+    header = "" if append else fec_header(anomaly_label)
+
     # Création du répertoire de sortie si nécessaire
     os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
+
+    line_count = 0
+    fixed_count = 0
+    error_count = 0
+    if part_lines:
+        stem, extension = _split_filename(filename, compression)
+        manifest_filename = f"{stem}.manifest.json"
+    elif compression is not None:
+        filename = compressed_filename(filename, compression)
+    initial_size = os.path.getsize(filename) if append and os.path.exists(filename) else 0
+    writer = None
+
+    try:
+        with metrics.stage("write"):
+            if part_lines:
+                writer = _PartWriter(stem, compressed_filename(extension, compression), part_lines,
+                                     compression, compression_level, header)
+                for chunk in chunks:
+                    writer.write(chunk)
+                    line_count += chunk.lines
+                    metrics.add(LINES_WRITTEN, chunk.lines)
+                    fixed_count += chunk.fixed
+                    error_count += chunk.errors
+                parts = writer.close()
+                metrics.add(BYTES_WRITTEN, sum(part["bytes"] for part in parts))
+
+                filename = manifest_filename
+                manifest = {
+                    "columns": FEC_COLUMNS + [ANOMALY_COLUMN] if anomaly_label else FEC_COLUMNS,
+                    "delimiter": "|",
+                    "encoding": "ascii",
+                    "header": True,
+                    "compression": compression,
+                    "compression_level": compression_level,
+                    "part_lines": part_lines,
+                    "lines": line_count,
+                    "debit_cents": sum(part["debit_cents"] for part in parts),
+                    "credit_cents": sum(part["credit_cents"] for part in parts),
+                    "parts": parts,
+                }
+                with open(filename, "w", encoding="utf-8") as manifest_file:
+                    json.dump(manifest, manifest_file, indent=2)
+                    manifest_file.write("\n")
+
+            elif compression is not None:
+                with OutputFile(filename, compression, compression_level, append=append) as output:
+                    output.write(header.encode("ascii"))
+                    for chunk in chunks:
+                        output.write(chunk.text.encode("ascii"))
+                        line_count += chunk.lines
+                        metrics.add(LINES_WRITTEN, chunk.lines)
+                        fixed_count += chunk.fixed
+                        error_count += chunk.errors
+                metrics.add(BYTES_WRITTEN, output.size)
+
+            else:
+                # Écriture du fichier CSV avec le format FEC (séparateur |)
+                # Utilisation explicite de l'encodage ASCII pour éviter tout problème
+                with open(filename, 'a' if append else 'w', newline='', encoding='ascii',
+                          buffering=WRITE_BUFFER_SIZE) as csvfile:
+                    csvfile.write(header)
+
+                    for chunk in chunks:
+                        csvfile.write(chunk.text)
+                        line_count += chunk.lines
+                        metrics.add(LINES_WRITTEN, chunk.lines)
+                        fixed_count += chunk.fixed
+                        error_count += chunk.errors
+                metrics.add(BYTES_WRITTEN, os.path.getsize(filename) - initial_size)
+    except BaseException:
+        # Écriture interrompue : pas de sortie tronquée d'apparence complète
+        if part_lines:
+            if writer is not None:
+                writer.discard()
+            _remove(manifest_filename)
+        elif append:
+            os.truncate(filename, initial_size)
+        else:
+            _remove(filename)
+        raise
+
+    if fixed_count:
+        logger.info("Correction automatique des écritures non équilibrées: %d", fixed_count)
+        if error_count:
+            logger.warning("ATTENTION: Le FEC contient toujours des erreurs après correction (%d écritures)",
+                           error_count)
+        else:
+            logger.info("Corrections appliquées avec succès")
+
+    logger.info("FEC exporté avec succès: %s", filename)
+    logger.info("Nombre de transactions: %d", line_count)
+    if part_lines:
+        logger.info("Nombre de parties: %d", len(parts))
+
+    return filename
+
+
+def export_to_csv(transactions, filename="FEC_EXAMPLE.csv", balance=True, compression=None,
+                  compression_level=None, part_lines=None, anomaly_label=False, metrics=None, append=False):
+    """
+    Exporte les transactions au format FEC (CSV) sans problèmes d'encodage
     
-    # Écriture du fichier CSV avec le format FEC (séparateur |)
-    # Utilisation explicite de l'encodage ASCII pour éviter tout problème
-    with open(filename, 'w', newline='', encoding='ascii') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fec_columns, delimiter='|')
-        writer.writeheader()
-        writer.writerows(export_data)
-        
-    print(f"FEC exporté avec succès: {filename}")
-    print(f"Nombre de transactions: {len(export_data)}")
+    Les transactions sont traitées lot par lot (TransactionBatch) : un lot unique,
+    le flux FECGenerator.iter_batches() ou une liste de lignes (dictionnaires)
+    sont acceptés, et seul le lot en cours est conservé en mémoire.
     
-    return filename
+    Args:
+        transactions (TransactionBatch | iterable): Transactions à exporter
+        filename (str, optional): Nom du fichier CSV à générer. Par défaut à "FEC_EXAMPLE.csv".
+        balance (bool, optional): Vérifie et corrige l'équilibre des écritures. À désactiver
+            pour des écritures équilibrées par construction. Par défaut à True.
+        compression (str, optional): Compression de la sortie ("gzip" ou "zstd") ; l'extension
+            (.gz, .zst) est ajoutée au nom du fichier. Par défaut à None (fichier brut).
+        compression_level (int, optional): Niveau de compression. Par défaut, celui de la bibliothèque.
+        part_lines (int, optional): Découpe la sortie en fichiers d'au plus part_lines lignes
+            (racine.part0001.csv...) décrits par racine.manifest.json (lignes, totaux débit/crédit
+            et empreinte SHA-256 de chaque partie). Par défaut à None (fichier unique).
+        anomaly_label (bool, optional): Ajoute une colonne anomaly_type (type d'anomalie injectée,
+            vide sinon) après les 18 colonnes FEC. Par défaut à False.
+        metrics (Metrics, optional): Mesures des étapes "balance", "render" et "write"
+            (voir utils.instrumentation). Par défaut à None.
+        append (bool, optional): Ajoute les lignes à la fin d'un FEC existant, sans en-tête
+            (voir FECGenerator.extend). Par défaut à False.
+    
+    Returns:
+        str: Chemin du fichier généré (du manifeste pour une sortie en parties)
+    """
+    metrics = as_metrics(metrics)
+    bounds = bool(part_lines)
+    batches = as_batches(transactions)
+    if not balance:
+        chunks = (render_batch(batch, 0, 0, bounds, anomaly_label) for batch in batches)
+    else:
+        chunks = (render_batch(batch, fixed, errors, bounds, anomaly_label)
+                  for batch, fixed, errors in metrics.timed("balance", iter_balanced_batches(batches)))
+    return _write_fec(metrics.timed("render", chunks), filename, compression, compression_level, part_lines,
+                      anomaly_label, metrics, append)
 
 
-def generate_multiple_fecs(count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs"):
+def export_partitions_to_csv(jobs, filename="FEC_EXAMPLE.csv", workers=1, balance=True, compression=None,
+                             compression_level=None, part_lines=None, anomaly_label=False, metrics=None):
+    """
+    Génère et exporte un FEC partition par partition, sur un pool de processus
+
+    Chaque processus génère et met en forme une partition (journal, mois) ;
+    le processus principal se contente d'écrire les blocs dans l'ordre des
+    partitions, ce qui reconstitue l'ordre final (journal, numéro d'écriture).
+
+    Args:
+        jobs (iterable): Tâches de génération (voir FECGenerator.partition_jobs)
+        filename (str, optional): Nom du fichier CSV à générer. Par défaut à "FEC_EXAMPLE.csv".
+        workers (int, optional): Nombre de processus. Par défaut à 1.
+        balance (bool, optional): Vérifie et corrige l'équilibre des écritures. Par défaut à True.
+        compression (str, optional): "gzip", "zstd" ou None (voir export_to_csv). Par défaut à None.
+        compression_level (int, optional): Niveau de compression. Par défaut, celui de la bibliothèque.
+        part_lines (int, optional): Lignes par partie (voir export_to_csv). Par défaut à None.
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+        metrics (Metrics, optional): Mesures, y compris celles des processus (voir Metrics.map).
+            Par défaut à None.
+
+    Returns:
+        str: Chemin du fichier généré (du manifeste pour une sortie en parties)
+    """
+    metrics = as_metrics(metrics)
+    jobs = (dict(job, balance=balance, bounds=bool(part_lines), anomaly_label=anomaly_label) for job in jobs)
+    return _write_fec(metrics.map(_render_partition, jobs, workers), filename,
+                      compression, compression_level, part_lines, anomaly_label, metrics)
+
+
+def generate_multiple_fecs(count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs",
+                           workers=1, seed=None, engine="python", metrics=None):
     """
     Génère plusieurs FEC avec des caractéristiques différentes
     
@@ -96,55 +377,14 @@ def generate_multiple_fecs(count=5, base_filename="FEC_ENTREPRISE_", output_dir=
         count (int, optional): Nombre de fichiers à générer. Par défaut à 5.
         base_filename (str, optional): Préfixe du nom de fichier. Par défaut à "FEC_ENTREPRISE_".
         output_dir (str, optional): Répertoire de sortie. Par défaut à "generated_fecs".
+        workers (int, optional): Nombre de processus générant les entreprises en parallèle. Par défaut à 1.
+        seed (int, optional): Graine globale ; chaque entreprise en dérive un flux indépendant
+            et déterministe. Par défaut à None.
+        engine (str, optional): Moteur de génération ("python" ou "numpy"). Par défaut à "python".
+        metrics (Metrics, optional): Mesures cumulées de toutes les entreprises. Par défaut à None.
     
     Returns:
-        list: Liste des informations sur les fichiers générés
+        list: Liste des informations sur les fichiers générés (dans l'ordre des entreprises)
     """
-    # Création du répertoire de sortie
-    os.makedirs(output_dir, exist_ok=True)
-    
-    generated_files = []
-    
-    # Import here to avoid circular import
-    from generator import FECGenerator
-    
-    for i in range(1, count + 1):
-        # Varier les paramètres pour chaque FEC
-        company_name = f"ENTREPRISE_{i} SAS"
-        siren = fake.numerify("#########")
-        
-        # Différentes périodes comptables
-        year = 2023
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
-        
-        # Varier le nombre de transactions et le taux d'anomalies
-        transaction_count = random.randint(300, 1000)
-        anomaly_rate = random.uniform(0.03, 0.15)
-        
-        # Créer un nouveau générateur avec ces paramètres
-        generator = FECGenerator(
-            company_name=company_name,
-            siren=siren,
-            start_date=start_date,
-            end_date=end_date,
-            transaction_count=transaction_count,
-            anomaly_rate=anomaly_rate
-        )
-        
-        # Générer et exporter le FEC
-        filename = os.path.join(output_dir, f"{base_filename}{i}_{year}.csv")
-        generator.generate_transactions()
-        generator.export_to_csv(filename)
-        
-        generated_files.append({
-            "filename": filename,
-            "company": company_name,
-            "transaction_count": transaction_count,
-            "anomaly_rate": anomaly_rate,
-            "anomaly_count": int(transaction_count * anomaly_rate)
-        })
-        
-        print(f"Généré FEC {i}/{count}: {filename}")
-    
-    return generated_files
\ No newline at end of file
+    return generate_companies(count, base_filename, output_dir, format="csv",
+                              workers=workers, seed=seed, engine=engine, metrics=metrics)
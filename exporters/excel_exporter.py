@@ -2,80 +2,66 @@
 Fonctions d'exportation Excel pour le générateur FEC
 """
 
+import logging
 import os
-import random
-import pandas as pd
-from faker import Faker
 
-from utils.formatters import format_decimal, format_fec_ecr_num
-from utils.validators import validate_fec, fix_unbalanced_entries, fix_unbalanced_entries_excel
+from models.transaction_batch import as_batches
+from utils.instrumentation import BYTES_WRITTEN, LINES_WRITTEN, as_metrics
+from utils.validators import iter_balanced_batches
+from .parallel import generate_companies
+from .xlsx_writer import XLSXStreamWriter
 
-# Initialiser le générateur de données fictives
-fake = Faker('fr_FR')
+logger = logging.getLogger(__name__)
 
-def export_to_excel(transactions, filename="FEC_EXAMPLE.xlsx"):
+
+def export_to_excel(transactions, filename="FEC_EXAMPLE.xlsx", balance=True, anomaly_label=False, metrics=None):
     """
     Exporte les transactions au format Excel (.xlsx)
     
+    Les lots sont écrits en flux dans le classeur (mémoire constante) ; une
+    nouvelle feuille est ouverte à chaque fois que la limite d'Excel
+    (1 048 576 lignes) est atteinte.
+    
     Args:
-        transactions (list): Liste des transactions
+        transactions (TransactionBatch | iterable): Transactions à exporter (lot, flux de lots
+            ou liste de lignes)
         filename (str, optional): Nom du fichier Excel à générer. Par défaut à "FEC_EXAMPLE.xlsx".
+        balance (bool, optional): Vérifie et corrige l'équilibre des écritures. Par défaut à True.
+        anomaly_label (bool, optional): Ajoute une colonne anomaly_type (type d'anomalie injectée,
+            vide sinon) après les 18 colonnes FEC. Par défaut à False.
+        metrics (Metrics, optional): Mesures des étapes "balance" et "write" (voir
+            utils.instrumentation). Par défaut à None.
     
     Returns:
         str: Chemin du fichier généré
     """
-    # Les colonnes du FEC dans l'ordre requis
-    fec_columns = [
-        "JournalCode", "JournalLib", "EcritureNum", "EcritureDate",
-        "CompteNum", "CompteLib", "CompAuxNum", "CompAuxLib",
-        "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
-        "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise"
-    ]
-    
-    # Préparation des données pour export
-    export_data = []
-    for t in transactions:
-        row = {
-            "JournalCode": t['journal_code'],
-            "JournalLib": t['journal_lib'],
-            "EcritureNum": format_fec_ecr_num(t['journal_code'], t['ecr_id']),
-            "EcritureDate": t['ecr_date'],
-            "CompteNum": t['account'],
-            "CompteLib": t['account_lib'],
-            "CompAuxNum": t['comp_aux'],
-            "CompAuxLib": t['comp_aux_lib'],
-            "PieceRef": t['piece_ref'],
-            "PieceDate": t['piece_date'],
-            "EcritureLib": t['label'],
-            "Debit": t['debit'],  # On garde les montants numériques pour Excel
-            "Credit": t['credit'],
-            "EcritureLet": t['lettering'],
-            "DateLet": t['date_lettering'],
-            "ValidDate": t['valid_date'],
-            "Montantdevise": "",
-            "Idevise": ""
-        }
-        export_data.append(row)
-    
-    # Correction des écritures non équilibrées
-    export_data = fix_unbalanced_entries_excel(export_data)
-    
-    # Conversion en DataFrame pandas
-    df = pd.DataFrame(export_data)
+    metrics = as_metrics(metrics)
     
     # Création du répertoire de sortie si nécessaire
     os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
     
-    # Écriture du fichier Excel
-    df.to_excel(filename, index=False, engine='openpyxl')
+    batches = as_batches(transactions)
+    if balance:
+        # Correction des écritures non équilibrées, lot par lot
+        batches = (batch for batch, _, _ in metrics.timed("balance", iter_balanced_batches(batches)))
+    
+    # Écriture du fichier Excel (montants numériques, calculés depuis les centimes)
+    with metrics.stage("write"), XLSXStreamWriter(filename, anomaly_label=anomaly_label) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            metrics.add(LINES_WRITTEN, len(batch))
+    metrics.add(BYTES_WRITTEN, os.path.getsize(filename))
         
-    print(f"FEC exporté avec succès en Excel: {filename}")
-    print(f"Nombre de transactions: {len(export_data)}")
+    logger.info("FEC exporté avec succès en Excel: %s", filename)
+    logger.info("Nombre de transactions: %d", writer.row_count)
+    if len(writer.sheet_rows) > 1:
+        logger.info("Nombre de feuilles: %d", len(writer.sheet_rows))
     
     return filename
 
 
-def generate_multiple_fecs_excel(count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs_excel"):
+def generate_multiple_fecs_excel(count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs_excel",
+                                 workers=1, seed=None, engine="python", metrics=None):
     """
     Génère plusieurs FEC au format Excel avec des caractéristiques différentes
     
@@ -83,55 +69,14 @@ def generate_multiple_fecs_excel(count=5, base_filename="FEC_ENTREPRISE_", outpu
         count (int, optional): Nombre de fichiers à générer. Par défaut à 5.
         base_filename (str, optional): Préfixe du nom de fichier. Par défaut à "FEC_ENTREPRISE_".
         output_dir (str, optional): Répertoire de sortie. Par défaut à "generated_fecs_excel".
+        workers (int, optional): Nombre de processus générant les entreprises en parallèle. Par défaut à 1.
+        seed (int, optional): Graine globale ; chaque entreprise en dérive un flux indépendant
+            et déterministe. Par défaut à None.
+        engine (str, optional): Moteur de génération ("python" ou "numpy"). Par défaut à "python".
+        metrics (Metrics, optional): Mesures cumulées de toutes les entreprises. Par défaut à None.
     
     Returns:
-        list: Liste des informations sur les fichiers générés
+        list: Liste des informations sur les fichiers générés (dans l'ordre des entreprises)
     """
-    # Création du répertoire de sortie
-    os.makedirs(output_dir, exist_ok=True)
-    
-    generated_files = []
-    
-    # Import here to avoid circular import
-    from generator import FECGenerator
-    
-    for i in range(1, count + 1):
-        # Varier les paramètres pour chaque FEC
-        company_name = f"ENTREPRISE_{i} SAS"
-        siren = fake.numerify("#########")
-        
-        # Différentes périodes comptables
-        year = 2023
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
-        
-        # Varier le nombre de transactions et le taux d'anomalies
-        transaction_count = random.randint(300, 1000)
-        anomaly_rate = random.uniform(0.03, 0.15)
-        
-        # Créer un nouveau générateur avec ces paramètres
-        generator = FECGenerator(
-            company_name=company_name,
-            siren=siren,
-            start_date=start_date,
-            end_date=end_date,
-            transaction_count=transaction_count,
-            anomaly_rate=anomaly_rate
-        )
-        
-        # Générer et exporter le FEC en Excel
-        filename = os.path.join(output_dir, f"{base_filename}{i}_{year}.xlsx")
-        generator.generate_transactions()
-        generator.export_to_excel(filename)
-        
-        generated_files.append({
-            "filename": filename,
-            "company": company_name,
-            "transaction_count": transaction_count,
-            "anomaly_rate": anomaly_rate,
-            "anomaly_count": int(transaction_count * anomaly_rate)
-        })
-        
-        print(f"Généré FEC Excel {i}/{count}: {filename}")
-    
-    return generated_files
\ No newline at end of file
+    return generate_companies(count, base_filename, output_dir, format="excel",
+                              workers=workers, seed=seed, engine=engine, metrics=metrics)
@@ -0,0 +1,182 @@
+"""
+Export d'un même flux de lots vers plusieurs formats (CSV, Excel, Parquet...)
+
+Le grand livre est généré et équilibré une seule fois ; chaque lot est ensuite
+transmis à tous les exports, qui s'exécutent chacun dans un thread et
+consomment les lots par une file bornée : la mémoire reste bornée et les
+exports avancent en parallèle (compression, zip et pyarrow libèrent le GIL).
+Les exports reçoivent des lots déjà équilibrés et ne doivent pas les modifier.
+Si le producteur ou un export échoue, le flux des autres exports s'interrompt
+par une erreur : ils suppriment leur sortie au lieu de la terminer.
+"""
+
+import logging
+import queue
+import threading
+from functools import partial
+
+from models.transaction_batch import as_batches
+from utils.instrumentation import as_metrics
+from utils.validators import iter_balanced_batches
+
+logger = logging.getLogger(__name__)
+
+# Lots en attente par export
+DEFAULT_QUEUE_SIZE = 4
+
+# Fin du flux
+_DONE = object()
+
+
+def _exporters():
+    """Fonctions d'export par format (chargées à la demande)"""
+    from .csv_exporter import export_to_csv
+    from .excel_exporter import export_to_excel
+
+    def export_to_parquet(*args, **kwargs):
+        from .parquet_exporter import export_to_parquet
+        return export_to_parquet(*args, **kwargs)
+
+    return {"csv": export_to_csv, "excel": export_to_excel, "parquet": export_to_parquet}
+
+
+def _drain(items, failed):
+    """
+    Lots d'une file, jusqu'à la fin du flux
+
+    Raises:
+        RuntimeError: Le producteur ou un autre consommateur a échoué : le flux est
+            incomplet et ne doit pas être terminé comme un flux normal
+    """
+    while True:
+        item = items.get()
+        if failed.is_set():
+            raise RuntimeError("Flux interrompu par l'échec d'un autre export")
+        if item is _DONE:
+            return
+        yield item
+
+
+def fan_out(batches, sinks, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Transmet chaque lot d'un flux à plusieurs consommateurs exécutés en parallèle
+
+    Args:
+        batches (iterable): Lots à transmettre (lus une seule fois)
+        sinks (list): Consommateurs, appelés chacun avec un itérable de lots ; leur
+            valeur de retour est renvoyée. Si le producteur ou un consommateur échoue,
+            l'itérable des autres lève RuntimeError au lieu de se terminer normalement.
+        queue_size (int, optional): Lots en attente par consommateur. Par défaut à 4.
+
+    Returns:
+        list: Valeurs de retour des consommateurs, dans l'ordre
+
+    Raises:
+        Exception: Erreur du producteur, ou première erreur d'un consommateur (les
+            autres sont arrêtés)
+    """
+    failed = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in sinks]
+    results = [None] * len(sinks)
+    errors = []
+
+    def run(index, sink):
+        try:
+            results[index] = sink(_drain(queues[index], failed))
+        except BaseException as error:
+            errors.append(error)
+            failed.set()
+        finally:
+            # Vide la file : le producteur n'attend jamais un consommateur arrêté
+            while True:
+                try:
+                    queues[index].get_nowait()
+                except queue.Empty:
+                    break
+
+    threads = [threading.Thread(target=run, args=(index, sink), daemon=True) for index, sink in enumerate(sinks)]
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in batches:
+            for index, items in enumerate(queues):
+                while threads[index].is_alive():
+                    try:
+                        items.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            if failed.is_set():
+                break
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        for index, items in enumerate(queues):
+            while threads[index].is_alive():
+                try:
+                    items.put(_DONE, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def export_many(batches, outputs, balance=True, options=None, metrics=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Exporte un même flux de lots dans plusieurs formats, en une seule passe
+
+    Args:
+        batches (TransactionBatch | iterable): Transactions à exporter (lot, flux de lots
+            ou liste de lignes), lues une seule fois
+        outputs (dict): Fichier à générer par format ("csv", "excel", "parquet")
+        balance (bool, optional): Vérifie et corrige l'équilibre des écritures, une seule fois
+            pour tous les formats. Par défaut à True.
+        options (dict, optional): Options d'export par format, par exemple
+            {"csv": {"compression": "gzip"}, "parquet": {"amounts": "cents"}}. Par défaut, aucune.
+        metrics (Metrics, optional): Mesures (voir utils.instrumentation). Par défaut à None.
+        queue_size (int, optional): Lots en attente par format. Par défaut à 4.
+
+    Returns:
+        dict: Chemin du fichier généré par format
+
+    Raises:
+        Exception: Erreur de la génération ou d'un export ; les exports interrompus
+            suppriment leur fichier partiel
+    """
+    exporters = _exporters()
+    unknown = sorted(set(outputs) - set(exporters))
+    if unknown:
+        raise ValueError(f"Format inconnu: {', '.join(unknown)} (attendu: {', '.join(exporters)})")
+    metrics = as_metrics(metrics)
+    options = options or {}
+
+    batches = as_batches(batches)
+    counts = {"fixed": 0, "errors": 0}
+    if balance:
+        def balanced(batches):
+            for batch, fixed, errors in metrics.timed("balance", iter_balanced_batches(batches)):
+                counts["fixed"] += fixed
+                counts["errors"] += errors
+                yield batch
+        batches = balanced(batches)
+
+    formats = list(outputs)
+    sinks = [partial(exporters[format], filename=outputs[format], balance=False, metrics=metrics,
+                     **options.get(format, {}))
+             for format in formats]
+    filenames = fan_out(batches, sinks, queue_size)
+
+    if counts["fixed"]:
+        logger.info("Correction automatique des écritures non équilibrées: %d", counts["fixed"])
+        if counts["errors"]:
+            logger.warning("ATTENTION: Le FEC contient toujours des erreurs après correction (%d écritures)",
+                           counts["errors"])
+        else:
+            logger.info("Corrections appliquées avec succès")
+    return dict(zip(formats, filenames))
@@ -0,0 +1,153 @@
+"""
+Mise en forme rapide des lignes FEC (séparateur |, fin de ligne CRLF)
+
+Produit exactement le texte de csv.writer(delimiter='|') sans construire de
+dictionnaire ni examiner chaque champ : les colonnes fixes (journal, compte,
+auxiliaire, lettrage) sont mises en forme une fois par processus, les montants
+sont formatés depuis les centimes et chaque lot est assemblé en un seul bloc.
+"""
+
+import csv
+import io
+from functools import lru_cache
+
+import numpy as np
+
+from models.vectorized import get_tables
+
+# Les colonnes du FEC dans l'ordre requis
+FEC_COLUMNS = [
+    "JournalCode", "JournalLib", "EcritureNum", "EcritureDate",
+    "CompteNum", "CompteLib", "CompAuxNum", "CompAuxLib",
+    "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
+    "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise"
+]
+
+# Colonne du type d'anomalie (hors FEC, pour l'entraînement des modèles de détection)
+ANOMALY_COLUMN = "anomaly_type"
+
+# Fin de ligne du module csv
+LINE_TERMINATOR = "\r\n"
+
+# Taille du tampon d'écriture des fichiers FEC
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Caractères imposant des guillemets (règles QUOTE_MINIMAL du module csv)
+_SPECIAL_CHARS = ("|", '"', "\r", "\n")
+
+
+def quote_field(text):
+    """
+    Met en forme un champ comme csv.writer(delimiter='|')
+
+    Args:
+        text (str): Valeur du champ
+
+    Returns:
+        str: Champ, entre guillemets si nécessaire
+    """
+    if not any(char in text for char in _SPECIAL_CHARS):
+        return text
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter="|", lineterminator="").writerow([text])
+    return buffer.getvalue()
+
+
+def format_row(fields):
+    """Met en forme une ligne complète (en-tête ou ligne isolée)"""
+    return "|".join(quote_field(str(field)) for field in fields) + LINE_TERMINATOR
+
+
+# En-tête du fichier FEC
+FEC_HEADER = format_row(FEC_COLUMNS)
+
+
+def fec_header(anomaly_label=False):
+    """
+    Retourne la ligne d'en-tête
+
+    Args:
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+
+    Returns:
+        str: En-tête, terminé par CRLF
+    """
+    return format_row(FEC_COLUMNS + [ANOMALY_COLUMN]) if anomaly_label else FEC_HEADER
+
+
+def _joined(*columns):
+    """Concatène des colonnes de texte, chaque valeur suivie du séparateur"""
+    return np.array(["".join(quote_field(value) + "|" for value in values) for values in zip(*columns)],
+                    dtype=object)
+
+
+@lru_cache(maxsize=None)
+def static_columns():
+    """
+    Colonnes fixes déjà mises en forme, indexées comme les tables vectorisées
+
+    Returns:
+        dict: 'journal' (JournalCode|JournalLib|), 'account' (CompteNum|CompteLib|),
+            'aux' (CompAuxNum|CompAuxLib|) et 'lettering' (EcritureLet|)
+    """
+    tables = get_tables()
+    return {
+        "journal": _joined(tables.journal_codes_text, tables.journal_libs_text),
+        "account": _joined(tables.accounts_text, tables.account_labels_text),
+        "aux": _joined(tables.aux_codes_text, tables.aux_libs_text),
+        "lettering": _joined(tables.letterings_text),
+    }
+
+
+def format_lines(batch, anomaly_label=False):
+    """
+    Met en forme les lignes d'un lot au format FEC (sans en-tête)
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+
+    Returns:
+        str: Lignes FEC, terminées par CRLF
+    """
+    return "".join(format_line_list(batch, anomaly_label))
+
+
+def format_line_list(batch, anomaly_label=False):
+    """
+    Met en forme les lignes d'un lot au format FEC, une chaîne par ligne
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+
+    Returns:
+        list: Lignes FEC, terminées par CRLF
+    """
+    if not len(batch):
+        return []
+
+    static = static_columns()
+    fec = batch.fec_columns()
+
+    # Les libellés sont les seuls champs libres : guillemets seulement si nécessaire
+    labels = fec["EcritureLib"]
+    if any(char in "".join(labels) for char in _SPECIAL_CHARS):
+        labels = [quote_field(label) for label in labels]
+
+    lines = [
+        f"{journal}{ecr_num}|{ecr_date}|{account}{aux}{piece_ref}|{piece_date}|{label}|"
+        f"{debit}|{credit}|{lettering}{date_lettering}|{valid_date}||\r\n"
+        for journal, ecr_num, ecr_date, account, aux, piece_ref, piece_date, label,
+        debit, credit, lettering, date_lettering, valid_date in zip(
+            static["journal"][batch.journal].tolist(), fec["EcritureNum"].tolist(), fec["EcritureDate"].tolist(),
+            static["account"][batch.account].tolist(), static["aux"][batch.aux].tolist(),
+            fec["PieceRef"].tolist(), fec["PieceDate"].tolist(), labels,
+            fec["Debit"].tolist(), fec["Credit"].tolist(),
+            static["lettering"][batch.lettering].tolist(), fec["DateLet"].tolist(), fec["ValidDate"].tolist())
+    ]
+    if anomaly_label:
+        # Colonne supplémentaire après Idevise (les types d'anomalies n'ont pas de caractère spécial)
+        lines = [f"{line[:-2]}|{anomaly_type}\r\n"
+                 for line, anomaly_type in zip(lines, batch.anomaly_type_strings().tolist())]
+    return lines
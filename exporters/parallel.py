@@ -0,0 +1,426 @@
+"""
+Génération de plusieurs FEC (une entreprise par fichier), en série ou sur un pool de processus
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from utils.instrumentation import as_metrics, current_metrics
+from utils.seeding import RandomContext, as_seed_sequence, derive_seed
+from .compression import COMPRESSION_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+# Extension des fichiers par format
+EXTENSIONS = {"csv": "csv", "excel": "xlsx", "parquet": "parquet"}
+
+
+def ordered_map(function, jobs, workers=1, window=None):
+    """
+    Applique une fonction à des tâches, en série ou sur un pool de processus, dans l'ordre des tâches
+
+    Au plus `window` tâches sont en cours à la fois : les résultats sont rendus
+    dans l'ordre dès qu'ils sont disponibles, sans accumuler ceux des tâches
+    déjà terminées mais pas encore consommées.
+
+    Args:
+        function (callable): Fonction de niveau module (sérialisable)
+        jobs (iterable): Tâches à traiter
+        workers (int, optional): Nombre de processus ; 1 = exécution en série. Par défaut à 1.
+        window (int, optional): Nombre maximal de tâches en cours. Par défaut à 2 * workers.
+
+    Yields:
+        Résultats, dans l'ordre des tâches
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield function(job)
+        return
+
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(function, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _generate_company(job):
+    """
+    Génère et exporte le FEC d'une entreprise (exécuté dans un processus du pool)
+
+    Chaque entreprise reçoit sa propre sous-graine : ses paramètres et ses
+    écritures ne dépendent ni du nombre de processus ni de l'ordre d'exécution.
+
+    Args:
+        job (dict): Numéro d'entreprise, formats, répertoires par format, moteur et sous-graine
+
+    Returns:
+        dict: Informations sur les fichiers générés ("filename" : fichier du premier format,
+            "files" : fichier par format)
+    """
+    # Import here to avoid circular import
+    from generator import FECGenerator
+
+    # Flux aléatoire propre à l'entreprise
+    rng = RandomContext(job["seed"]).random
+
+    i = job["index"]
+
+    # Varier les paramètres pour chaque FEC
+    company_name = f"ENTREPRISE_{i} SAS"
+    siren = f"{rng.randrange(10 ** 9):09d}"
+
+    # Différentes périodes comptables
+    year = 2023
+    start_date = f"{year}-01-01"
+    end_date = f"{year}-12-31"
+
+    # Varier le nombre de transactions et le taux d'anomalies
+    transaction_count = rng.randint(300, 1000)
+    anomaly_rate = rng.uniform(0.03, 0.15)
+
+    # Créer un nouveau générateur avec ces paramètres
+    generator = FECGenerator(
+        company_name=company_name,
+        siren=siren,
+        start_date=start_date,
+        end_date=end_date,
+        transaction_count=transaction_count,
+        anomaly_rate=anomaly_rate,
+        engine=job["engine"],
+        seed=job["seed"],
+        metrics=current_metrics()
+    )
+
+    # Générer et exporter le FEC
+    formats = job_formats(job["format"])
+    files = {format: os.path.join(job["output_dir"][format], f"{job['base_filename']}{i}_{year}.{EXTENSIONS[format]}")
+             for format in formats}
+    if len(formats) > 1:
+        # Mêmes écritures dans tous les formats : une génération, des exports en parallèle
+        files = generator.export_many(files)
+    elif formats[0] == "excel":
+        generator.generate_transactions()
+        generator.export_to_excel(files["excel"])
+    elif formats[0] == "parquet":
+        generator.export_to_parquet(files["parquet"], stream=True)
+    else:
+        generator.export_to_csv(files["csv"], stream=True)
+
+    return {
+        "filename": files[formats[0]],
+        "files": files,
+        "company": company_name,
+        "transaction_count": transaction_count,
+        "anomaly_rate": anomaly_rate,
+        "anomaly_count": int(transaction_count * anomaly_rate)
+    }
+
+
+def generate_companies(count, base_filename, output_dir, format="csv", workers=1, seed=None, engine="python",
+                       metrics=None):
+    """
+    Génère plusieurs FEC avec des caractéristiques différentes
+
+    Args:
+        count (int): Nombre de fichiers à générer
+        base_filename (str): Préfixe du nom de fichier
+        output_dir (str | dict): Répertoire de sortie, ou répertoire par format
+        format (str | list, optional): "csv", "excel", "parquet", "both" (CSV et Excel) ou liste
+            de formats ; plusieurs formats contiennent les mêmes entreprises et écritures,
+            générées une seule fois. Par défaut à "csv".
+        workers (int, optional): Nombre de processus ; 1 = génération en série. Par défaut à 1.
+        seed (int, optional): Graine globale ; chaque entreprise en dérive un flux indépendant.
+            Par défaut à None (tirages non reproductibles).
+        engine (str, optional): Moteur de génération ("python" ou "numpy"). Par défaut à "python".
+        metrics (Metrics, optional): Mesures cumulées de toutes les entreprises, y compris
+            celles des processus (voir Metrics.map). Par défaut à None.
+
+    Returns:
+        list: Liste des informations sur les fichiers générés, dans l'ordre des entreprises
+    """
+    # Création des répertoires de sortie
+    formats = job_formats(format)
+    if not isinstance(output_dir, dict):
+        output_dir = dict.fromkeys(formats, output_dir)
+    for directory in set(output_dir[fmt] for fmt in formats):
+        os.makedirs(directory, exist_ok=True)
+
+    # Une sous-graine par entreprise, dérivée de la graine globale
+    root_seed = as_seed_sequence(seed)
+    jobs = [{
+        "index": i,
+        "format": formats,
+        "base_filename": base_filename,
+        "output_dir": output_dir,
+        "engine": engine,
+        "seed": derive_seed(root_seed, i),
+    } for i in range(1, count + 1)]
+
+    label = {"excel": "FEC Excel", "parquet": "FEC Parquet"}.get(formats[0], "FEC") if len(formats) == 1 \
+        else f"FEC ({', '.join(formats)})"
+    generated_files = []
+
+    # Résultats dans l'ordre des entreprises, quel que soit l'ordre de fin des processus
+    for i, info in enumerate(as_metrics(metrics).map(_generate_company, jobs, workers), start=1):
+        generated_files.append(info)
+        logger.info("Généré %s %d/%d: %s", label, i, count, ", ".join(info["files"].values()))
+
+    return generated_files
+
+
+# Paramètres d'une tâche transmis à FECGenerator
+GENERATOR_KEYS = ("company_name", "siren", "start_date", "end_date", "journal_count", "transaction_count",
+                  "anomaly_rate", "anomaly_rates", "balanced_anomalies", "engine", "seed", "workers", "cache")
+
+# Paramètres d'export d'une tâche ("year" : exercice civil, si start_date/end_date manquent)
+EXPORT_KEYS = ("name", "year", "format", "output", "output_dir", "compression", "compression_level", "part_lines",
+               "anomaly_label")
+
+# Formats d'export des tâches ("both" : CSV et Excel)
+JOB_FORMATS = ("csv", "excel", "parquet", "both")
+
+
+def job_formats(format):
+    """
+    Normalise le format d'une tâche en liste de formats
+
+    Args:
+        format (str | list): "csv", "excel", "parquet", "both" ou liste de ces formats
+
+    Returns:
+        list: Formats d'export, sans doublon, dans l'ordre donné
+    """
+    formats = [format] if isinstance(format, str) else list(format)
+    expanded = []
+    for name in formats:
+        if name not in JOB_FORMATS:
+            raise ValueError(f"Format inconnu: {name!r} (attendu: {', '.join(JOB_FORMATS)})")
+        for fmt in (("csv", "excel") if name == "both" else (name,)):
+            if fmt not in expanded:
+                expanded.append(fmt)
+    return expanded
+
+
+# Paramètres entiers d'une tâche : valeur minimale (None : non bornée)
+JOB_INTEGERS = {"journal_count": 1, "transaction_count": 1, "workers": 1, "seed": 0, "year": 1,
+                "part_lines": 1, "compression_level": None}
+
+# Paramètres booléens et textes d'une tâche
+JOB_BOOLEANS = ("balanced_anomalies", "anomaly_label")
+JOB_STRINGS = ("company_name", "siren", "name", "output", "output_dir", "cache")
+
+
+def _check_rate(key, value):
+    """Vérifie un taux d'anomalies (nombre entre 0 et 1)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError(f"{key} doit être un nombre entre 0 et 1 (reçu: {value!r})")
+
+
+def _check_date(key, value):
+    """Vérifie une date de tâche (AAAA-MM-JJ) et la retourne"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} doit être une date AAAA-MM-JJ (reçu: {value!r})") from None
+
+
+def validate_job(job):
+    """
+    Vérifie les paramètres d'une tâche avant son exécution
+
+    Clés connues, types et bornes : entiers positifs (nombres d'écritures, de
+    journaux, de processus...), taux entre 0 et 1, dates AAAA-MM-JJ ordonnées,
+    moteur, format et compression connus. Les paramètres à None sont ignorés.
+
+    Args:
+        job (dict): Paramètres de la tâche
+
+    Raises:
+        ValueError: Paramètre inconnu ou valeur invalide
+    """
+    # Import here to avoid circular import
+    from generator import ENGINES
+    from utils.anomalies import anomaly_mix
+
+    unknown = sorted(set(job) - set(GENERATOR_KEYS) - set(EXPORT_KEYS))
+    if unknown:
+        raise ValueError(f"Paramètres inconnus: {', '.join(unknown)}")
+    values = {key: value for key, value in job.items() if value is not None}
+
+    for key, minimum in JOB_INTEGERS.items():
+        value = values.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or (minimum is not None and value < minimum):
+            bound = f" >= {minimum}" if minimum is not None else ""
+            raise ValueError(f"{key} doit être un entier{bound} (reçu: {value!r})")
+    for key in JOB_BOOLEANS:
+        if key in values and not isinstance(values[key], bool):
+            raise ValueError(f"{key} doit être un booléen (reçu: {values[key]!r})")
+    for key in JOB_STRINGS:
+        if key in values and not isinstance(values[key], str):
+            raise ValueError(f"{key} doit être une chaîne (reçu: {values[key]!r})")
+
+    if "anomaly_rate" in values:
+        _check_rate("anomaly_rate", values["anomaly_rate"])
+    if "anomaly_rates" in values:
+        rates = values["anomaly_rates"]
+        if not isinstance(rates, dict):
+            raise ValueError(f"anomaly_rates doit être un objet type -> taux (reçu: {rates!r})")
+        for name, rate in rates.items():
+            _check_rate(f"anomaly_rates[{name!r}]", rate)
+        total, _ = anomaly_mix(rates)
+        if total > 1:
+            raise ValueError(f"La somme des taux d'anomalies dépasse 1 ({total:g})")
+
+    start = _check_date("start_date", values["start_date"]) if "start_date" in values else None
+    end = _check_date("end_date", values["end_date"]) if "end_date" in values else None
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"start_date ({values['start_date']}) postérieure à end_date ({values['end_date']})")
+
+    if values.get("engine", "python") not in ENGINES:
+        raise ValueError(f"Moteur inconnu: {values['engine']!r} (attendu: {', '.join(ENGINES)})")
+    if values.get("compression") is not None and values["compression"] not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compression inconnue: {values['compression']!r} "
+                         f"(attendu: {', '.join(COMPRESSION_SUFFIXES)})")
+    job_formats(values.get("format", "csv"))
+
+
+def _export_options(job, format):
+    """Options d'export d'une tâche pour un format"""
+    keys = {"csv": ("compression", "compression_level", "part_lines", "anomaly_label"),
+            "excel": ("anomaly_label",),
+            "parquet": ("anomaly_label",)}[format]
+    return {key: job[key] for key in keys if job.get(key) is not None}
+
+
+def _file_size(filename):
+    """Taille d'un fichier généré (somme des parties pour le manifeste d'un CSV découpé)"""
+    if filename.endswith(".manifest.json"):
+        with open(filename, encoding="utf-8") as manifest:
+            return sum(part["bytes"] for part in json.load(manifest)["parts"])
+    return os.path.getsize(filename)
+
+
+def run_job(job):
+    """
+    Génère et exporte le FEC d'une tâche (exécuté dans un processus du pool)
+
+    Une tâche en erreur n'interrompt pas les autres : l'erreur est renvoyée
+    dans le résultat.
+
+    Args:
+        job (dict): Paramètres de FECGenerator (GENERATOR_KEYS) et d'export (EXPORT_KEYS)
+
+    Returns:
+        dict: Nom, statut, fichiers produits (format, chemin, octets), lignes,
+            durée, débit, anomalies tirées mais non appliquées et durées par étape
+    """
+    # Import here to avoid circular import
+    from generator import FECGenerator
+    from utils.instrumentation import ANOMALIES_SKIPPED, LINES_CACHED, LINES_GENERATED, Metrics
+
+    start = time.perf_counter()
+    metrics = Metrics(count_rng=False)
+    result = {"name": job.get("name") or job.get("output") or job.get("company_name"), "status": "ok", "files": []}
+    try:
+        validate_job(job)
+        if job.get("year") is not None:
+            job = dict({"start_date": f"{job['year']}-01-01", "end_date": f"{job['year']}-12-31"}, **job)
+        generator = FECGenerator(metrics=metrics, **{key: job[key] for key in GENERATOR_KEYS if key in job})
+        output = job.get("output") or f"{generator.siren}FEC{generator.end_date:%Y%m%d}"
+        result["name"] = result["name"] or output
+        formats = job_formats(job.get("format", "csv"))
+
+        outputs = {format: os.path.join(job.get("output_dir", "."), f"{output}.{EXTENSIONS[format]}")
+                   for format in formats}
+        if len(formats) == 1:
+            # Un seul format : export en flux
+            format = formats[0]
+            export = getattr(generator, {"csv": "export_to_csv", "excel": "export_to_excel",
+                                         "parquet": "export_to_parquet"}[format])
+            outputs[format] = export(outputs[format], stream=True, **_export_options(job, format))
+        else:
+            # Plusieurs formats : génération et équilibrage uniques, exports en parallèle
+            outputs = generator.export_many(outputs, {format: _export_options(job, format) for format in formats})
+        for format, filename in outputs.items():
+            result["files"].append({"format": format, "filename": filename, "bytes": _file_size(filename)})
+    except Exception as error:
+        result.update(status="error", error=f"{type(error).__name__}: {error}")
+
+    seconds = time.perf_counter() - start
+    lines = metrics.counters[LINES_GENERATED] + metrics.counters[LINES_CACHED]
+    result.update(lines=lines, bytes=sum(file["bytes"] for file in result["files"]), seconds=round(seconds, 3),
+                  lines_per_sec=round(lines / seconds, 1) if seconds else None,
+                  anomalies_skipped=metrics.counters[ANOMALIES_SKIPPED], stages=metrics.summary()["stages"])
+    return result
+
+
+def run_jobs(jobs, workers=1, seed=None):
+    """
+    Exécute des tâches de génération sur un pool de processus partagé
+
+    Au plus `workers` tâches s'exécutent à la fois. Les tâches sans graine en
+    reçoivent une dérivée de `seed` et de leur rang : le lot est reproductible.
+    Sur un pool, chaque tâche génère ses partitions en série (pas de pool imbriqué).
+
+    Args:
+        jobs (list): Paramètres des tâches (voir run_job)
+        workers (int, optional): Nombre de tâches simultanées. Par défaut à 1.
+        seed (int, optional): Graine globale des tâches sans graine. Par défaut à None.
+
+    Returns:
+        list: Résultats des tâches (voir run_job), dans l'ordre des tâches
+    """
+    root_seed = as_seed_sequence(seed) if seed is not None else None
+    prepared = []
+    for i, job in enumerate(jobs):
+        job = dict(job)
+        if root_seed is not None and job.get("seed") is None:
+            job["seed"] = derive_seed(root_seed, i)
+        if workers > 1:
+            job["workers"] = 1
+        prepared.append(job)
+
+    results = []
+    for i, result in enumerate(ordered_map(run_job, prepared, workers), start=1):
+        results.append(result)
+        if result["status"] == "ok":
+            logger.info("Tâche %d/%d terminée: %s (%d lignes, %.1f s)", i, len(prepared), result["name"],
+                        result["lines"], result["seconds"])
+        else:
+            logger.error("Tâche %d/%d en erreur: %s (%s)", i, len(prepared), result["name"], result["error"])
+    return results
+
+
+def summarize_jobs(results, seconds):
+    """
+    Rapport d'exécution d'un lot de tâches
+
+    Args:
+        results (list): Résultats de run_jobs
+        seconds (float): Durée totale de l'exécution
+
+    Returns:
+        dict: Totaux (tâches, erreurs, lignes, octets, débit global) et résultats par tâche
+    """
+    lines = sum(result["lines"] for result in results)
+    return {
+        "jobs": len(results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "lines": lines,
+        "bytes": sum(result["bytes"] for result in results),
+        "seconds": round(seconds, 3),
+        "lines_per_sec": round(lines / seconds, 1) if seconds else None,
+        "results": results,
+    }
@@ -0,0 +1,261 @@
+"""
+Fonctions d'exportation Parquet / Arrow pour le générateur FEC
+
+Les colonnes sont construites directement depuis les colonnes du lot, sans
+passer par le texte : les colonnes répétitives (journal, compte, auxiliaire,
+lettrage, type d'anomalie) sont encodées en dictionnaire à partir des indices,
+les dates sont des date32 et les montants des décimaux exacts (ou des
+centimes entiers).
+"""
+
+import logging
+import os
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from models.transaction_batch import as_batches
+from models.vectorized import get_tables
+from utils.anomalies import ANOMALY_TYPES
+from utils.instrumentation import BYTES_WRITTEN, LINES_WRITTEN, as_metrics
+from utils.validators import iter_balanced_batches
+from .fec_writer import ANOMALY_COLUMN
+
+# Nombre de lignes par groupe de lignes Parquet
+DEFAULT_ROW_GROUP_SIZE = 500000
+
+# Représentations possibles des montants
+AMOUNT_TYPES = ("decimal", "cents")
+
+# Montants décimaux : 18 chiffres dont 2 décimales
+DECIMAL_TYPE = pa.decimal128(18, 2)
+
+_EPOCH = date(1970, 1, 1)
+
+logger = logging.getLogger(__name__)
+
+
+def _dictionary(indices_type):
+    return pa.dictionary(indices_type, pa.string())
+
+
+def arrow_schema(amounts="decimal", anomaly_label=True):
+    """
+    Schéma Arrow des 18 colonnes FEC (et du type d'anomalie)
+
+    Args:
+        amounts (str, optional): "decimal" (décimal 18,2) ou "cents" (entiers). Par défaut à "decimal".
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à True.
+
+    Returns:
+        pyarrow.Schema: Schéma des lots exportés
+    """
+    if amounts not in AMOUNT_TYPES:
+        raise ValueError(f"Représentation des montants inconnue: {amounts!r} (attendu: {', '.join(AMOUNT_TYPES)})")
+    amount_type = DECIMAL_TYPE if amounts == "decimal" else pa.int64()
+    amount_metadata = {"unit": "cents"} if amounts == "cents" else None
+
+    fields = [
+        pa.field("JournalCode", _dictionary(pa.int8()), nullable=False),
+        pa.field("JournalLib", _dictionary(pa.int8()), nullable=False),
+        pa.field("EcritureNum", pa.string(), nullable=False),
+        pa.field("EcritureDate", pa.date32(), nullable=False),
+        pa.field("CompteNum", _dictionary(pa.int16()), nullable=False),
+        pa.field("CompteLib", _dictionary(pa.int16()), nullable=False),
+        pa.field("CompAuxNum", _dictionary(pa.int16())),
+        pa.field("CompAuxLib", _dictionary(pa.int16())),
+        pa.field("PieceRef", pa.string(), nullable=False),
+        pa.field("PieceDate", pa.date32(), nullable=False),
+        pa.field("EcritureLib", pa.string(), nullable=False),
+        pa.field("Debit", amount_type, nullable=False, metadata=amount_metadata),
+        pa.field("Credit", amount_type, nullable=False, metadata=amount_metadata),
+        pa.field("EcritureLet", _dictionary(pa.int16())),
+        pa.field("DateLet", pa.date32()),
+        pa.field("ValidDate", pa.date32(), nullable=False),
+        pa.field("Montantdevise", amount_type, metadata=amount_metadata),
+        pa.field("Idevise", pa.string()),
+    ]
+    if anomaly_label:
+        fields.append(pa.field(ANOMALY_COLUMN, _dictionary(pa.int8())))
+    return pa.schema(fields)
+
+
+@lru_cache(maxsize=None)
+def _dictionaries():
+    """Dictionnaires des colonnes encodées (une fois par processus)"""
+    tables = get_tables()
+    return {
+        "journal_codes": pa.array(tables.journal_codes, pa.string()),
+        "journal_libs": pa.array(tables.journal_libs, pa.string()),
+        "accounts": pa.array(tables.accounts, pa.string()),
+        "account_labels": pa.array(tables.account_labels, pa.string()),
+        "aux_codes": pa.array(tables.aux_codes, pa.string()),
+        "aux_libs": pa.array(tables.aux_libs, pa.string()),
+        "letterings": pa.array(tables.letterings, pa.string()),
+    }
+
+
+def _encoded(indices, dictionary):
+    """Colonne encodée en dictionnaire à partir d'indices (-1 : valeur absente)"""
+    missing = indices < 0
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indices, mask=missing if missing.any() else None), dictionary)
+
+
+def _dates(offsets, epoch_offset, missing=None):
+    """Colonne date32 à partir de décalages en jours"""
+    days = offsets.astype(np.int32) + np.int32(epoch_offset)
+    return pa.array(days, type=pa.date32(), mask=missing if missing is not None and missing.any() else None)
+
+
+def _decimal_amounts(cents):
+    """
+    Montants décimaux (18,2) exacts, construits sans conversion depuis les centimes
+
+    Un décimal128 est stocké comme un entier de 128 bits (petit-boutiste) valant
+    le montant en centimes : poids faible = centimes, poids fort = extension du signe.
+    """
+    words = np.empty((len(cents), 2), dtype=np.int64)
+    words[:, 0] = cents
+    words[:, 1] = cents >> 63
+    return pa.Array.from_buffers(DECIMAL_TYPE, len(cents), [None, pa.py_buffer(words)])
+
+
+def batch_to_arrow(batch, amounts="decimal", anomaly_label=True):
+    """
+    Convertit un lot en RecordBatch Arrow
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures
+        amounts (str, optional): "decimal" (décimal 18,2) ou "cents" (entiers). Par défaut à "decimal".
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à True.
+
+    Returns:
+        pyarrow.RecordBatch: Lignes au schéma arrow_schema(amounts, anomaly_label)
+    """
+    schema = arrow_schema(amounts, anomaly_label)
+    dictionaries = _dictionaries()
+    size = len(batch)
+    epoch_offset = (batch.base_date.date() - _EPOCH).days
+    unlettered = batch.lettering < 0
+
+    if amounts == "decimal":
+        debit, credit = _decimal_amounts(batch.debit), _decimal_amounts(batch.credit)
+    else:
+        debit, credit = pa.array(batch.debit), pa.array(batch.credit)
+
+    arrays = [
+        _encoded(batch.journal, dictionaries["journal_codes"]),
+        _encoded(batch.journal, dictionaries["journal_libs"]),
+        pa.array(batch.ecr_num_strings(), pa.string()),
+        _dates(batch.date, epoch_offset),
+        _encoded(batch.account, dictionaries["accounts"]),
+        _encoded(batch.account, dictionaries["account_labels"]),
+        _encoded(batch.aux, dictionaries["aux_codes"]),
+        _encoded(batch.aux, dictionaries["aux_libs"]),
+        pa.array(batch.piece_ref_strings(), pa.string()),
+        _dates(batch.piece_date, epoch_offset),
+        pa.array(batch.label, pa.string()),
+        debit,
+        credit,
+        _encoded(batch.lettering, dictionaries["letterings"]),
+        _dates(batch.date_lettering, epoch_offset, unlettered),
+        _dates(batch.valid_date, epoch_offset),
+        pa.nulls(size, schema.field("Montantdevise").type),
+        pa.nulls(size, pa.string()),
+    ]
+    if anomaly_label:
+        # Registre extensible : dictionnaire construit à partir des types enregistrés
+        arrays.append(_encoded(batch.anomaly, pa.array(ANOMALY_TYPES, pa.string())))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def parquet_options(filename):
+    """
+    Options d'export d'un fichier Parquet existant (représentation des montants, type d'anomalie)
+
+    Args:
+        filename (str): Fichier Parquet produit par export_to_parquet
+
+    Returns:
+        dict: Options "amounts" et "anomaly_label" à passer à export_to_parquet
+    """
+    schema = pq.read_schema(filename)
+    return {"amounts": "decimal" if pa.types.is_decimal(schema.field("Debit").type) else "cents",
+            "anomaly_label": ANOMALY_COLUMN in schema.names}
+
+
+def export_to_parquet(transactions, filename="FEC_EXAMPLE.parquet", balance=True, amounts="decimal",
+                      anomaly_label=True, compression="zstd", row_group_size=DEFAULT_ROW_GROUP_SIZE, metrics=None):
+    """
+    Exporte les transactions au format Parquet
+
+    Les lots sont convertis au fil de l'eau et écrits par groupes d'environ
+    row_group_size lignes : seul le groupe en cours est conservé en mémoire.
+
+    Args:
+        transactions (TransactionBatch | iterable): Transactions à exporter (lot, flux de lots
+            ou liste de lignes)
+        filename (str, optional): Nom du fichier Parquet à générer. Par défaut à "FEC_EXAMPLE.parquet".
+        balance (bool, optional): Vérifie et corrige l'équilibre des écritures. Par défaut à True.
+        amounts (str, optional): "decimal" (décimal 18,2) ou "cents" (entiers). Par défaut à "decimal".
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à True.
+        compression (str, optional): Codec Parquet ("zstd", "snappy", "gzip", "none"...). Par défaut à "zstd".
+        row_group_size (int, optional): Lignes par groupe de lignes. Par défaut à 500000.
+        metrics (Metrics, optional): Mesures des étapes "balance" et "write" (voir
+            utils.instrumentation). Par défaut à None.
+
+    Returns:
+        str: Chemin du fichier généré
+    """
+    metrics = as_metrics(metrics)
+    schema = arrow_schema(amounts, anomaly_label)
+
+    # Création du répertoire de sortie si nécessaire
+    os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
+
+    batches = as_batches(transactions)
+    if balance:
+        # Correction des écritures non équilibrées, lot par lot
+        batches = (batch for batch, _, _ in metrics.timed("balance", iter_balanced_batches(batches)))
+
+    line_count = 0
+    anomaly_count = 0
+    pending = []
+    pending_rows = 0
+
+    try:
+        with metrics.stage("write"), pq.ParquetWriter(filename, schema, compression=compression) as writer:
+            for batch in batches:
+                if not len(batch):
+                    continue
+                pending.append(batch_to_arrow(batch, amounts, anomaly_label))
+                pending_rows += len(batch)
+                line_count += len(batch)
+                metrics.add(LINES_WRITTEN, len(batch))
+                anomaly_count += int(np.count_nonzero(batch.anomaly >= 0))
+                if pending_rows >= row_group_size:
+                    # Groupes complets écrits ; le reste attend les lots suivants
+                    table = pa.Table.from_batches(pending, schema)
+                    full = pending_rows - pending_rows % row_group_size
+                    writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+                    pending = table.slice(full).to_batches()
+                    pending_rows -= full
+            if pending:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+    except BaseException:
+        # Écriture interrompue : fichier partiel supprimé
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
+    metrics.add(BYTES_WRITTEN, os.path.getsize(filename))
+
+    logger.info("FEC exporté avec succès en Parquet: %s", filename)
+    logger.info("Nombre de transactions: %d", line_count)
+    if anomaly_label:
+        logger.info("Lignes avec anomalie: %d", anomaly_count)
+
+    return filename
@@ -0,0 +1,290 @@
+"""
+Écriture en flux de classeurs Excel (.xlsx) pour le générateur FEC
+
+Les feuilles sont écrites directement en SpreadsheetML dans l'archive zip,
+lot par lot : la mémoire reste constante quel que soit le nombre de lignes.
+Une nouvelle feuille est ouverte automatiquement à la limite d'Excel
+(1 048 576 lignes, en-tête compris).
+"""
+
+import os
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from models.vectorized import get_tables
+from utils.formatters import format_cents
+from .fec_writer import ANOMALY_COLUMN, FEC_COLUMNS
+
+# Nombre maximal de lignes d'une feuille Excel (en-tête compris)
+EXCEL_MAX_ROWS = 1048576
+
+# Niveau de compression zlib des feuilles (1 : le plus rapide)
+DEFAULT_COMPRESSLEVEL = 1
+
+# Caractères à échapper dans le texte XML
+_XML_SPECIAL_CHARS = ("&", "<", ">")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}<Relationship Id="rId{styles}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+_WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+# Styles : 0 = normal, 1 = en-tête en gras
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def text_cell(value, style=0):
+    """Cellule texte (chaîne en ligne) ; cellule vide si la valeur est vide"""
+    if value == "":
+        return "<c/>"
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def _cells(*columns):
+    """Concatène des colonnes de texte en cellules XML"""
+    return np.array(["".join(text_cell(value) for value in values) for values in zip(*columns)], dtype=object)
+
+
+@lru_cache(maxsize=None)
+def static_cells():
+    """
+    Cellules fixes déjà mises en forme, indexées comme les tables vectorisées
+
+    Returns:
+        dict: 'journal', 'account', 'aux' (deux cellules chacune) et 'lettering'
+    """
+    tables = get_tables()
+    return {
+        "journal": _cells(tables.journal_codes_text, tables.journal_libs_text),
+        "account": _cells(tables.accounts_text, tables.account_labels_text),
+        "aux": _cells(tables.aux_codes_text, tables.aux_libs_text),
+        "lettering": _cells(tables.letterings_text),
+    }
+
+
+def _text_cells(values):
+    """Cellules texte d'une colonne générée (dates, références, libellés)"""
+    values = np.asarray(values, dtype=object)
+    if any(char in "".join(values) for char in _XML_SPECIAL_CHARS):
+        values = np.array([escape(value) for value in values], dtype=object)
+    cells = '<c t="inlineStr"><is><t xml:space="preserve">' + values + "</t></is></c>"
+    cells[values == ""] = "<c/>"
+    return cells
+
+
+def _number_cells(cents):
+    """Cellules numériques (euros) calculées depuis les centimes"""
+    return "<c><v>" + format_cents(cents, separator=".") + "</v></c>"
+
+
+def format_rows(batch, anomaly_label=False):
+    """
+    Met en forme les lignes d'un lot en lignes de feuille SpreadsheetML
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures
+        anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+
+    Returns:
+        list: Une ligne XML (<row>) par ligne d'écriture, dans les 18 colonnes FEC
+    """
+    if not len(batch):
+        return []
+
+    static = static_cells()
+    fec = batch.fec_columns()
+    rows = [
+        f"<row>{journal}{ecr_num}{ecr_date}{account}{aux}{piece_ref}{piece_date}{label}"
+        f"{debit}{credit}{lettering}{date_lettering}{valid_date}<c/><c/></row>"
+        for journal, ecr_num, ecr_date, account, aux, piece_ref, piece_date, label,
+        debit, credit, lettering, date_lettering, valid_date in zip(
+            static["journal"][batch.journal].tolist(), _text_cells(fec["EcritureNum"]).tolist(),
+            _text_cells(fec["EcritureDate"]).tolist(),
+            static["account"][batch.account].tolist(), static["aux"][batch.aux].tolist(),
+            _text_cells(fec["PieceRef"]).tolist(), _text_cells(fec["PieceDate"]).tolist(),
+            _text_cells(fec["EcritureLib"]).tolist(),
+            _number_cells(batch.debit).tolist(), _number_cells(batch.credit).tolist(),
+            static["lettering"][batch.lettering].tolist(), _text_cells(fec["DateLet"]).tolist(),
+            _text_cells(fec["ValidDate"]).tolist())
+    ]
+    if anomaly_label:
+        rows = [f"{row[:-6]}{anomaly_type}</row>"
+                for row, anomaly_type in zip(rows, _text_cells(batch.anomaly_type_strings()).tolist())]
+    return rows
+
+
+class XLSXStreamWriter:
+    """
+    Classeur Excel écrit en flux, feuille par feuille
+
+    Chaque feuille commence par la ligne d'en-tête ; une nouvelle feuille est
+    ouverte dès que la précédente atteint max_rows lignes.
+
+    Example:
+        with XLSXStreamWriter("fec.xlsx") as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    """
+
+    def __init__(self, filename, columns=FEC_COLUMNS, max_rows=EXCEL_MAX_ROWS,
+                 sheet_name="Sheet", compresslevel=DEFAULT_COMPRESSLEVEL, anomaly_label=False):
+        """
+        Ouvre le classeur en écriture
+
+        Args:
+            filename (str): Nom du fichier .xlsx
+            columns (list, optional): En-têtes de colonnes. Par défaut, les 18 colonnes FEC.
+            max_rows (int, optional): Lignes par feuille, en-tête compris. Par défaut, la limite d'Excel.
+            sheet_name (str, optional): Préfixe des noms de feuilles (Sheet1, Sheet2...). Par défaut à "Sheet".
+            compresslevel (int, optional): Niveau de compression zlib. Par défaut à 1.
+            anomaly_label (bool, optional): Ajoute la colonne du type d'anomalie. Par défaut à False.
+        """
+        if anomaly_label:
+            columns = list(columns) + [ANOMALY_COLUMN]
+        self.anomaly_label = anomaly_label
+        self.filename = filename
+        self.header = "<row>" + "".join(text_cell(column, style=1) for column in columns) + "</row>"
+        self.max_rows = max_rows
+        self.sheet_name = sheet_name
+        self.row_count = 0
+        self.sheet_rows = []
+        self._zip = zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._sheet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _open_sheet(self):
+        """Ouvre la feuille suivante et y écrit l'en-tête"""
+        self._close_sheet()
+        self.sheet_rows.append(1)
+        index = len(self.sheet_rows)
+        self._sheet = self._zip.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True)
+        self._sheet.write((_SHEET_START + self.header).encode("utf-8"))
+
+    def _close_sheet(self):
+        if self._sheet is not None:
+            self._sheet.write(_SHEET_END.encode("utf-8"))
+            self._sheet.close()
+            self._sheet = None
+
+    def write_rows(self, rows):
+        """
+        Écrit des lignes déjà mises en forme (voir format_rows)
+
+        Args:
+            rows (list): Lignes XML (<row>)
+        """
+        start = 0
+        while start < len(rows):
+            if self._sheet is None or self.sheet_rows[-1] >= self.max_rows:
+                self._open_sheet()
+            count = min(len(rows) - start, self.max_rows - self.sheet_rows[-1])
+            self._sheet.write("".join(rows[start:start + count]).encode("utf-8"))
+            self.sheet_rows[-1] += count
+            self.row_count += count
+            start += count
+
+    def write_batch(self, batch):
+        """
+        Écrit les lignes d'un lot
+
+        Args:
+            batch (TransactionBatch): Lignes d'écritures
+        """
+        self.write_rows(format_rows(batch, self.anomaly_label))
+
+    def close(self):
+        """Termine la feuille en cours et écrit les parties du classeur"""
+        if self._zip is None:
+            return
+        if self._sheet is None and not self.sheet_rows:
+            self._open_sheet()
+        self._close_sheet()
+
+        indices = range(1, len(self.sheet_rows) + 1)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            sheets="".join(_SHEET_CONTENT_TYPE.format(index=i) for i in indices)))
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        self._zip.writestr("xl/workbook.xml", _WORKBOOK.format(
+            sheets="".join(_WORKBOOK_SHEET.format(name=f"{self.sheet_name}{i}", index=i) for i in indices)))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(
+            sheets="".join(_WORKBOOK_SHEET_REL.format(index=i) for i in indices), styles=len(self.sheet_rows) + 1))
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.close()
+        self._zip = None
+
+    def discard(self):
+        """Abandonne le classeur (écriture interrompue) : ferme et supprime le fichier"""
+        if self._zip is None:
+            return
+        if self._sheet is not None:
+            self._sheet.close()
+            self._sheet = None
+        self._zip.close()
+        self._zip = None
+        os.remove(self.filename)
@@ -2,14 +2,64 @@
 Classe principale du générateur FEC
 """
 
-import random
+import logging
+import os
 from datetime import datetime, timedelta
 
+import numpy as np
+
 from models.accounting_data import AccountingData
+from models.ledger_cache import as_cache, cache_key, output_name
 from models.transaction import Transaction
-from utils.anomalies import inject_anomalies
+from models.transaction_batch import TransactionBatch
+from utils.anomalies import anomaly_mix, inject_batch_anomalies, iter_inject_anomalies
 from utils.formatters import format_decimal, format_fec_ecr_num
-from utils.validators import validate_fec, fix_unbalanced_entries, fix_unbalanced_entries_excel
+from utils.instrumentation import (CACHE_HITS, CACHE_MISSES, LINES_CACHED, LINES_GENERATED, as_metrics,
+                                   current_metrics)
+from utils.seeding import RandomContext, derive_seed
+from utils.validators import (validate_fec, fix_unbalanced_entries, fix_unbalanced_entries_excel,
+                              iter_balanced_batches)
+
+logger = logging.getLogger(__name__)
+
+# Moteurs de génération disponibles
+ENGINES = ("python", "numpy")
+
+# Flux aléatoires NumPy dérivés de la graine
+STREAM_GENERATION = 0
+STREAM_ANOMALIES = 1
+STREAM_PLAN = 2
+STREAM_EXTENSION = 3
+
+
+def generate_partition(job):
+    """
+    Génère une partition (journal, mois) et y injecte ses anomalies
+
+    Fonction de niveau module : exécutable dans un processus d'un pool.
+    Le résultat ne dépend que de la tâche (partition et sous-graine). Les
+    mesures sont enregistrées dans current_metrics() (voir Metrics.map).
+
+    Args:
+        job (dict): Partition, période (start_date, end_date), sous-graine et options
+            des anomalies (anomaly_mix, balanced_anomalies : facultatives)
+
+    Returns:
+        TransactionBatch: Lignes de la partition, anomalies injectées
+    """
+    from models.vectorized import generate_partition_columns
+
+    metrics = current_metrics()
+    partition = job["partition"]
+    rng = metrics.counting(np.random.default_rng(job["seed"]))
+    with metrics.stage("generate"):
+        columns = generate_partition_columns(rng, partition, job["start_date"], job["end_date"])
+        batch = TransactionBatch.from_columns(columns, job["start_date"],
+                                              (0, (job["end_date"] - job["start_date"]).days))
+    metrics.add(LINES_GENERATED, len(batch))
+    with metrics.stage("anomalies"):
+        return inject_batch_anomalies(batch, partition.anomaly_count, rng, mix=job.get("anomaly_mix"),
+                                      balanced=job.get("balanced_anomalies", False))
 
 
 class FECGenerator:
@@ -25,7 +75,15 @@ class FECGenerator:
                  end_date="2024-12-31",
                  journal_count=5,
                  transaction_count=500,
-                 anomaly_rate=0.05):
+                 anomaly_rate=0.05,
+                 anomaly_rates=None,
+                 balanced_anomalies=False,
+                 engine="python",
+                 seed=None,
+                 workers=1,
+                 metrics=None,
+                 cache=None,
+                 ecr_offsets=None):
         """
         Initialise le générateur FEC
         
@@ -36,8 +94,31 @@ class FECGenerator:
             end_date (str, optional): Date de fin de période. Par défaut à "2024-12-31".
             journal_count (int, optional): Nombre de journaux. Par défaut à 5.
             transaction_count (int, optional): Nombre de transactions à générer. Par défaut à 500.
-            anomaly_rate (float, optional): Taux d'anomalies à injecter. Par défaut à 0.05.
+            anomaly_rate (float, optional): Taux d'anomalies à injecter, types équiprobables.
+                Par défaut à 0.05.
+            anomaly_rates (dict, optional): Taux par type d'anomalie (voir
+                utils.anomalies.ANOMALY_TYPES), par exemple {"round_amount": 0.02, "duplicate_ref": 0.01} ;
+                remplace anomaly_rate, qui devient leur somme. Par défaut à None.
+            balanced_anomalies (bool, optional): Les anomalies de montant modifient les deux jambes
+                de l'écriture, qui reste équilibrée : l'export saute la passe de correction
+                (qui, sinon, annule souvent l'anomalie). Par défaut à False.
+            engine (str, optional): Moteur de génération, "python" (tirages unitaires)
+                ou "numpy" (tirages vectorisés). Par défaut à "python".
+            seed (int | numpy.random.SeedSequence, optional): Graine de tous les tirages (moteurs,
+                anomalies, génération multiple) : une même graine donne des fichiers identiques,
+                en série comme en parallèle. Par défaut à None (tirages non reproductibles).
+            workers (int, optional): Nombre de processus générant les partitions (journal, mois)
+                d'un même FEC (moteur "numpy"). Par défaut à 1.
+            metrics (utils.instrumentation.Metrics, optional): Mesures de la génération et des
+                exports (durées par étape, lignes, octets, appels aléatoires). Par défaut à None.
+            cache (models.ledger_cache.LedgerCache | str, optional): Cache disque (ou son répertoire)
+                des grands livres et des exports : avec une graine, une génération déjà faite est
+                relue au lieu d'être refaite. Par défaut à None.
+            ecr_offsets (dict, optional): Dernier numéro d'écriture déjà utilisé par code journal :
+                la numérotation de chaque journal reprend à la suite (voir extend). Par défaut à None.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur inconnu: {engine!r} (attendu: {', '.join(ENGINES)})")
         
         self.company_name = company_name
         self.siren = siren
@@ -46,9 +127,20 @@ class FECGenerator:
         self.journal_count = journal_count
         self.transaction_count = transaction_count
         self.anomaly_rate = anomaly_rate
+        self.anomaly_mix = None
+        if anomaly_rates is not None:
+            self.anomaly_rate, self.anomaly_mix = anomaly_mix(anomaly_rates)
+        self.balanced_anomalies = balanced_anomalies
+        self.engine = engine
+        self.seed = seed
+        self.workers = workers
+        self.metrics = as_metrics(metrics)
+        self.cache = as_cache(cache)
+        self.ecr_offsets = dict(ecr_offsets or {})
         
         # Initialiser les structures
-        self.plan_comptable = AccountingData.get_plan_comptable()
+        self.account_index = AccountingData.get_index()
+        self.plan_comptable = self.account_index.plan_comptable
         self.journals = AccountingData.get_journals()
         self.transactions = []
         
@@ -58,23 +150,44 @@ class FECGenerator:
         # Compteurs
         self.current_ecr_id = 1
     
-    def _get_auxiliary_account(self, account):
+    @property
+    def needs_balancing(self):
+        """
+        Indique si les écritures peuvent être déséquilibrées (et doivent être vérifiées à l'export)
+        
+        Les montants sont des centimes entiers : sans anomalie, ou avec des
+        anomalies équilibrées (balanced_anomalies), chaque écriture est
+        équilibrée par construction et la passe de correction est inutile.
+        """
+        return self.anomaly_rate > 0 and not self.balanced_anomalies
+    
+    def random_context(self):
+        """
+        Crée le contexte aléatoire d'une génération
+        
+        Avec une graine, chaque appel rejoue exactement les mêmes tirages.
+        Sans graine, chaque appel tire une entropie neuve.
+        
+        Returns:
+            RandomContext: Contexte aléatoire (flux dérivés de self.seed)
+        """
+        return RandomContext(self.seed)
+    
+    def _get_auxiliary_account(self, account, context):
         """
         Retourne un compte auxiliaire approprié si applicable
         
         Args:
             account (str): Numéro de compte comptable
+            context (RandomContext): Contexte aléatoire
             
         Returns:
             tuple: (code_auxiliaire, libellé_auxiliaire)
         """
-        account_prefix = account[:3]
+        candidates = self.account_index.auxiliaries_for(account)
         
-        if account_prefix in self.auxiliaires:
-            aux_keys = list(self.auxiliaires[account_prefix].keys())
-            aux_code = random.choice(aux_keys)
-            aux_lib = self.auxiliaires[account_prefix][aux_code]
-            return aux_code, aux_lib
+        if candidates:
+            return context.random.choice(candidates)
         
         return "", ""
     
@@ -83,149 +196,557 @@ class FECGenerator:
         Génère l'ensemble des transactions pour la période
         
         Returns:
-            list: Transactions générées
+            TransactionBatch: Transactions générées, en colonnes
+        """
+        key = self.cache_key()
+        if key is not None:
+            batch = self.cache.load(key)
+            if batch is not None:
+                self.metrics.add(CACHE_HITS)
+                self.metrics.add(LINES_CACHED, len(batch))
+                self.transactions = batch
+                return self.transactions
+            self.metrics.add(CACHE_MISSES)
+
+        self.transactions = TransactionBatch.concat(list(self.iter_batches()), self.start_date)
+        if key is not None:
+            self.cache.store(key, self.transactions, self.cache_params())
+        return self.transactions
+
+    def cache_params(self):
+        """
+        Paramètres déterminant les écritures générées (clé du cache)
+
+        Returns:
+            dict: Paramètres sérialisables en JSON
+        """
+        return {
+            "company_name": self.company_name,
+            "siren": self.siren,
+            "start_date": f"{self.start_date:%Y-%m-%d}",
+            "end_date": f"{self.end_date:%Y-%m-%d}",
+            "journal_count": self.journal_count,
+            "transaction_count": self.transaction_count,
+            "anomaly_rate": self.anomaly_rate,
+            "anomaly_mix": None if self.anomaly_mix is None else self.anomaly_mix.tolist(),
+            "balanced_anomalies": self.balanced_anomalies,
+            "engine": self.engine,
+            "seed": self.seed,
+            "ecr_offsets": self.ecr_offsets,
+        }
+
+    def cache_key(self):
+        """
+        Empreinte de la génération dans le cache
+
+        Returns:
+            str: Empreinte, ou None sans cache ou sans graine (génération non reproductible)
+        """
+        if self.cache is None:
+            return None
+        return cache_key(self.cache_params())
+
+    def _export_cached(self, format, filename, export, options):
+        """
+        Export servi par le cache : recopie d'un export identique, ou export puis mise en cache
+
+        Args:
+            format (str): Format d'export
+            filename (str): Nom du fichier demandé
+            export (callable): Fonction d'export (transactions, filename, balance, metrics, **options)
+            options (dict): Options d'export
+
+        Returns:
+            str: Chemin du fichier généré
+        """
+        key = self.cache_key()
+        name = output_name(format, options)
+        copied = self.cache.copy_output(key, name, filename)
+        if copied is not None:
+            self.metrics.add(CACHE_HITS)
+            self.metrics.add(LINES_CACHED, self.cache.meta(key).get("lines", 0))
+            return copied
+
+        if not self.transactions:
+            self.generate_transactions()
+        filename_out = export(self.transactions, filename, balance=self.needs_balancing, metrics=self.metrics,
+                              **options)
+        self.cache.store_output(key, name, filename_out, filename)
+        return filename_out
+    
+    def iter_batches(self, chunk_size=100000):
         """
-        transactions = []
+        Génère les écritures par lots en colonnes, dans l'ordre final (journal, numéro d'écriture)
         
-        # Identifiants d'écriture par journal pour assurer la continuité
-        journal_ecr_id = {journal: 1 for journal in self.journals.keys()}
+        Seuls des compteurs par journal sont conservés : aucun tri global n'est
+        nécessaire et le grand livre n'est jamais matérialisé en mémoire.
+        Avec le moteur "numpy", chaque lot est une partition (journal, mois),
+        générée sur self.workers processus.
         
-        # Générer les transactions
-        for _ in range(self.transaction_count):
-            journal_code = random.choice(list(self.journals.keys()))
-            transaction_date = Transaction.generate_transaction_date(self.start_date, self.end_date)
-            
-            # Identifier les comptes pertinents selon le journal
-            relevant_accounts = AccountingData.get_relevant_accounts(journal_code)
-            
-            # Sélectionner un compte au débit et un au crédit
-            debit_account = random.choice(relevant_accounts)
-            
-            # Logique pour un crédit cohérent avec le débit
-            credit_accounts = AccountingData.get_related_account(debit_account)
-            
-            if not credit_accounts:
-                credit_accounts = [acc for acc in relevant_accounts if acc != debit_account]
-            
-            credit_account = random.choice(credit_accounts)
-            
-            # Montant
-            amount = Transaction.generate_realistic_amount(debit_account)
-            
-            # Référence de pièce
-            piece_ref = Transaction.generate_piece_reference(journal_code, transaction_date)
-            
-            # Créer les lignes d'écriture
-            ecr_id = journal_ecr_id[journal_code]
-            
-            # Date de validation
-            valid_date = Transaction.generate_valid_date(transaction_date, self.end_date)
-            
-            # Ligne au débit
-            debit_label = Transaction.generate_transaction_label(debit_account, journal_code)
-            
-            # Comptes auxiliaires
-            debit_aux_num, debit_aux_lib = self._get_auxiliary_account(debit_account)
-            
-            # Lettrage
-            debit_lettering, debit_date_lettering = Transaction.get_lettering_info(debit_account, self.end_date)
-            
-            transactions.append({
-                'journal_code': journal_code,
-                'journal_lib': self.journals[journal_code],
-                'ecr_id': ecr_id,
-                'ecr_date': transaction_date.strftime("%Y%m%d"),
-                'transaction_date': transaction_date,
-                'piece_ref': piece_ref,
-                'piece_date': transaction_date.strftime("%Y%m%d"),
-                'account': debit_account,
-                'account_lib': self.plan_comptable[debit_account],
-                'comp_aux': debit_aux_num,
-                'comp_aux_lib': debit_aux_lib,
-                'label': debit_label,
-                'debit': amount,
-                'credit': 0.00,
-                'lettering': debit_lettering,
-                'date_lettering': debit_date_lettering,
-                'valid_date': valid_date
-            })
-            
-            # Ligne au crédit
-            credit_label = debit_label  # Même libellé pour l'équilibre
+        Args:
+            chunk_size (int, optional): Nombre d'écritures par lot (moteur "python"). Par défaut à 100000.
             
-            # Comptes auxiliaires
-            credit_aux_num, credit_aux_lib = self._get_auxiliary_account(credit_account)
+        Yields:
+            TransactionBatch: Lots d'écritures complètes, anomalies injectées
+        """
+        context = self.random_context()
+        metrics = self.metrics
+        
+        if self.engine == "numpy":
+            yield from metrics.map(generate_partition, self.partition_jobs(context), self.workers)
+            return
+        
+        generation = context.spawn(STREAM_GENERATION)
+        generation.random = metrics.counting(generation.random)
+        
+        # Injecter des anomalies
+        yield from metrics.timed("anomalies", iter_inject_anomalies(
+            metrics.timed("generate", self._iter_batches_python(chunk_size, generation), LINES_GENERATED),
+            2 * self.transaction_count, self.anomaly_rate, metrics.counting(context.numpy(STREAM_ANOMALIES)),
+            self.anomaly_mix, self.balanced_anomalies, metrics))
+    
+    def iter_entries(self, chunk_size=100000):
+        """
+        Génère les lignes d'écritures à la volée, dans l'ordre final (journal, numéro d'écriture)
+        
+        Args:
+            chunk_size (int, optional): Nombre d'écritures par lot interne. Par défaut à 100000.
             
-            # Lettrage
-            credit_lettering, credit_date_lettering = Transaction.get_lettering_info(credit_account, self.end_date)
+        Yields:
+            dict: Lignes d'écritures (deux par écriture), anomalies injectées
+        """
+        for batch in self.iter_batches(chunk_size):
+            yield from batch.iter_records()
+    
+    def partition_jobs(self, context=None):
+        """
+        Planifie la génération par partitions (journal, mois) du moteur vectorisé
+        
+        Les effectifs de toutes les partitions sont tirés avant toute génération,
+        puis chaque partition reçoit son premier numéro d'écriture (EcritureNum
+        continu par journal) et sa propre sous-graine : le résultat est le même
+        quel que soit le nombre de processus.
+        
+        Args:
+            context (RandomContext, optional): Contexte aléatoire. Par défaut, self.random_context().
+        
+        Returns:
+            list: Tâches pour generate_partition, dans l'ordre final
+        """
+        from models.vectorized import get_tables, plan_partitions
+        
+        context = context or self.random_context()
+        ecr_offsets = [self.ecr_offsets.get(code, 0) for code in get_tables().journal_codes] \
+            if self.ecr_offsets else None
+        partitions = plan_partitions(
+            self.metrics.counting(context.numpy(STREAM_PLAN)), self.start_date, self.end_date,
+            self.transaction_count, self.anomaly_rate, ecr_offsets=ecr_offsets)
+        return [{
+            "partition": partition,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "seed": derive_seed(context.seed, STREAM_GENERATION, *partition.key),
+            "anomaly_mix": self.anomaly_mix,
+            "balanced_anomalies": self.balanced_anomalies,
+        } for partition in partitions]
+    
+    def generate_columns(self):
+        """
+        Génère les écritures sous forme de colonnes NumPy (moteur vectorisé, sans anomalies)
+        
+        Returns:
+            dict: Colonnes par écriture, triées par journal et numéro d'écriture
+        """
+        from models.vectorized import generate_partition_columns
+        
+        parts = [generate_partition_columns(np.random.default_rng(job["seed"]), job["partition"],
+                                            self.start_date, self.end_date)
+                 for job in self.partition_jobs()]
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    
+    def _iter_batches_python(self, chunk_size, context):
+        """
+        Génère les lots d'écritures avec des tirages unitaires
+        
+        Args:
+            chunk_size (int): Nombre d'écritures par lot
+            context (RandomContext): Contexte aléatoire de la génération
             
-            transactions.append({
-                'journal_code': journal_code,
-                'journal_lib': self.journals[journal_code],
-                'ecr_id': ecr_id,
-                'ecr_date': transaction_date.strftime("%Y%m%d"),
-                'transaction_date': transaction_date,
-                'piece_ref': piece_ref,
-                'piece_date': transaction_date.strftime("%Y%m%d"),
-                'account': credit_account,
-                'account_lib': self.plan_comptable[credit_account],
-                'comp_aux': credit_aux_num,
-                'comp_aux_lib': credit_aux_lib,
-                'label': credit_label,
-                'debit': 0.00,
-                'credit': amount,
-                'lettering': credit_lettering,
-                'date_lettering': credit_date_lettering,
-                'valid_date': valid_date
-            })
+        Yields:
+            TransactionBatch: Lots d'écritures (avant injection d'anomalies)
+        """
+        journal_codes = tuple(self.journals.keys())
+        
+        # Nombre d'écritures par journal (journal choisi uniformément)
+        journal_counts = dict.fromkeys(journal_codes, 0)
+        for _ in range(self.transaction_count):
+            journal_counts[context.random.choice(journal_codes)] += 1
+        
+        # Identifiants d'écriture par journal pour assurer la continuité
+        period = (0, (self.end_date - self.start_date).days)
+        lines = []
+        for journal_code in sorted(journal_codes):
+            offset = self.ecr_offsets.get(journal_code, 0)
+            for ecr_id in range(offset + 1, offset + journal_counts[journal_code] + 1):
+                lines.extend(self._generate_entry(journal_code, ecr_id, context))
+                if len(lines) >= 2 * chunk_size:
+                    yield TransactionBatch.from_records(lines, self.start_date, cents=True, period=period)
+                    lines = []
+        if lines:
+            yield TransactionBatch.from_records(lines, self.start_date, cents=True, period=period)
+    
+    def _generate_entry(self, journal_code, ecr_id, context):
+        """
+        Génère une écriture équilibrée (une ligne au débit, une au crédit)
+        
+        Args:
+            journal_code (str): Code du journal
+            ecr_id (int): Numéro de l'écriture dans le journal
+            context (RandomContext): Contexte aléatoire de la génération
             
-            # Incrémenter le compteur d'écriture pour ce journal
-            journal_ecr_id[journal_code] += 1
+        Returns:
+            tuple: (ligne au débit, ligne au crédit), montants en centimes
+        """
+        account_index = self.account_index
+        transaction_date = Transaction.generate_transaction_date(self.start_date, self.end_date, context)
         
-        # Injecter des anomalies
-        transactions = inject_anomalies(transactions, self.anomaly_rate)
+        # Identifier les comptes pertinents selon le journal (index précalculé)
+        relevant_accounts = account_index.relevant_accounts(journal_code)
+        
+        # Sélectionner un compte au débit et un au crédit
+        debit_account = context.random.choice(relevant_accounts)
         
-        # Trier par journal et numéro d'écriture
-        transactions.sort(key=lambda x: (x['journal_code'], x['ecr_id']))
+        # Logique pour un crédit cohérent avec le débit
+        credit_accounts = account_index.related_accounts_for(debit_account)
         
-        self.transactions = transactions
-        return transactions
+        if not credit_accounts:
+            credit_accounts = [acc for acc in relevant_accounts if acc != debit_account]
+        
+        credit_account = context.random.choice(credit_accounts)
+        
+        # Montant
+        amount = Transaction.generate_realistic_amount_cents(debit_account, context)
+        
+        # Référence de pièce
+        piece_ref = Transaction.generate_piece_reference(journal_code, transaction_date, context)
+        
+        # Date de validation
+        valid_date = Transaction.generate_valid_date(transaction_date, self.end_date, context)
+        
+        # Ligne au débit
+        debit_label = Transaction.generate_transaction_label(
+            debit_account, journal_code, context, self.end_date.date())
+        
+        # Comptes auxiliaires
+        debit_aux_num, debit_aux_lib = self._get_auxiliary_account(debit_account, context)
+        
+        # Lettrage
+        debit_lettering, debit_date_lettering = Transaction.get_lettering_info(debit_account, self.end_date, context)
+        
+        debit_line = {
+            'journal_code': journal_code,
+            'journal_lib': self.journals[journal_code],
+            'ecr_id': ecr_id,
+            'ecr_date': transaction_date.strftime("%Y%m%d"),
+            'transaction_date': transaction_date,
+            'piece_ref': piece_ref,
+            'piece_date': transaction_date.strftime("%Y%m%d"),
+            'account': debit_account,
+            'account_lib': self.plan_comptable[debit_account],
+            'comp_aux': debit_aux_num,
+            'comp_aux_lib': debit_aux_lib,
+            'label': debit_label,
+            'debit': amount,
+            'credit': 0,
+            'lettering': debit_lettering,
+            'date_lettering': debit_date_lettering,
+            'valid_date': valid_date
+        }
+        
+        # Ligne au crédit
+        credit_label = debit_label  # Même libellé pour l'équilibre
+        
+        # Comptes auxiliaires
+        credit_aux_num, credit_aux_lib = self._get_auxiliary_account(credit_account, context)
+        
+        # Lettrage
+        credit_lettering, credit_date_lettering = Transaction.get_lettering_info(credit_account, self.end_date, context)
+        
+        credit_line = {
+            'journal_code': journal_code,
+            'journal_lib': self.journals[journal_code],
+            'ecr_id': ecr_id,
+            'ecr_date': transaction_date.strftime("%Y%m%d"),
+            'transaction_date': transaction_date,
+            'piece_ref': piece_ref,
+            'piece_date': transaction_date.strftime("%Y%m%d"),
+            'account': credit_account,
+            'account_lib': self.plan_comptable[credit_account],
+            'comp_aux': credit_aux_num,
+            'comp_aux_lib': credit_aux_lib,
+            'label': credit_label,
+            'debit': 0,
+            'credit': amount,
+            'lettering': credit_lettering,
+            'date_lettering': credit_date_lettering,
+            'valid_date': valid_date
+        }
+        
+        return debit_line, credit_line
     
-    def export_to_csv(self, filename="FEC_EXAMPLE.csv"):
+    def export_to_csv(self, filename="FEC_EXAMPLE.csv", stream=False, **options):
         """
         Exporte les transactions au format FEC (CSV)
         
         Args:
             filename (str, optional): Nom du fichier CSV à générer. Par défaut à "FEC_EXAMPLE.csv".
+            stream (bool, optional): Génère et écrit les écritures à la volée, en mémoire constante,
+                sans les conserver dans self.transactions. Ignoré avec un cache (les écritures
+                sont conservées pour être mises en cache). Par défaut à False.
+            **options: Options de exporters.csv_exporter.export_to_csv
+                (compression, compression_level, part_lines, anomaly_label)
             
         Returns:
             str: Chemin du fichier généré
         """
-        from exporters.csv_exporter import export_to_csv
+        from exporters.csv_exporter import export_to_csv, export_partitions_to_csv
         
-        if not self.transactions:
-            self.generate_transactions()
-            
-        return export_to_csv(self.transactions, filename)
+        if self.cache_key() is not None:
+            path = self._export_cached("csv", filename, export_to_csv, options)
+        elif stream and not self.transactions:
+            if self.engine == "numpy":
+                # Les processus génèrent et mettent en forme les partitions
+                path = export_partitions_to_csv(
+                    self.partition_jobs(), filename, self.workers, balance=self.needs_balancing,
+                    metrics=self.metrics, **options)
+            else:
+                path = export_to_csv(self.iter_batches(), filename, balance=self.needs_balancing,
+                                     metrics=self.metrics, **options)
+        else:
+            if not self.transactions:
+                self.generate_transactions()
+            path = export_to_csv(self.transactions, filename, balance=self.needs_balancing, metrics=self.metrics,
+                                 **options)
+        return self._record_period("csv", path, options)
     
-    def export_to_excel(self, filename="FEC_EXAMPLE.xlsx"):
+    def export_to_excel(self, filename="FEC_EXAMPLE.xlsx", stream=False, **options):
         """
         Exporte les transactions au format Excel (.xlsx)
         
         Args:
             filename (str, optional): Nom du fichier Excel à générer. Par défaut à "FEC_EXAMPLE.xlsx".
+            stream (bool, optional): Génère et écrit les écritures à la volée, en mémoire constante,
+                sans les conserver dans self.transactions. Ignoré avec un cache (les écritures
+                sont conservées pour être mises en cache). Par défaut à False.
+            **options: Options de exporters.excel_exporter.export_to_excel (anomaly_label)
             
         Returns:
             str: Chemin du fichier généré
         """
         from exporters.excel_exporter import export_to_excel
         
+        if self.cache_key() is not None:
+            return self._export_cached("excel", filename, export_to_excel, options)
+        
+        if stream and not self.transactions:
+            return export_to_excel(self.iter_batches(), filename, balance=self.needs_balancing,
+                                   metrics=self.metrics, **options)
+        
         if not self.transactions:
             self.generate_transactions()
             
-        return export_to_excel(self.transactions, filename)
+        return export_to_excel(self.transactions, filename, balance=self.needs_balancing, metrics=self.metrics,
+                               **options)
     
-    def generate_multiple_fecs(self, count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs"):
+    def export_to_parquet(self, filename="FEC_EXAMPLE.parquet", stream=False, **options):
+        """
+        Exporte les transactions au format Parquet (nécessite pyarrow)
+        
+        Args:
+            filename (str, optional): Nom du fichier Parquet à générer. Par défaut à "FEC_EXAMPLE.parquet".
+            stream (bool, optional): Génère et écrit les écritures à la volée, en mémoire constante,
+                sans les conserver dans self.transactions. Ignoré avec un cache (les écritures
+                sont conservées pour être mises en cache). Par défaut à False.
+            **options: Options de exporters.parquet_exporter.export_to_parquet
+                (amounts, anomaly_label, compression, row_group_size)
+            
+        Returns:
+            str: Chemin du fichier généré
+        """
+        from exporters.parquet_exporter import export_to_parquet
+        
+        if self.cache_key() is not None:
+            path = self._export_cached("parquet", filename, export_to_parquet, options)
+        elif stream and not self.transactions:
+            path = export_to_parquet(self.iter_batches(), filename, balance=self.needs_balancing,
+                                     metrics=self.metrics, **options)
+        else:
+            if not self.transactions:
+                self.generate_transactions()
+            path = export_to_parquet(self.transactions, filename, balance=self.needs_balancing,
+                                     metrics=self.metrics, **options)
+        return self._record_period("parquet", path, options)
+
+    def export_many(self, outputs, options=None):
+        """
+        Exporte les mêmes transactions dans plusieurs formats, en une seule passe
+
+        Les écritures sont générées et équilibrées une seule fois, puis chaque lot
+        est transmis à tous les exports, qui s'exécutent en parallèle. Sans
+        transactions déjà générées ni cache, l'export se fait en flux (mémoire bornée).
+
+        Args:
+            outputs (dict): Fichier à générer par format ("csv", "excel", "parquet")
+            options (dict, optional): Options d'export par format, par exemple
+                {"csv": {"compression": "gzip"}}. Par défaut, aucune.
+
+        Returns:
+            dict: Chemin du fichier généré par format
+        """
+        from exporters.fanout import export_many
+
+        key = self.cache_key()
+        if key is not None:
+            # Formats déjà exportés recopiés depuis le cache, les autres exportés puis mis en cache
+            options = options or {}
+            names = {format: output_name(format, options.get(format)) for format in outputs}
+            files = {}
+            for format, filename in outputs.items():
+                copied = self.cache.copy_output(key, names[format], filename)
+                if copied is not None:
+                    self.metrics.add(CACHE_HITS)
+                    files[format] = copied
+            missing = {format: filename for format, filename in outputs.items() if format not in files}
+            if missing:
+                if not self.transactions:
+                    self.generate_transactions()
+                exported = export_many(self.transactions, missing, balance=self.needs_balancing, options=options,
+                                       metrics=self.metrics)
+                for format, filename in exported.items():
+                    self.cache.store_output(key, names[format], filename, missing[format])
+                files.update(exported)
+            elif files:
+                self.metrics.add(LINES_CACHED, self.cache.meta(key).get("lines", 0))
+        else:
+            transactions = self.transactions if self.transactions else self.iter_batches()
+            files = export_many(transactions, outputs, balance=self.needs_balancing, options=options,
+                                metrics=self.metrics)
+        options = options or {}
+        return {format: self._record_period(format, files[format], options.get(format) or {}) for format in outputs}
+
+    def _record_period(self, format, filename, options):
+        """
+        Enregistre la fin de période d'un FEC exporté, reprise par extend (voir models.ledger_state.save_period)
+
+        Seuls les FEC prolongeables sont concernés : CSV en un seul fichier et Parquet.
+        Les parties d'un Parquet prolongé précédemment sous ce nom, qui ne
+        suivent plus le nouveau fichier, sont supprimées.
+
+        Args:
+            format (str): Format d'export
+            filename (str): Fichier généré
+            options (dict): Options d'export
+
+        Returns:
+            str: filename
+        """
+        from models.ledger_state import ledger_files, save_period
+
+        if format == "parquet":
+            for part in ledger_files(filename)[1:]:
+                logger.info("Partie d'un FEC précédent supprimée: %s", part)
+                os.remove(part)
+        if format == "parquet" or (format == "csv" and not options.get("part_lines")):
+            save_period(filename, self.end_date)
+        return filename
+
+    def extend(self, filename, end_date, transaction_count=None):
+        """
+        Prolonge un FEC existant jusqu'à end_date, sans le régénérer
+
+        L'état du FEC (derniers numéros d'écriture par journal, dernière date,
+        fin de la période générée) est relu du fichier d'état enregistré à côté
+        de lui (à l'export ou au prolongement précédent), sinon du FEC lui-même.
+        Seule la nouvelle période, du lendemain de la période
+        couverte (fin de période enregistrée, sinon dernière écriture) à
+        end_date, est générée avec les paramètres de ce générateur, puis ajoutée
+        à la fin du fichier : la numérotation de chaque journal continue, et le
+        coût ne dépend que des nouvelles écritures. Le nouvel état est enregistré
+        à côté du FEC (FEC.csv.state.json).
+
+        Le CSV (brut, .gz ou .zst) est prolongé en place, dans ses options
+        d'origine (colonne anomaly_type). Un Parquet ne peut pas l'être : chaque
+        prolongement est écrit dans une nouvelle partie, au même schéma
+        (FEC.part0002.parquet... voir models.ledger_state.ledger_files), sans
+        relire ni recopier les parties précédentes. Les écritures ajoutées suivent les précédentes : le fichier est ordonné
+        par période prolongée, puis par journal et numéro d'écriture.
+
+        Args:
+            filename (str): FEC à prolonger (.csv, .csv.gz, .csv.zst ou .parquet)
+            end_date (str): Nouvelle date de fin de période (AAAA-MM-JJ)
+            transaction_count (int, optional): Nombre d'écritures ajoutées. Par défaut, au prorata
+                de transaction_count sur la période de ce générateur. Le générateur décrit ensuite
+                le FEC prolongé (end_date et transaction_count cumulés) : la densité d'écritures
+                reste la même d'un prolongement à l'autre.
+
+        Returns:
+            LedgerState: État du FEC prolongé
+
+        Raises:
+            ValueError: FEC vide, ou end_date dans la période qu'il couvre déjà
+        """
+        from exporters.compression import compression_of, open_text
+        from exporters.csv_exporter import export_to_csv
+        from exporters.fec_writer import ANOMALY_COLUMN
+        from models.ledger_state import next_part_filename, read_state
+
+        state = read_state(filename)
+        if state.last_date is None:
+            raise ValueError(f"FEC vide, rien à prolonger: {filename}")
+        start = state.next_date
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        if end < start:
+            raise ValueError(f"Le FEC {filename} couvre déjà la période jusqu'au {state.covered_until:%Y-%m-%d}")
+        if transaction_count is None:
+            period_days = (self.end_date - self.start_date).days + 1
+            transaction_count = round(self.transaction_count * ((end - start).days + 1) / period_days)
+
+        # Graine propre à la période ajoutée : un prolongement est reproductible
+        seed = None if self.seed is None else derive_seed(self.seed, STREAM_EXTENSION, start.toordinal())
+        extension = FECGenerator(
+            self.company_name, self.siren, f"{start:%Y-%m-%d}", end_date, self.journal_count, transaction_count,
+            self.anomaly_rate, balanced_anomalies=self.balanced_anomalies, engine=self.engine, seed=seed,
+            workers=self.workers, metrics=self.metrics, ecr_offsets=state.ecr_counters)
+        extension.anomaly_mix = self.anomaly_mix
+
+        def tracked(batches):
+            for batch in batches:
+                state.update(batch)
+                yield batch
+
+        batches = extension.iter_batches()
+        if extension.needs_balancing:
+            # Équilibrées avant la mise à jour de l'état
+            batches = (batch for batch, _, _ in self.metrics.timed("balance", iter_balanced_batches(batches)))
+
+        if filename.endswith(".parquet"):
+            from exporters.parquet_exporter import export_to_parquet, parquet_options
+            export_to_parquet(tracked(batches), next_part_filename(filename), balance=False, metrics=self.metrics,
+                              **parquet_options(filename))
+        else:
+            with open_text(filename) as f:
+                anomaly_label = ANOMALY_COLUMN in f.readline().rstrip("\r\n").split("|")
+            export_to_csv(tracked(batches), filename, balance=False, compression=compression_of(filename),
+                          anomaly_label=anomaly_label, metrics=self.metrics, append=True)
+
+        state.end_date = end
+        state.save(filename)
+        self.end_date = end
+        self.transaction_count += transaction_count
+        return state
+
+    def generate_multiple_fecs(self, count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs",
+                               workers=1, seed=None):
         """
         Génère plusieurs FEC avec des caractéristiques différentes
         
@@ -233,14 +754,19 @@ class FECGenerator:
             count (int, optional): Nombre de fichiers à générer. Par défaut à 5.
             base_filename (str, optional): Préfixe du nom de fichier. Par défaut à "FEC_ENTREPRISE_".
             output_dir (str, optional): Répertoire de sortie. Par défaut à "generated_fecs".
+            workers (int, optional): Nombre de processus générant les entreprises en parallèle. Par défaut à 1.
+            seed (int, optional): Graine globale, dont chaque entreprise dérive son flux. Par défaut, self.seed.
             
         Returns:
             list: Liste des informations sur les fichiers générés
         """
         from exporters.csv_exporter import generate_multiple_fecs
-        return generate_multiple_fecs(count, base_filename, output_dir)
+        return generate_multiple_fecs(count, base_filename, output_dir, workers=workers,
+                                      seed=self.seed if seed is None else seed, engine=self.engine,
+                                      metrics=self.metrics)
     
-    def generate_multiple_fecs_excel(self, count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs_excel"):
+    def generate_multiple_fecs_excel(self, count=5, base_filename="FEC_ENTREPRISE_", output_dir="generated_fecs_excel",
+                                     workers=1, seed=None):
         """
         Génère plusieurs FEC au format Excel avec des caractéristiques différentes
         
@@ -248,9 +774,13 @@ class FECGenerator:
             count (int, optional): Nombre de fichiers à générer. Par défaut à 5.
             base_filename (str, optional): Préfixe du nom de fichier. Par défaut à "FEC_ENTREPRISE_".
             output_dir (str, optional): Répertoire de sortie. Par défaut à "generated_fecs_excel".
+            workers (int, optional): Nombre de processus générant les entreprises en parallèle. Par défaut à 1.
+            seed (int, optional): Graine globale, dont chaque entreprise dérive son flux. Par défaut, self.seed.
             
         Returns:
             list: Liste des informations sur les fichiers générés
         """
         from exporters.excel_exporter import generate_multiple_fecs_excel
-        return generate_multiple_fecs_excel(count, base_filename, output_dir)
\ No newline at end of file
+        return generate_multiple_fecs_excel(count, base_filename, output_dir, workers=workers,
+                                            seed=self.seed if seed is None else seed, engine=self.engine,
+                                            metrics=self.metrics)
\ No newline at end of file
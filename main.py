@@ -1,13 +1,17 @@
 import sys
 import os
 import argparse
+import json
+import logging
+import time
 from datetime import datetime
 
 # Ajouter le répertoire parent au chemin Python
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import absolu
-from generator import FECGenerator
+from exporters.parallel import JOB_FORMATS, generate_companies, run_jobs, summarize_jobs, validate_job
+from generator import ENGINES, FECGenerator
 
 def get_user_input():
     """
@@ -60,9 +64,9 @@ def get_user_input():
         "transactions_count": transactions_count
     }
 
-def main():
+def run_interactive():
     """
-    Point d'entrée principal avec interface interactive
+    Mode interactif : paramètres demandés dans le terminal
     """
     # Obtenir les paramètres de l'utilisateur
     params = get_user_input()
@@ -95,42 +99,304 @@ def main():
     if params["files_count"] > 1:
         print(f"\nGénération de {params['files_count']} fichiers FEC...")
         
-        # Générer les fichiers CSV
+        # Mêmes entreprises dans tous les formats : chaque entreprise est générée une
+        # seule fois puis exportée en CSV et/ou Excel
+        generated = generate_companies(
+            params["files_count"],
+            f"{output_base}_",
+            {"csv": csv_output_dir, "excel": excel_output_dir},
+            format=params["format"],
+            seed=generator.seed,
+            engine=generator.engine,
+            metrics=generator.metrics
+        )
         if params["format"] in ["csv", "both"]:
-            generated_csv = generator.generate_multiple_fecs(
-                count=params["files_count"],
-                base_filename=f"{output_base}_",
-                output_dir=csv_output_dir
-            )
-            print(f"✓ Générés {len(generated_csv)} fichiers CSV dans '{csv_output_dir}'")
-        
-        # Générer les fichiers Excel
+            print(f"✓ Générés {len(generated)} fichiers CSV dans '{csv_output_dir}'")
         if params["format"] in ["excel", "both"]:
-            generated_excel = generator.generate_multiple_fecs_excel(
-                count=params["files_count"],
-                base_filename=f"{output_base}_",
-                output_dir=excel_output_dir
-            )
-            print(f"✓ Générés {len(generated_excel)} fichiers Excel dans '{excel_output_dir}'")
+            print(f"✓ Générés {len(generated)} fichiers Excel dans '{excel_output_dir}'")
     
     # Mode fichier unique
     else:
         print("\nGénération d'un fichier FEC...")
-        generator.generate_transactions()
-        
-        # Générer le fichier CSV
+        outputs = {}
         if params["format"] in ["csv", "both"]:
-            csv_file = os.path.join(csv_output_dir, f"{output_base}.csv")
-            generator.export_to_csv(csv_file)
-            print(f"✓ FEC CSV généré: {csv_file}")
-        
-        # Générer le fichier Excel
+            outputs["csv"] = os.path.join(csv_output_dir, f"{output_base}.csv")
         if params["format"] in ["excel", "both"]:
-            excel_file = os.path.join(excel_output_dir, f"{output_base}.xlsx")
-            generator.export_to_excel(excel_file)
-            print(f"✓ FEC Excel généré: {excel_file}")
+            outputs["excel"] = os.path.join(excel_output_dir, f"{output_base}.xlsx")
+        
+        # Une génération, exports en parallèle
+        files = generator.export_many(outputs)
+        if "csv" in files:
+            print(f"✓ FEC CSV généré: {files['csv']}")
+        if "excel" in files:
+            print(f"✓ FEC Excel généré: {files['excel']}")
     
     print("\nGénération terminée avec succès!\n")
 
+
+def load_manifest(path):
+    """
+    Charge un manifeste de tâches JSON ou JSONL
+
+    Formats acceptés : une liste de tâches ou {"defaults": {...}, "jobs": [...]}
+    (JSON), ou une tâche par ligne (JSONL, lignes vides ignorées).
+
+    Args:
+        path (str): Chemin du manifeste
+
+    Returns:
+        tuple: (dict, list, list) - Paramètres par défaut du manifeste, tâches et
+            position de chaque tâche pour les messages d'erreur ("ligne 3", "tâche 2")
+
+    Raises:
+        ValueError: JSON invalide, ou manifeste qui n'est ni une liste de tâches ni un
+            objet dont "jobs" est une liste
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            jobs, positions = [], []
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        jobs.append(json.loads(line))
+                    except json.JSONDecodeError as error:
+                        raise ValueError(f"{path}, ligne {number}: {error}") from None
+                    positions.append(f"ligne {number}")
+            return {}, jobs, positions
+        try:
+            manifest = json.load(f)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"{path}: {error}") from None
+    if isinstance(manifest, list):
+        defaults, jobs = {}, manifest
+    elif isinstance(manifest, dict) and isinstance(manifest.get("jobs"), list):
+        defaults, jobs = manifest.get("defaults") or {}, manifest["jobs"]
+        if not isinstance(defaults, dict):
+            raise ValueError(f"{path}: \"defaults\" doit être un objet")
+    else:
+        raise ValueError(f"{path}: liste de tâches ou objet {{\"defaults\": {{...}}, \"jobs\": [...]}} attendu")
+    return defaults, jobs, [f"tâche {index}" for index in range(1, len(jobs) + 1)]
+
+
+def job_defaults(args):
+    """
+    Paramètres de tâche donnés en ligne de commande
+
+    Args:
+        args (argparse.Namespace): Arguments analysés (options de tâche absentes si non données)
+
+    Returns:
+        dict: Paramètres de tâche (voir exporters.parallel.run_job)
+    """
+    return {key: value for key, value in vars(args).items() if key in JOB_OPTION_KEYS and value is not None}
+
+
+def print_report(summary):
+    """Affiche le rapport d'exécution : une ligne par tâche puis les totaux"""
+    print(f"\n{'Tâche':<30} {'Statut':<7} {'Lignes':>12} {'Durée':>9} {'Lignes/s':>12} {'Taille':>10}")
+    for result in summary["results"]:
+        print(f"{result['name'][:30]:<30} {result['status']:<7} {result['lines']:>12,} {result['seconds']:>8.2f}s "
+              f"{result['lines_per_sec'] or 0:>12,.0f} {result['bytes'] / 2**20:>8.1f}Mo")
+        if result["status"] != "ok":
+            print(f"    {result['error']}")
+    print(f"{'Total':<30} {summary['jobs'] - summary['failed']}/{summary['jobs']:<5} {summary['lines']:>12,} "
+          f"{summary['seconds']:>8.2f}s {summary['lines_per_sec'] or 0:>12,.0f} {summary['bytes'] / 2**20:>8.1f}Mo")
+
+
+def execute(jobs, args, seed=None):
+    """
+    Exécute des tâches, affiche et enregistre le rapport
+
+    Returns:
+        int: Code de sortie (1 si une tâche a échoué)
+    """
+    start = time.perf_counter()
+    summary = summarize_jobs(run_jobs(jobs, workers=args.jobs, seed=seed), time.perf_counter() - start)
+    print_report(summary)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+            f.write("\n")
+        print(f"Rapport enregistré: {args.report}")
+    return 1 if summary["failed"] else 0
+
+
+def command_generate(args):
+    """Sous-commande generate : un FEC, ou --count FEC de mêmes paramètres"""
+    job = job_defaults(args)
+    if "start_date" not in job and "end_date" not in job:
+        job.setdefault("year", datetime.now().year)
+    if args.count <= 1:
+        return execute([job], args)
+
+    # Plusieurs FEC : un fichier et une sous-graine par exemplaire
+    seed = job.pop("seed", None)
+    output = job.pop("output", None) or "FEC_ENTREPRISE"
+    jobs = [dict(job, output=f"{output}_{i}") for i in range(1, args.count + 1)]
+    return execute(jobs, args, seed)
+
+
+def command_run(args):
+    """Sous-commande run : tâches d'un manifeste JSON/JSONL"""
+    try:
+        manifest_defaults, manifest_jobs, positions = load_manifest(args.manifest)
+    except (OSError, ValueError) as error:
+        raise SystemExit(str(error))
+    defaults = dict(job_defaults(args), **manifest_defaults)
+    seed = defaults.pop("seed", None)
+    jobs = []
+    for position, job in zip(positions, manifest_jobs):
+        if not isinstance(job, dict):
+            raise SystemExit(f"{args.manifest}, {position}: tâche attendue sous forme d'objet (reçu: {job!r})")
+        job = dict(defaults, **job)
+        try:
+            validate_job(job)
+        except ValueError as error:
+            raise SystemExit(f"{args.manifest}, {position}: {error}")
+        jobs.append(job)
+    return execute(jobs, args, seed)
+
+
+def command_extend(args):
+    """Sous-commande extend : prolonge un FEC existant jusqu'à --end-date"""
+    generator = FECGenerator(**{key: value for key, value in vars(args).items()
+                                if key in ("anomaly_rate", "balanced_anomalies", "engine", "seed", "workers")
+                                and value is not None})
+    start = time.perf_counter()
+    try:
+        state = generator.extend(args.file, args.end_date, args.transaction_count)
+    except (OSError, ValueError) as error:
+        logging.getLogger(__name__).error("Prolongement impossible: %s", error)
+        return 1
+    print(f"{args.file}: {state.lines:,} lignes jusqu'au {state.covered_until:%Y-%m-%d} "
+          f"({time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+def command_validate(args):
+    """Sous-commande validate : contrôle des FEC existants (structure et équilibre)"""
+    from utils.fec_reader import validate_fec_file
+
+    reports = []
+    for filename in args.files:
+        try:
+            report = validate_fec_file(filename, max_errors=args.max_errors)
+        except (OSError, ValueError) as error:
+            logging.getLogger(__name__).error("%s: lecture impossible: %s", filename, error)
+            return 1
+        reports.append(report)
+        status = "valide" if report.valid else f"{sum(report.error_counts.values()):,} erreurs"
+        print(f"{filename}: {report.lines:,} lignes, {status} ({report.seconds:.2f}s)")
+        for error in report.errors:
+            print(f"  {error}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump([report.to_dict() for report in reports], f, ensure_ascii=False, indent=2)
+    return 0 if all(report.valid for report in reports) else 1
+
+
+# Options de tâche de la ligne de commande (destinations argparse)
+JOB_OPTION_KEYS = ("company_name", "siren", "start_date", "end_date", "year", "transaction_count",
+                   "anomaly_rate", "balanced_anomalies", "engine", "seed", "workers", "cache", "format", "output",
+                   "output_dir", "compression", "compression_level", "part_lines", "anomaly_label")
+
+
+def build_parser():
+    """
+    Construit l'analyseur de la ligne de commande
+
+    Returns:
+        argparse.ArgumentParser: Analyseur (sous-commandes generate, run, extend, validate et interactive)
+    """
+    parser = argparse.ArgumentParser(prog="fec-generator",
+                                     description="Générateur de Fichier des Écritures Comptables (FEC)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="N'affiche que les avertissements et le rapport")
+    commands = parser.add_subparsers(dest="command")
+
+    # Options communes : paramètres des tâches (valeurs par défaut des tâches d'un manifeste)
+    job_options = argparse.ArgumentParser(add_help=False)
+    group = job_options.add_argument_group("paramètres des FEC")
+    group.add_argument("--company", dest="company_name", help="Nom de l'entreprise")
+    group.add_argument("--siren", help="Numéro SIREN")
+    group.add_argument("--year", type=int, help="Exercice (du 1er janvier au 31 décembre)")
+    group.add_argument("--start-date", help="Date de début de période (AAAA-MM-JJ)")
+    group.add_argument("--end-date", help="Date de fin de période (AAAA-MM-JJ)")
+    group.add_argument("--transactions", dest="transaction_count", type=int, help="Nombre d'écritures")
+    group.add_argument("--anomaly-rate", type=float, help="Taux d'anomalies")
+    group.add_argument("--balanced-anomalies", action="store_true", default=None,
+                       help="Anomalies de montant sur les deux jambes des écritures")
+    group.add_argument("--engine", choices=ENGINES, help="Moteur de génération")
+    group.add_argument("--seed", type=int, help="Graine (graine globale pour plusieurs FEC)")
+    group.add_argument("--workers", type=int, help="Processus par FEC (moteur numpy, avec --jobs 1)")
+    group.add_argument("--cache-dir", dest="cache",
+                       help="Cache des FEC générés (avec une graine : relus au lieu d'être régénérés)")
+    group.add_argument("--format", choices=JOB_FORMATS, help="Format de sortie")
+    group.add_argument("--output", help="Nom des fichiers, sans extension (par défaut SIRENFECAAAAMMJJ)")
+    group.add_argument("--output-dir", help="Répertoire de sortie")
+    group.add_argument("--compression", choices=("gzip", "zstd"), help="Compression du CSV")
+    group.add_argument("--compression-level", type=int, help="Niveau de compression")
+    group.add_argument("--part-lines", type=int, help="Découpe le CSV en parties d'au plus N lignes")
+    group.add_argument("--anomaly-label", action="store_true", default=None, help="Ajoute la colonne anomaly_type")
+
+    run_options = argparse.ArgumentParser(add_help=False)
+    run_options.add_argument("-j", "--jobs", type=int, default=1, help="Nombre de FEC générés simultanément")
+    run_options.add_argument("--report", help="Enregistre le rapport d'exécution (JSON)")
+
+    generate = commands.add_parser("generate", parents=[job_options, run_options], help="Génère un ou plusieurs FEC")
+    generate.add_argument("--count", type=int, default=1, help="Nombre de FEC à générer")
+    generate.set_defaults(handler=command_generate)
+
+    run = commands.add_parser("run", parents=[job_options, run_options],
+                              help="Exécute les tâches d'un manifeste JSON/JSONL")
+    run.add_argument("manifest", help="Manifeste (liste de tâches JSON, ou une tâche par ligne en .jsonl)")
+    run.set_defaults(handler=command_run)
+
+    extend = commands.add_parser("extend", help="Ajoute une nouvelle période à un FEC existant, sans le régénérer")
+    extend.add_argument("file", help="FEC à prolonger (.csv, .csv.gz, .csv.zst ou .parquet)")
+    extend.add_argument("--end-date", required=True, help="Nouvelle date de fin de période (AAAA-MM-JJ)")
+    extend.add_argument("--transactions", dest="transaction_count", type=int, required=True,
+                        help="Nombre d'écritures ajoutées")
+    extend.add_argument("--anomaly-rate", type=float, help="Taux d'anomalies")
+    extend.add_argument("--balanced-anomalies", action="store_true", default=None,
+                        help="Anomalies de montant sur les deux jambes des écritures")
+    extend.add_argument("--engine", choices=ENGINES, help="Moteur de génération")
+    extend.add_argument("--seed", type=int, help="Graine (la période ajoutée en dérive son flux)")
+    extend.add_argument("--workers", type=int, help="Processus de génération (moteur numpy)")
+    extend.set_defaults(handler=command_extend)
+
+    validate = commands.add_parser("validate", help="Contrôle des FEC existants (colonnes, ASCII, dates, équilibre)")
+    validate.add_argument("files", nargs="+", help="FEC à contrôler (.csv, .csv.gz ou .csv.zst)")
+    validate.add_argument("--max-errors", type=int, default=100, help="Erreurs détaillées par fichier")
+    validate.add_argument("--report", help="Enregistre le rapport de validation (JSON)")
+    validate.set_defaults(handler=command_validate)
+
+    interactive = commands.add_parser("interactive", help="Paramètres demandés dans le terminal")
+    interactive.set_defaults(handler=lambda args: run_interactive())
+    return parser
+
+
+def main(argv=None):
+    """
+    Point d'entrée principal
+
+    Sans sous-commande, les paramètres sont demandés dans le terminal (mode interactif).
+
+    Args:
+        argv (list, optional): Arguments. Par défaut, ceux de la ligne de commande.
+
+    Returns:
+        int: Code de sortie
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # Messages des exports affichés sur la console
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+
+    handler = getattr(args, "handler", None)
+    if handler is None:
+        return run_interactive()
+    return handler(args)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
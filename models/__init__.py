@@ -4,5 +4,7 @@ Modèles de données pour le générateur FEC
 
 from .accounting_data import AccountingData
 from .transaction import Transaction
+from .transaction_batch import TransactionBatch
+from .ledger_cache import LedgerCache
 
-__all__ = ["AccountingData", "Transaction"]
\ No newline at end of file
+__all__ = ["AccountingData", "LedgerCache", "Transaction", "TransactionBatch"]
\ No newline at end of file
@@ -2,10 +2,66 @@
 Définition des données comptables utilisées par le générateur FEC
 """
 
-from faker import Faker
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+
+class AccountIndex(namedtuple("AccountIndex", [
+        "plan_comptable", "all_accounts", "journal_accounts",
+        "related_accounts", "auxiliary_accounts"])):
+    """
+    Index immuable et précalculé des comptes, construit une seule fois par processus
+
+    Attributes:
+        plan_comptable (Mapping): Compte -> libellé
+        all_accounts (tuple): Tous les comptes du plan, dans l'ordre du plan
+        journal_accounts (Mapping): Code journal -> comptes candidats
+        related_accounts (Mapping): Préfixe de compte (3 car.) -> comptes de contrepartie
+        auxiliary_accounts (Mapping): Préfixe de compte (3 car.) -> couples (code, libellé) auxiliaires
+    """
+    __slots__ = ()
+
+    def relevant_accounts(self, journal_code):
+        """Retourne les comptes candidats d'un journal en O(1)"""
+        return self.journal_accounts.get(journal_code, self.all_accounts)
+
+    def related_accounts_for(self, debit_account):
+        """Retourne les comptes de contrepartie d'un compte au débit en O(1)"""
+        related = self.related_accounts.get(debit_account[:3])
+        if related is None:
+            # Compte hors plan : calcul à la volée
+            related = _filter_related(self.all_accounts, debit_account)
+        return related
+
+    def auxiliaries_for(self, account):
+        """Retourne les comptes auxiliaires (code, libellé) rattachés à un compte"""
+        return self.auxiliary_accounts.get(account[:3], ())
+
+
+def _filter_relevant(accounts, journal_code):
+    """Filtre les comptes pertinents pour un journal"""
+    if journal_code == "AC":
+        return tuple(acc for acc in accounts if acc.startswith(("60", "61", "62", "401")))
+    elif journal_code == "VE":
+        return tuple(acc for acc in accounts if acc.startswith(("41", "70")))
+    elif journal_code == "BQ":
+        return tuple(acc for acc in accounts if acc.startswith(("5", "40", "41", "6", "7")))
+    else:
+        return tuple(accounts)
+
+
+def _filter_related(accounts, debit_account):
+    """Filtre les comptes de contrepartie cohérents avec un compte au débit"""
+    if debit_account.startswith("6"):  # Si débit sur charge
+        return tuple(acc for acc in accounts if acc.startswith(("4", "5")))
+    elif debit_account.startswith("2"):  # Si débit sur immobilisation
+        return tuple(acc for acc in accounts if acc.startswith(("404", "512")))
+    elif debit_account.startswith("401"):  # Si débit sur fournisseur
+        return tuple(acc for acc in accounts if acc.startswith("5"))
+    else:
+        return tuple(acc for acc in accounts if not acc.startswith(debit_account[:3]))
 
-# Initialiser le générateur de données fictives
-fake = Faker('fr_FR')
 
 class AccountingData:
     """
@@ -249,32 +305,49 @@ class AccountingData:
         }
         return aux
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_index():
+        """
+        Construit (une seule fois par processus) l'index précalculé des comptes
+
+        Returns:
+            AccountIndex: Index immuable journal/préfixe/compte
+        """
+        plan_comptable = AccountingData.get_plan_comptable()
+        accounts = tuple(plan_comptable.keys())
+
+        journal_accounts = {
+            journal_code: _filter_relevant(accounts, journal_code)
+            for journal_code in AccountingData.get_journals()
+        }
+
+        # Les règles de contrepartie ne dépendent que des 3 premiers caractères
+        related_accounts = {}
+        for acc in accounts:
+            prefix = acc[:3]
+            if prefix not in related_accounts:
+                related_accounts[prefix] = _filter_related(accounts, acc)
+
+        auxiliary_accounts = {
+            prefix: tuple(aux.items())
+            for prefix, aux in AccountingData.get_auxiliaires().items()
+        }
+
+        return AccountIndex(
+            plan_comptable=MappingProxyType(plan_comptable),
+            all_accounts=accounts,
+            journal_accounts=MappingProxyType(journal_accounts),
+            related_accounts=MappingProxyType(related_accounts),
+            auxiliary_accounts=MappingProxyType(auxiliary_accounts),
+        )
+
     @staticmethod
     def get_relevant_accounts(journal_code):
         """Retourne les comptes pertinents pour un journal donné"""
-        # Récupération du plan comptable
-        plan_comptable = AccountingData.get_plan_comptable()
-        
-        if journal_code == "AC":
-            return [acc for acc in plan_comptable.keys() if acc.startswith(("60", "61", "62", "401"))]
-        elif journal_code == "VE":
-            return [acc for acc in plan_comptable.keys() if acc.startswith(("41", "70"))]
-        elif journal_code == "BQ":
-            return [acc for acc in plan_comptable.keys() if acc.startswith(("5", "40", "41", "6", "7"))]
-        else:
-            return list(plan_comptable.keys())
+        return list(AccountingData.get_index().relevant_accounts(journal_code))
     
     @staticmethod
     def get_related_account(debit_account):
         """Retourne un compte cohérent avec le compte au débit"""
-        # Récupération du plan comptable
-        plan_comptable = AccountingData.get_plan_comptable()
-        
-        if debit_account.startswith("6"):  # Si débit sur charge
-            return [acc for acc in plan_comptable.keys() if acc.startswith(("4", "5"))]
-        elif debit_account.startswith("2"):  # Si débit sur immobilisation
-            return [acc for acc in plan_comptable.keys() if acc.startswith(("404", "512"))]
-        elif debit_account.startswith("401"):  # Si débit sur fournisseur
-            return [acc for acc in plan_comptable.keys() if acc.startswith("5")]
-        else:
-            return [acc for acc in plan_comptable.keys() if not acc.startswith(debit_account[:3])]
\ No newline at end of file
+        return list(AccountingData.get_index().related_accounts_for(debit_account))
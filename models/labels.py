@@ -0,0 +1,143 @@
+"""
+Libellés d'écritures précalculés pour le générateur FEC
+
+Les libellés sont composés à partir de gabarits par famille, de vocabulaires
+fixes et des dates de l'année déjà mises en forme : générer un libellé se
+réduit à quelques tirages d'entiers et à une lecture de table.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# Vocabulaire des libellés
+LABEL_SUPPLIERS = ("DALKIA FRANCE", "TELECOM SAS", "FOURNITURES BUREAU", "PAPETERIE EXPRESS", "ELECTRICITE DE FRANCE")
+LABEL_CLIENTS = ("CLIENT ALPHA", "CLIENT BETA", "CLIENT GAMMA", "CLIENT DELTA", "CLIENT EPSILON")
+
+# Familles de libellés (selon le journal et, pour la banque, la classe du compte)
+LABEL_AC, LABEL_VE, LABEL_BQ_CB, LABEL_BQ_VIR, LABEL_BQ_OP, LABEL_OD, LABEL_OTHER = range(7)
+
+# Gabarits par famille : (format de la date, texte avant l'éventuel numéro)
+LABEL_TEMPLATES = {
+    LABEL_AC: ("%y%m%d", "FACT {date} {word}"),
+    LABEL_VE: (None, "FACT CLIENT {word} "),
+    LABEL_BQ_CB: ("%d/%m", "CB {date} FOURNISSEUR"),
+    LABEL_BQ_VIR: ("%d/%m", "VIREMENT {date} REF "),
+    LABEL_BQ_OP: ("%d/%m", "OPERATION BANCAIRE {date}"),
+    LABEL_OD: ("%m/%Y", "ECRITURE DE REGULARISATION {date}"),
+    LABEL_OTHER: ("%d/%m/%Y", "OPERATION DIVERSE {date}"),
+}
+
+# Vocabulaire utilisé par famille
+LABEL_WORDS = {LABEL_AC: LABEL_SUPPLIERS, LABEL_VE: LABEL_CLIENTS}
+
+# Familles terminées par un numéro : borne (exclue) du numéro
+LABEL_NUMBERS = {LABEL_VE: 10 ** 6, LABEL_BQ_VIR: 10 ** 8}
+
+# Familles des journaux hors banque
+JOURNAL_FAMILIES = {"AC": LABEL_AC, "VE": LABEL_VE, "OD": LABEL_OD}
+
+
+def label_family(journal, account):
+    """
+    Retourne la famille de libellé d'une écriture
+
+    Args:
+        journal (str): Code du journal
+        account (str): Compte au débit
+
+    Returns:
+        int: Famille de libellé (LABEL_*)
+    """
+    if journal == "BQ":
+        if account.startswith("6"):
+            return LABEL_BQ_CB
+        elif account.startswith("5"):
+            return LABEL_BQ_VIR
+        return LABEL_BQ_OP
+    return JOURNAL_FAMILIES.get(journal, LABEL_OTHER)
+
+
+class LabelPool:
+    """
+    Libellés (ou leur préfixe, avant le numéro) précalculés pour une année
+
+    Chaque famille dispose d'une table indexée par jour * word_count + mot,
+    où jour est le rang de la date depuis le 1er janvier.
+    """
+
+    def __init__(self, today):
+        """
+        Précalcule les tables jusqu'à la date de référence incluse
+
+        Args:
+            today (date): Date de référence (dernière date possible des libellés)
+        """
+        year_start = date(today.year, 1, 1)
+        self.day_count = (today - year_start).days + 1
+        self.word_count = len(LABEL_SUPPLIERS)
+        days = [year_start + timedelta(days=d) for d in range(self.day_count)]
+
+        self.tables = {}
+        for family, (date_format, template) in LABEL_TEMPLATES.items():
+            words = LABEL_WORDS.get(family, ("",))
+            dates = [d.strftime(date_format) for d in days] if date_format else [""] * self.day_count
+            self.tables[family] = np.array([
+                template.format(date=d, word=words[w % len(words)])
+                for d in dates for w in range(self.word_count)
+            ], dtype=object)
+
+    def label(self, family, day, word, number=0):
+        """
+        Compose un libellé
+
+        Args:
+            family (int): Famille de libellé (LABEL_*)
+            day (int): Rang de la date dans l'année
+            word (int): Rang du mot dans le vocabulaire
+            number (int, optional): Numéro (familles de LABEL_NUMBERS)
+
+        Returns:
+            str: Libellé
+        """
+        prefix = self.tables[family][day * self.word_count + word]
+        return f"{prefix}{number}" if family in LABEL_NUMBERS else prefix
+
+    def render(self, families, days, words, numbers):
+        """
+        Compose des libellés en masse
+
+        Args:
+            families (numpy.ndarray): Familles de libellé
+            days (numpy.ndarray): Rangs des dates dans l'année
+            words (numpy.ndarray): Rangs des mots
+            numbers (numpy.ndarray): Numéros (ignorés hors LABEL_NUMBERS)
+
+        Returns:
+            numpy.ndarray: Libellés (tableau d'objets)
+        """
+        labels = np.empty(len(families), dtype=object)
+        index = np.asarray(days, dtype=np.int64) * self.word_count + words
+        for family, table in self.tables.items():
+            mask = families == family
+            if not mask.any():
+                continue
+            labels[mask] = table[index[mask]]
+            if family in LABEL_NUMBERS:
+                labels[mask] += numbers[mask].astype(str).astype(object)
+        return labels
+
+
+@lru_cache(maxsize=8)
+def get_label_pool(today):
+    """
+    Retourne le pool de libellés d'une date de référence (construit une fois par processus)
+
+    Args:
+        today (date): Date de référence
+
+    Returns:
+        LabelPool: Pool de libellés
+    """
+    return LabelPool(today)
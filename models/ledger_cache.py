@@ -0,0 +1,410 @@
+"""
+Cache disque des grands livres générés, adressé par le contenu des paramètres
+
+Une génération reproductible (avec une graine) est entièrement déterminée
+par ses paramètres : le grand livre (colonnes du TransactionBatch) et ses
+fichiers exportés sont conservés dans un répertoire dont le nom est
+l'empreinte SHA-256 de ces paramètres. Une nouvelle demande identique relit
+les colonnes par projection mémoire (mmap) au lieu de les régénérer, et un
+export déjà produit est simplement recopié.
+
+Le cache peut être partagé par plusieurs processus :
+- une entrée est écrite dans un répertoire temporaire puis publiée par un
+  renommage atomique (jamais visible à moitié écrite) ;
+- l'éviction (entrées les moins récemment utilisées d'abord, au-delà de
+  max_bytes) est sérialisée par un verrou fcntl et retire une entrée par
+  renommage avant de la supprimer : un lecteur qui l'a déjà projetée en
+  mémoire continue de la lire, un lecteur qui arrive après la voit absente.
+
+Structure du répertoire:
+    cache/
+    ├── lock                        # Verrou de l'éviction
+    ├── tmp/                        # Entrées en cours d'écriture ou de suppression
+    └── ledgers/<empreinte>/
+        ├── meta.json               # Paramètres, date de référence, nombre de lignes
+        ├── <colonne>.npy           # Colonnes numériques (lues par mmap)
+        ├── label.txt               # Libellés, séparés par un caractère nul
+        └── output-<empreinte>      # Fichiers exportés (format et options)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from utils.seeding import as_seed_sequence
+from .transaction_batch import TransactionBatch
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows : éviction sans verrou inter-processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Version du format et de la génération : à incrémenter quand une même graine
+# ne donne plus les mêmes écritures (les anciennes entrées sont alors ignorées)
+CACHE_VERSION = 1
+
+# Taille maximale par défaut du cache (octets)
+DEFAULT_MAX_BYTES = 10 * 2**30
+
+# Séparateur des libellés dans label.txt
+_LABEL_SEPARATOR = "\0"
+
+
+def cache_key(params):
+    """
+    Empreinte d'une génération
+
+    Args:
+        params (dict): Paramètres déterminant les écritures (sérialisables en JSON),
+            dont la graine ("seed", int ou SeedSequence)
+
+    Returns:
+        str: Empreinte SHA-256 (hexadécimale), ou None sans graine (génération non reproductible)
+    """
+    if params.get("seed") is None:
+        return None
+    seed = as_seed_sequence(params["seed"])
+    params = dict(params, version=CACHE_VERSION, seed={
+        "entropy": str(seed.entropy), "spawn_key": [int(key) for key in seed.spawn_key],
+        "pool_size": seed.pool_size})
+    text = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def output_name(format, options=None):
+    """
+    Nom du fichier exporté dans une entrée du cache
+
+    Args:
+        format (str): Format d'export ("csv", "excel", "parquet")
+        options (dict, optional): Options d'export. Par défaut, aucune.
+
+    Returns:
+        str: Nom dérivé du format et des options
+    """
+    text = json.dumps({"format": format, "options": options or {}}, sort_keys=True, default=str)
+    return f"output-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _directory_size(path):
+    """Taille des fichiers d'un répertoire (non récursif)"""
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+class LedgerCache:
+    """
+    Cache disque des grands livres générés et de leurs exports, borné en taille (LRU)
+
+    Example:
+        cache = LedgerCache("~/.cache/fec", max_bytes=20 * 2**30)
+        generator = FECGenerator(transaction_count=1_000_000, engine="numpy", seed=42, cache=cache)
+        generator.export_to_csv("fec.csv")   # premier appel : génération, puis mise en cache
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initialise le cache (les répertoires sont créés si nécessaire)
+
+        Args:
+            directory (str): Répertoire du cache
+            max_bytes (int, optional): Taille maximale ; au-delà, les entrées les moins
+                récemment utilisées sont supprimées. Par défaut à 10 Gio.
+        """
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self._ledgers = os.path.join(self.directory, "ledgers")
+        self._tmp = os.path.join(self.directory, "tmp")
+        os.makedirs(self._ledgers, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def __repr__(self):
+        return f"<LedgerCache {self.directory} max {self.max_bytes} octets>"
+
+    def _entry(self, key):
+        return os.path.join(self._ledgers, key)
+
+    def _touch(self, key):
+        """Marque une entrée comme utilisée (date de modification de meta.json)"""
+        try:
+            os.utime(os.path.join(self._entry(key), "meta.json"))
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, key):
+        return key is not None and os.path.exists(os.path.join(self._entry(key), "meta.json"))
+
+    def meta(self, key):
+        """
+        Description d'une entrée (paramètres, date de référence, nombre de lignes)
+
+        Args:
+            key (str): Empreinte (voir cache_key)
+
+        Returns:
+            dict: Contenu de meta.json, ou None si l'entrée est absente
+        """
+        if key is None:
+            return None
+        try:
+            with open(os.path.join(self._entry(key), "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, key):
+        """
+        Relit un grand livre du cache
+
+        Les colonnes numériques sont projetées en mémoire en copie sur écriture :
+        seules les pages lues sont chargées, et une modification (correction de
+        l'équilibre à l'export) reste locale au processus. Les libellés (chaînes
+        Python) sont lus d'un bloc.
+
+        Args:
+            key (str): Empreinte (voir cache_key)
+
+        Returns:
+            TransactionBatch: Lignes mises en cache, ou None si l'entrée est absente
+        """
+        meta = self.meta(key)
+        if meta is None:
+            return None
+        entry = self._entry(key)
+        try:
+            lines = meta["lines"]
+            columns = {}
+            for name in TransactionBatch.COLUMNS:
+                if name == "label":
+                    continue
+                path = os.path.join(entry, f"{name}.npy")
+                # Un fichier sans données ne peut pas être projeté en mémoire
+                columns[name] = np.load(path, mmap_mode="c") if lines else np.load(path)
+            with open(os.path.join(entry, "label.txt"), "rb") as f:
+                labels = f.read().decode("utf-8").split(_LABEL_SEPARATOR) if lines else []
+            columns["label"] = np.array(labels, dtype=object)
+            batch = TransactionBatch(datetime.fromisoformat(meta["base_date"]), **columns)
+        except (OSError, ValueError, KeyError):
+            # Entrée absente, évincée pendant la lecture ou illisible : à régénérer
+            return None
+        if len(batch) != lines:
+            return None
+        self._touch(key)
+        return batch
+
+    def store(self, key, batch, params=None):
+        """
+        Met en cache un grand livre
+
+        L'entrée est écrite dans un répertoire temporaire puis publiée par un
+        renommage atomique ; si un autre processus l'a publiée entre-temps, la
+        sienne est conservée.
+
+        Args:
+            key (str): Empreinte (voir cache_key)
+            batch (TransactionBatch): Lignes à mettre en cache
+            params (dict, optional): Paramètres de la génération, conservés pour information
+        """
+        if key is None or key in self:
+            return
+        labels = batch.label.tolist()
+        if any(_LABEL_SEPARATOR in label for label in labels):
+            logger.warning("Libellés non mis en cache (caractère nul): %s", key)
+            return
+
+        staging = os.path.join(self._tmp, uuid.uuid4().hex)
+        os.makedirs(staging)
+        try:
+            for name in TransactionBatch.COLUMNS:
+                if name != "label":
+                    np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(getattr(batch, name)))
+            with open(os.path.join(staging, "label.txt"), "wb") as f:
+                f.write(_LABEL_SEPARATOR.join(labels).encode("utf-8"))
+            meta = {"version": CACHE_VERSION, "base_date": batch.base_date.isoformat(), "lines": len(batch),
+                    "params": params or {}, "created": time.time()}
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2, default=str)
+            try:
+                os.rename(staging, self._entry(key))
+            except OSError:
+                # Entrée publiée par un autre processus
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def output(self, key, name):
+        """
+        Fichier exporté mis en cache
+
+        Args:
+            key (str): Empreinte du grand livre
+            name (str): Nom du fichier dans l'entrée (voir output_name)
+
+        Returns:
+            tuple: (chemin dans le cache, suffixe ajouté par l'export au nom demandé,
+                par exemple ".gz"), ou None si le fichier est absent
+        """
+        if key is None:
+            return None
+        path = os.path.join(self._entry(key), name)
+        try:
+            with open(f"{path}.json", encoding="utf-8") as f:
+                suffix = json.load(f)["suffix"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if not os.path.exists(path):
+            return None
+        self._touch(key)
+        return path, suffix
+
+    def copy_output(self, key, name, filename):
+        """
+        Recopie un fichier exporté mis en cache
+
+        Args:
+            key (str): Empreinte du grand livre
+            name (str): Nom du fichier dans l'entrée (voir output_name)
+            filename (str): Nom demandé à l'export (le suffixe mis en cache y est ajouté)
+
+        Returns:
+            str: Chemin du fichier recopié, ou None si le fichier n'est pas en cache
+        """
+        cached = self.output(key, name)
+        if cached is None:
+            return None
+        path, suffix = cached
+        destination = filename + suffix
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            # Entrée évincée entre-temps
+            return None
+        return destination
+
+    def store_output(self, key, name, filename, requested):
+        """
+        Met en cache un fichier exporté
+
+        Seuls les exports en un fichier sont mis en cache (pas les CSV en parties).
+
+        Args:
+            key (str): Empreinte du grand livre (l'entrée doit exister)
+            name (str): Nom du fichier dans l'entrée (voir output_name)
+            filename (str): Fichier produit par l'export
+            requested (str): Nom demandé à l'export (filename en est un préfixe)
+        """
+        if key not in self or not filename.startswith(requested):
+            return
+        entry = self._entry(key)
+        staging = os.path.join(entry, f".{name}.{uuid.uuid4().hex}")
+        try:
+            shutil.copyfile(filename, staging)
+            os.replace(staging, os.path.join(entry, name))
+            with open(staging, "w", encoding="utf-8") as f:
+                json.dump({"suffix": filename[len(requested):]}, f)
+            os.replace(staging, os.path.join(entry, f"{name}.json"))
+        except FileNotFoundError:
+            # Entrée évincée pendant l'écriture
+            return
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        self.evict()
+
+    def entries(self):
+        """
+        Entrées du cache, des moins récemment utilisées aux plus récentes
+
+        Returns:
+            list: Tuples (empreinte, dernière utilisation, taille en octets)
+        """
+        entries = []
+        for key in os.listdir(self._ledgers):
+            entry = self._entry(key)
+            try:
+                used = os.stat(os.path.join(entry, "meta.json")).st_mtime
+                entries.append((key, used, _directory_size(entry)))
+            except OSError:
+                continue
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def size(self):
+        """Taille totale des entrées en octets"""
+        return sum(size for _, _, size in self.entries())
+
+    def remove(self, key):
+        """
+        Supprime une entrée
+
+        L'entrée est d'abord renommée (retrait atomique), puis supprimée.
+
+        Args:
+            key (str): Empreinte
+        """
+        doomed = os.path.join(self._tmp, f"evicted-{uuid.uuid4().hex}")
+        try:
+            os.rename(self._entry(key), doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def evict(self, max_bytes=None):
+        """
+        Supprime les entrées les moins récemment utilisées au-delà de la taille maximale
+
+        Args:
+            max_bytes (int, optional): Taille maximale. Par défaut, self.max_bytes.
+
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with open(os.path.join(self.directory, "lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self.entries()
+            total = sum(size for _, _, size in entries)
+            removed = 0
+            for key, _, size in entries:
+                if total <= max_bytes:
+                    break
+                self.remove(key)
+                total -= size
+                removed += 1
+        if removed:
+            logger.info("Cache: %d entrée(s) évincée(s), %d octets conservés", removed, total)
+        return removed
+
+    def clear(self):
+        """Supprime toutes les entrées"""
+        self.evict(0)
+
+
+def as_cache(cache):
+    """
+    Normalise le paramètre cache du générateur
+
+    Args:
+        cache (LedgerCache | str | None): Cache, répertoire du cache ou None
+
+    Returns:
+        LedgerCache: Cache, ou None
+    """
+    if cache is None or isinstance(cache, LedgerCache):
+        return cache
+    return LedgerCache(cache)
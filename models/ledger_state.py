@@ -0,0 +1,305 @@
+"""
+État de fin de période d'un FEC généré, pour le prolonger sans le régénérer
+
+L'état d'un FEC tient en quelques compteurs : dernier numéro d'écriture de
+chaque journal, dernière date d'écriture et fin de la période générée. Il est
+relu depuis le fichier (CSV, éventuellement compressé, ou Parquet) ou, sans
+relecture, depuis le fichier d'état enregistré à côté de lui
+(FEC.csv.state.json), tant que le FEC n'a pas été modifié depuis. Un export de
+FECGenerator enregistre la fin de sa période (voir save_period) ; un
+prolongement enregistre l'état complet.
+
+Un FEC Parquet est prolongé par parties : FEC.parquet, puis FEC.part0002.parquet,
+FEC.part0003.parquet... (voir ledger_files), lisibles ensemble comme un jeu de
+données (pyarrow.dataset.dataset(ledger_files("FEC.parquet"))).
+"""
+
+import glob
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .vectorized import get_tables
+
+# Suffixe du fichier d'état enregistré à côté du FEC
+STATE_SUFFIX = ".state.json"
+
+# Colonnes du FEC lues pour reconstituer l'état
+_JOURNAL, _ECR_NUM, _ECR_DATE = 0, 2, 3
+READ_FIELDS = ("JournalCode", "EcritureNum", "EcritureDate")
+
+
+def state_filename(filename):
+    """Fichier d'état d'un FEC"""
+    return filename + STATE_SUFFIX
+
+
+def ledger_files(filename):
+    """
+    Fichiers formant un FEC : le fichier lui-même et, pour un Parquet prolongé, ses parties
+
+    Args:
+        filename (str): Fichier FEC
+
+    Returns:
+        list: Fichiers, dans l'ordre des écritures
+    """
+    if not filename.endswith(".parquet"):
+        return [filename]
+    stem = glob.escape(filename[:-len(".parquet")])
+    return [filename] + sorted(glob.glob(f"{stem}.part[0-9][0-9][0-9][0-9].parquet"))
+
+
+def next_part_filename(filename):
+    """Fichier de la prochaine partie d'un FEC Parquet (voir ledger_files)"""
+    return f"{filename[:-len('.parquet')]}.part{len(ledger_files(filename)) + 1:04d}.parquet"
+
+
+def _file_signature(filename):
+    """Taille et date de modification des fichiers d'un FEC (détection d'une modification)"""
+    stats = [os.stat(name) for name in ledger_files(filename)]
+    signature = {"bytes": sum(stat.st_size for stat in stats), "mtime_ns": max(stat.st_mtime_ns for stat in stats)}
+    if len(stats) > 1:
+        signature["parts"] = len(stats)
+    return signature
+
+
+class LedgerState:
+    """
+    État d'un FEC à la fin de sa période
+
+    Attributes:
+        last_date (datetime): Date de la dernière écriture (None pour un FEC vide)
+        ecr_counters (dict): Dernier numéro d'écriture par code journal
+        lines (int): Nombre de lignes
+        end_date (datetime): Fin de la période générée, qui peut suivre la dernière écriture
+            (None si inconnue : FEC relu sans fichier d'état)
+    """
+
+    def __init__(self, last_date=None, ecr_counters=None, lines=0, end_date=None):
+        self.last_date = last_date
+        self.end_date = end_date
+        self.ecr_counters = dict(ecr_counters or {})
+        self.lines = lines
+
+    def __repr__(self):
+        last_date = f"{self.last_date:%Y-%m-%d}" if self.last_date else None
+        return f"<LedgerState {self.lines} lignes, jusqu'au {last_date}, {len(self.ecr_counters)} journaux>"
+
+    @property
+    def covered_until(self):
+        """Dernier jour couvert par le FEC : fin de la période générée, sinon dernière écriture"""
+        dates = [date for date in (self.last_date, self.end_date) if date is not None]
+        return max(dates) if dates else None
+
+    @property
+    def next_date(self):
+        """Premier jour suivant la période couverte (voir covered_until)"""
+        covered_until = self.covered_until
+        return None if covered_until is None else covered_until + timedelta(days=1)
+
+    def update(self, batch):
+        """
+        Met à jour l'état avec un lot d'écritures ajouté à la fin du FEC
+
+        Args:
+            batch (TransactionBatch): Lignes ajoutées
+        """
+        if not len(batch):
+            return
+        tables = get_tables()
+        journals = np.unique(batch.journal)
+        last_ids = np.full(len(tables.journal_codes), -1, dtype=np.int64)
+        np.maximum.at(last_ids, batch.journal.astype(np.intp), batch.ecr_id)
+        for journal in journals.tolist():
+            code = tables.journal_codes[journal]
+            self.ecr_counters[code] = max(self.ecr_counters.get(code, 0), int(last_ids[journal]))
+
+        last_date = batch.base_date + timedelta(days=int(batch.date.max()))
+        if self.last_date is None or last_date > self.last_date:
+            self.last_date = last_date
+        if batch.period is not None:
+            end_date = batch.base_date + timedelta(days=batch.period[1])
+            if self.end_date is None or end_date > self.end_date:
+                self.end_date = end_date
+        self.lines += len(batch)
+
+    def update_rows(self, rows):
+        """
+        Met à jour l'état avec des lignes FEC lues d'un fichier
+
+        Args:
+            rows (iterable): Lignes (listes de champs texte, colonnes FEC dans l'ordre)
+        """
+        counters = self.ecr_counters
+        last_day = f"{self.last_date:%Y%m%d}" if self.last_date else ""
+        for row in rows:
+            code = row[_JOURNAL]
+            number = int(row[_ECR_NUM][len(code):])
+            if number > counters.get(code, 0):
+                counters[code] = number
+            if row[_ECR_DATE] > last_day:
+                last_day = row[_ECR_DATE]
+            self.lines += 1
+        if last_day:
+            self.last_date = datetime.strptime(last_day, "%Y%m%d")
+
+    def update_columns(self, columns):
+        """
+        Met à jour l'état avec un bloc de lignes lu par utils.fec_reader.FECReader
+
+        Args:
+            columns (dict): Colonnes du bloc (voir READ_FIELDS) : octets et dates
+                numpy.datetime64[D]
+        """
+        journal, ecr_num = columns["JournalCode"], columns["EcritureNum"]
+        if not len(journal):
+            return
+        codes, inverse = np.unique(journal, return_inverse=True)
+        lengths = np.char.str_len(ecr_num)
+        for index, code in enumerate(codes.tolist()):
+            numbers = ecr_num[inverse == index]
+            longest = lengths[inverse == index]
+            # Numéros complétés par des zéros : le plus grand est le plus long, puis le dernier dans l'ordre
+            number = int(np.sort(numbers[longest == longest.max()])[-1][len(code):])
+            code = code.decode("ascii")
+            if number > self.ecr_counters.get(code, 0):
+                self.ecr_counters[code] = number
+
+        last_date = columns["EcritureDate"].max()
+        if not np.isnat(last_date):
+            last_date = last_date.astype(datetime)
+            last_date = datetime(last_date.year, last_date.month, last_date.day)
+            if self.last_date is None or last_date > self.last_date:
+                self.last_date = last_date
+        self.lines += len(journal)
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Relit l'état d'un FEC CSV (brut, .gz ou .zst), en une passe sur le fichier
+
+        Le fichier est lu en colonnes par blocs (voir utils.fec_reader) ; un FEC
+        mal formé n'est pas prolongé.
+
+        Args:
+            filename (str): Fichier FEC
+
+        Returns:
+            LedgerState: État du FEC
+
+        Raises:
+            ValueError: Le FEC contient une ligne mal formée
+        """
+        from utils.fec_reader import FECReader
+
+        state = cls()
+        for chunk in FECReader(filename, READ_FIELDS, max_errors=1):
+            if chunk.errors:
+                raise ValueError(f"{filename}: {chunk.errors[0]}")
+            state.update_columns(chunk.columns)
+        return state
+
+    @classmethod
+    def from_parquet(cls, filename):
+        """
+        Relit l'état d'un FEC Parquet et de ses parties, groupe de lignes par groupe de lignes
+
+        Args:
+            filename (str): Fichier Parquet (voir exporters.parquet_exporter et ledger_files)
+
+        Returns:
+            LedgerState: État du FEC
+        """
+        import pyarrow.parquet as pq
+
+        state = cls()
+        for name in ledger_files(filename):
+            parquet = pq.ParquetFile(name)
+            for index in range(parquet.num_row_groups):
+                table = parquet.read_row_group(index, columns=list(READ_FIELDS))
+                journal, ecr_num, dates = (table.column(field).to_pylist() for field in READ_FIELDS)
+                state.update_rows((j, None, n, f"{d:%Y%m%d}") for j, n, d in zip(journal, ecr_num, dates))
+        return state
+
+    def to_dict(self):
+        """Description JSON de l'état"""
+        return {
+            "last_date": f"{self.last_date:%Y-%m-%d}" if self.last_date else None,
+            "ecr_counters": self.ecr_counters,
+            "lines": self.lines,
+            "end_date": f"{self.end_date:%Y-%m-%d}" if self.end_date else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Construit l'état depuis sa description JSON (voir to_dict)"""
+        last_date = datetime.strptime(data["last_date"], "%Y-%m-%d") if data.get("last_date") else None
+        end_date = datetime.strptime(data["end_date"], "%Y-%m-%d") if data.get("end_date") else None
+        return cls(last_date, data["ecr_counters"], data["lines"], end_date)
+
+    def save(self, filename):
+        """
+        Enregistre l'état à côté du FEC, avec la signature du fichier à cet instant
+
+        Args:
+            filename (str): Fichier FEC décrit par l'état
+        """
+        _write_state(filename, self.to_dict())
+
+
+def _write_state(filename, data):
+    """Écrit le fichier d'état d'un FEC, avec la signature du fichier à cet instant"""
+    path = state_filename(filename)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(dict(data, file=_file_signature(filename)), f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def save_period(filename, end_date):
+    """
+    Enregistre à côté d'un FEC exporté la fin de sa période générée
+
+    Les compteurs ne sont pas calculés à l'export : ils sont relus du FEC au
+    premier prolongement (voir read_state), qui reprend au lendemain de end_date.
+
+    Args:
+        filename (str): Fichier FEC exporté
+        end_date (datetime): Fin de la période générée
+    """
+    _write_state(filename, {"end_date": f"{end_date:%Y-%m-%d}"})
+
+
+def read_state(filename):
+    """
+    État d'un FEC existant
+
+    Le fichier d'état est utilisé s'il décrit le FEC dans son état actuel
+    (même taille, même date de modification) ; sinon le FEC est relu. Un
+    fichier d'état d'export (voir save_period) ne donne que la fin de période :
+    les compteurs sont relus du FEC.
+
+    Args:
+        filename (str): Fichier FEC (CSV, .gz, .zst ou .parquet)
+
+    Returns:
+        LedgerState: État du FEC
+    """
+    end_date = None
+    try:
+        with open(state_filename(filename), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("file") == _file_signature(filename):
+            if "ecr_counters" in data:
+                return LedgerState.from_dict(data)
+            end_date = datetime.strptime(data["end_date"], "%Y-%m-%d")
+    except (OSError, ValueError, KeyError):
+        pass
+    if filename.endswith(".parquet"):
+        state = LedgerState.from_parquet(filename)
+    else:
+        state = LedgerState.from_csv(filename)
+    state.end_date = end_date
+    return state
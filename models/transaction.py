@@ -2,13 +2,15 @@
 Modèle représentant une transaction comptable pour le générateur FEC
 """
 
-import random
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 import string
-from faker import Faker
 
-# Initialiser le générateur de données fictives
-fake = Faker('fr_FR')
+from utils.seeding import default_context
+from .labels import LABEL_NUMBERS, get_label_pool, label_family
+
+# Lettrage : comptes concernés et probabilité d'être lettré
+LETTERING_PREFIXES = ("401", "411")
+LETTERING_RATE = 0.2
 
 class Transaction:
     """
@@ -16,91 +18,102 @@ class Transaction:
     """
     
     @staticmethod
-    def generate_transaction_date(start_date, end_date):
+    def generate_transaction_date(start_date, end_date, context=None):
         """Génère une date aléatoire dans la période (jours ouvrés)"""
+        rng = (context or default_context()).random
         delta = (end_date - start_date).days
-        random_days = random.randint(0, delta)
+        random_days = rng.randint(0, delta)
         transaction_date = start_date + timedelta(days=random_days)
         
         # Si weekend, ajuster au vendredi précédent
         if transaction_date.weekday() >= 5:  # 5=samedi, 6=dimanche
-            transaction_date -= timedelta(days=transaction_date.weekday() - 4)  # revenir au vendredi
+            friday = transaction_date - timedelta(days=transaction_date.weekday() - 4)  # revenir au vendredi
+            monday = transaction_date + timedelta(days=7 - transaction_date.weekday())
+            # Vendredi avant le début de la période : lundi suivant, s'il est dans la période
+            if friday >= start_date:
+                transaction_date = friday
+            elif monday <= end_date:
+                transaction_date = monday
             
         return transaction_date
     
     @staticmethod
-    def generate_valid_date(transaction_date, end_date):
+    def generate_valid_date(transaction_date, end_date, context=None):
         """Génère une date de validation postérieure à la date de transaction"""
         max_days = min(7, (end_date - transaction_date).days)
         if max_days <= 0:
             return transaction_date.strftime("%Y%m%d")
-        days_after = random.randint(0, max_days)
+        days_after = (context or default_context()).random.randint(0, max_days)
         valid_date = transaction_date + timedelta(days=days_after)
         return valid_date.strftime("%Y%m%d")
     
     @staticmethod
-    def generate_realistic_amount(account):
-        """Génère un montant réaliste basé sur le type de compte"""
+    def get_amount_bounds(account):
+        """Retourne les bornes (min, max) du montant selon le type de compte"""
         account_prefix = account[:1]
         
         # Montants plus élevés pour certains comptes
         if account in ["401000", "411000", "512000"]:
-            return round(random.uniform(100, 10000), 2)
+            return 100, 10000
         
         # Achats et ventes
         elif account_prefix in ["6", "7"]:
-            return round(random.uniform(10, 2000), 2)
+            return 10, 2000
         
         # Immobilisations
         elif account_prefix == "2":
-            return round(random.uniform(500, 20000), 2)
+            return 500, 20000
         
         # Valeur par défaut
         else:
-            return round(random.uniform(10, 1000), 2)
+            return 10, 1000
     
     @staticmethod
-    def generate_transaction_label(account, journal):
-        """Génère un libellé réaliste pour une transaction (sans accents)"""
-        if journal == "AC":
-            suppliers = ["DALKIA FRANCE", "TELECOM SAS", "FOURNITURES BUREAU", "PAPETERIE EXPRESS", "ELECTRICITE DE FRANCE"]
-            return f"FACT {fake.date_this_year().strftime('%y%m%d')} {random.choice(suppliers)}"
-        
-        elif journal == "VE":
-            clients = ["CLIENT ALPHA", "CLIENT BETA", "CLIENT GAMMA", "CLIENT DELTA", "CLIENT EPSILON"]
-            return f"FACT CLIENT {random.choice(clients)} {fake.random_number(digits=6)}"
-        
-        elif journal == "BQ":
-            if account.startswith("6"):
-                return f"CB {fake.date_this_year().strftime('%d/%m')} FOURNISSEUR"
-            elif account.startswith("5"):
-                return f"VIREMENT {fake.date_this_year().strftime('%d/%m')} REF {fake.random_number(digits=8)}"
-            else:
-                return f"OPERATION BANCAIRE {fake.date_this_year().strftime('%d/%m')}"
+    def generate_realistic_amount_cents(account, context=None):
+        """Génère un montant réaliste en centimes (entier exact) basé sur le type de compte"""
+        low, high = Transaction.get_amount_bounds(account)
+        return (context or default_context()).random.randint(low * 100, high * 100)
+    
+    @staticmethod
+    def generate_realistic_amount(account, context=None):
+        """Génère un montant réaliste (en euros, deux décimales) basé sur le type de compte"""
+        return Transaction.generate_realistic_amount_cents(account, context) / 100
+    
+    @staticmethod
+    def generate_transaction_label(account, journal, context=None, today=None):
+        """
+        Génère un libellé réaliste pour une transaction (sans accents)
         
-        elif journal == "OD":
-            return f"ECRITURE DE REGULARISATION {fake.date_this_year().strftime('%m/%Y')}"
+        Le libellé est lu dans le pool précalculé de l'année de `today`
+        (aujourd'hui par défaut) : fixer `today` rend les libellés reproductibles.
+        """
+        rng = (context or default_context()).random
+        pool = get_label_pool(today or date.today())
+        family = label_family(journal, account)
         
-        else:
-            return f"OPERATION DIVERSE {fake.date_this_year().strftime('%d/%m/%Y')}"
+        day = rng.randrange(pool.day_count)
+        word = rng.randrange(pool.word_count)
+        number = rng.randrange(LABEL_NUMBERS[family]) if family in LABEL_NUMBERS else 0
+        return pool.label(family, day, word, number)
     
     @staticmethod
-    def generate_piece_reference(journal, transaction_date):
+    def generate_piece_reference(journal, transaction_date, context=None):
         """Génère une référence de pièce comptable"""
         month = transaction_date.strftime("%m")
-        return f"{journal}{month}{random.randint(1000, 9999)}"
+        return f"{journal}{month}{(context or default_context()).random.randint(1000, 9999)}"
     
     @staticmethod
-    def get_lettering_info(account, end_date):
+    def get_lettering_info(account, end_date, context=None):
         """Génère des informations de lettrage pour certains comptes"""
-        if account.startswith(("401", "411")):
+        if account.startswith(LETTERING_PREFIXES):
+            rng = (context or default_context()).random
             # 20% de chance d'avoir un lettrage
-            if random.random() < 0.2:
-                letter = random.choice(string.ascii_uppercase)
-                num = random.randint(1, 9)
+            if rng.random() < LETTERING_RATE:
+                letter = rng.choice(string.ascii_uppercase)
+                num = rng.randint(1, 9)
                 lettering = f"{letter}{num}"
                 # Date de lettrage
-                date_lettering = (end_date - timedelta(days=random.randint(0, 30))).strftime("%Y%m%d")
+                date_lettering = (end_date - timedelta(days=rng.randint(0, 30))).strftime("%Y%m%d")
                 return lettering, date_lettering
         
         return "", ""
\ No newline at end of file
@@ -0,0 +1,417 @@
+"""
+Stockage en colonnes des lignes d'écritures pour le générateur FEC
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from utils.anomalies import ANOMALY_TYPES
+from utils.formatters import format_cents
+from .vectorized import get_tables
+
+# Taille par défaut des blocs lors de la conversion de lignes (dictionnaires)
+DEFAULT_CHUNK_SIZE = 200000
+
+# Numéros d'écriture couverts par la table précalculée (au-delà : formatage direct)
+ECR_NUM_TABLE_SIZE = 100000
+
+
+@lru_cache(maxsize=None)
+def _number_tables():
+    """
+    Tables de texte précalculées (une fois par processus)
+
+    Returns:
+        tuple: (numéros sur 5 chiffres, numéros de pièce 0-9999, préfixes journal + mois)
+    """
+    codes = get_tables().journal_codes
+    padded = np.array([f"{i:05d}" for i in range(ECR_NUM_TABLE_SIZE)], dtype=object)
+    numbers = np.array([str(i) for i in range(10000)], dtype=object)
+    prefixes = np.array([f"{codes[i // 100]}{i % 100:02d}" if i // 100 < len(codes) else ""
+                         for i in range(100 * (len(codes) + 1))], dtype=object)
+    return padded, numbers, prefixes
+
+
+@lru_cache(maxsize=None)
+def _anomaly_types_text(count):
+    """Types d'anomalies (les count premiers enregistrés), suivis de "" (indice -1 : pas d'anomalie)"""
+    return np.array(ANOMALY_TYPES[:count] + [""], dtype=object)
+
+
+class TransactionBatch:
+    """
+    Lignes d'écritures stockées en colonnes NumPy
+
+    Les colonnes journal, compte et auxiliaire sont des indices dans les tables
+    de l'AccountingData (voir models.vectorized.get_tables), les montants sont
+    en centimes (int64) et les dates en jours depuis base_date (int32).
+    La colonne anomaly est l'indice du type d'anomalie injectée (voir
+    utils.anomalies.ANOMALY_TYPES).
+    La valeur -1 signale un compte auxiliaire, un lettrage ou une anomalie absents.
+    Les lignes d'une même écriture sont contiguës.
+
+    Attributes:
+        period (tuple): Premier et dernier jour de la période générée (décalages depuis
+            base_date), bornes des dates modifiées par les anomalies ; None si inconnue
+    """
+
+    COLUMNS = {
+        "journal": np.int8,
+        "ecr_id": np.int32,
+        "date": np.int32,
+        "hour": np.int8,
+        "piece_ref": np.int32,
+        "piece_date": np.int32,
+        "account": np.int16,
+        "aux": np.int16,
+        "label": object,
+        "debit": np.int64,
+        "credit": np.int64,
+        "lettering": np.int16,
+        "date_lettering": np.int32,
+        "valid_date": np.int32,
+        "anomaly": np.int8,
+    }
+
+    # Valeurs par défaut des colonnes facultatives à la construction
+    DEFAULTS = {"anomaly": -1}
+
+    def __init__(self, base_date, period=None, **columns):
+        """
+        Initialise un lot de lignes à partir de ses colonnes
+
+        Args:
+            base_date (datetime): Date de référence des décalages en jours
+            period (tuple, optional): Premier et dernier jour de la période (décalages depuis
+                base_date). Par défaut, inconnue.
+            **columns: Une valeur par colonne de TransactionBatch.COLUMNS (sauf les colonnes
+                de TransactionBatch.DEFAULTS, facultatives)
+        """
+        self.base_date = base_date
+        self.period = None if period is None else (int(period[0]), int(period[1]))
+        size = None
+        for name, dtype in self.COLUMNS.items():
+            if name not in columns and name in self.DEFAULTS:
+                values = np.full(size or 0, self.DEFAULTS[name], dtype=dtype)
+            else:
+                values = np.asarray(columns[name], dtype=dtype)
+            if size is None:
+                size = len(values)
+            elif len(values) != size:
+                raise ValueError(f"Colonne {name!r}: {len(values)} valeurs au lieu de {size}")
+            setattr(self, name, values)
+
+    def __len__(self):
+        return len(self.journal)
+
+    def __getitem__(self, index):
+        """Retourne les lignes sélectionnées (tranche ou indices) sous forme de lot"""
+        if not isinstance(index, (slice, np.ndarray, list)):
+            raise TypeError("TransactionBatch: sélection par tranche ou tableau d'indices uniquement")
+        return TransactionBatch(self.base_date, self.period,
+                                **{name: getattr(self, name)[index] for name in self.COLUMNS})
+
+    def __repr__(self):
+        return f"<TransactionBatch {len(self)} lignes, base {self.base_date:%Y-%m-%d}>"
+
+    @property
+    def nbytes(self):
+        """Taille des colonnes en octets (hors chaînes des libellés)"""
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def columns(self):
+        """Retourne les colonnes sous forme de dictionnaire"""
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    @classmethod
+    def empty(cls, base_date):
+        """Construit un lot vide"""
+        return cls(base_date, **{name: np.empty(0, dtype=dtype) for name, dtype in cls.COLUMNS.items()})
+
+    @classmethod
+    def from_columns(cls, columns, base_date, period=None):
+        """
+        Construit les lignes (débit puis crédit) à partir des colonnes par écriture
+
+        Args:
+            columns (dict): Colonnes produites par models.vectorized.build_columns
+            base_date (datetime): Date de début de période (origine des décalages)
+            period (tuple, optional): Premier et dernier jour de la période. Par défaut, inconnue.
+
+        Returns:
+            TransactionBatch: Deux lignes par écriture
+        """
+        n = len(columns["journal"])
+
+        def shared(values):
+            return np.repeat(values, 2)
+
+        def sided(debit_values, credit_values):
+            values = np.empty(2 * n, dtype=np.asarray(debit_values).dtype)
+            values[0::2] = debit_values
+            values[1::2] = credit_values
+            return values
+
+        zeros = np.zeros(n, dtype=np.int64)
+        return cls(
+            base_date,
+            period,
+            journal=shared(columns["journal"]),
+            ecr_id=shared(columns["ecr_id"]),
+            date=shared(columns["date"]),
+            hour=np.zeros(2 * n, dtype=np.int8),
+            piece_ref=shared(columns["piece_ref"]),
+            piece_date=shared(columns["date"]),
+            account=sided(columns["debit_account"], columns["credit_account"]),
+            aux=sided(columns["debit_aux"], columns["credit_aux"]),
+            label=shared(columns["label"]),
+            debit=sided(columns["amount"], zeros),
+            credit=sided(zeros, columns["amount"]),
+            lettering=sided(columns["debit_lettering"], columns["credit_lettering"]),
+            date_lettering=sided(columns["debit_date_lettering"], columns["credit_date_lettering"]),
+            valid_date=shared(columns["valid_date"]),
+        )
+
+    @classmethod
+    def from_records(cls, records, base_date, cents=False, period=None):
+        """
+        Construit un lot à partir de lignes d'écritures (dictionnaires du générateur)
+
+        Args:
+            records (list): Lignes d'écritures
+            base_date (datetime): Date de référence des décalages en jours
+            cents (bool, optional): Montants 'debit'/'credit' déjà en centimes (entiers)
+                plutôt qu'en euros. Par défaut à False.
+            period (tuple, optional): Premier et dernier jour de la période. Par défaut, inconnue.
+
+        Returns:
+            TransactionBatch: Lignes en colonnes
+        """
+        tables = get_tables()
+        lettering_pos = {code: i for i, code in enumerate(tables.letterings)}
+        anomaly_pos = {anomaly_type: i for i, anomaly_type in enumerate(ANOMALY_TYPES)}
+        day_cache = {"": -1}
+
+        def day(value):
+            offset = day_cache.get(value)
+            if offset is None:
+                offset = day_cache[value] = (datetime.strptime(value, "%Y%m%d") - base_date).days
+            return offset
+
+        def piece_ref(ref):
+            return (tables.journal_pos[ref[:-6]] * 100 + int(ref[-6:-4])) * 10000 + int(ref[-4:])
+
+        return cls(
+            base_date,
+            period,
+            journal=[tables.journal_pos[r['journal_code']] for r in records],
+            ecr_id=[r['ecr_id'] for r in records],
+            date=[day(r['ecr_date']) for r in records],
+            hour=[r['transaction_date'].hour for r in records],
+            piece_ref=[piece_ref(r['piece_ref']) for r in records],
+            piece_date=[day(r['piece_date']) for r in records],
+            account=[tables.account_pos[r['account']] for r in records],
+            aux=[tables.aux_pos.get(r['comp_aux'], -1) for r in records],
+            label=[r['label'] for r in records],
+            debit=[r['debit'] if cents else round(r['debit'] * 100) for r in records],
+            credit=[r['credit'] if cents else round(r['credit'] * 100) for r in records],
+            lettering=[lettering_pos.get(r['lettering'], -1) for r in records],
+            date_lettering=[day(r['date_lettering']) for r in records],
+            valid_date=[day(r['valid_date']) for r in records],
+            anomaly=[anomaly_pos.get(r.get('anomaly_type'), -1) for r in records],
+        )
+
+    @classmethod
+    def concat(cls, batches, base_date=None):
+        """
+        Concatène plusieurs lots (ramenés à la même date de référence)
+
+        Args:
+            batches (list): Lots à concaténer
+            base_date (datetime, optional): Date de référence. Par défaut, celle du premier lot.
+
+        Returns:
+            TransactionBatch: Lot unique
+        """
+        if base_date is None:
+            base_date = batches[0].base_date if batches else datetime(1970, 1, 1)
+        batches = [batch.rebase(base_date) for batch in batches]
+        if not batches:
+            return cls.empty(base_date)
+        periods = {batch.period for batch in batches}
+        return cls(base_date, periods.pop() if len(periods) == 1 else None, **{
+            name: np.concatenate([getattr(batch, name) for batch in batches])
+            for name in cls.COLUMNS
+        })
+
+    def rebase(self, base_date):
+        """Retourne le lot exprimé par rapport à une autre date de référence"""
+        if base_date == self.base_date:
+            return self
+        shift = (self.base_date - base_date).days
+        columns = self.columns()
+        for name in ("date", "piece_date", "valid_date"):
+            columns[name] = columns[name] + shift
+        columns["date_lettering"] = np.where(self.lettering >= 0, self.date_lettering + shift, -1)
+        period = None if self.period is None else (self.period[0] + shift, self.period[1] + shift)
+        return TransactionBatch(base_date, period, **columns)
+
+    def entry_starts(self):
+        """Retourne l'indice de la première ligne de chaque écriture"""
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        changed = (self.journal[1:] != self.journal[:-1]) | (self.ecr_id[1:] != self.ecr_id[:-1])
+        return np.flatnonzero(np.concatenate(([True], changed)))
+
+    def _day_table(self):
+        """Table des dates au format FEC (AAAAMMJJ) couvrant toutes les colonnes de dates"""
+        lettered = self.date_lettering[self.lettering >= 0]
+        offsets = [self.date, self.piece_date, self.valid_date, lettered]
+        lo = min(int(o.min()) for o in offsets if len(o))
+        hi = max(int(o.max()) for o in offsets if len(o))
+        days = [self.base_date + timedelta(days=d) for d in range(lo, hi + 1)]
+        return lo, np.array([d.strftime("%Y%m%d") for d in days], dtype=object)
+
+    def piece_ref_strings(self):
+        """Retourne les références de pièce au format texte (journal + mois + numéro)"""
+        _, numbers, prefixes = _number_tables()
+        return prefixes[self.piece_ref // 10000] + numbers[self.piece_ref % 10000]
+
+    def ecr_num_strings(self):
+        """Retourne les numéros d'écriture au format FEC"""
+        tables = get_tables()
+        padded, _, _ = _number_tables()
+        small = self.ecr_id < ECR_NUM_TABLE_SIZE
+        if small.all():
+            numbers = padded[self.ecr_id]
+        else:
+            numbers = np.array([f"{ecr_id:05d}" for ecr_id in self.ecr_id.tolist()], dtype=object)
+        return tables.journal_codes_text[self.journal] + numbers
+
+    def anomaly_type_strings(self):
+        """Retourne le type d'anomalie de chaque ligne ("" pour une ligne sans anomalie)"""
+        return _anomaly_types_text(len(ANOMALY_TYPES))[self.anomaly]
+
+    def fec_columns(self, numeric_amounts=False):
+        """
+        Retourne les 18 colonnes FEC, dans l'ordre réglementaire
+
+        Args:
+            numeric_amounts (bool, optional): Montants en euros (float) plutôt qu'en texte
+                avec virgule décimale. Par défaut à False.
+
+        Returns:
+            dict: Nom de colonne FEC -> valeurs
+        """
+        tables = get_tables()
+        if len(self):
+            lo, days = self._day_table()
+        else:
+            lo, days = 0, np.empty(0, dtype=object)
+        ecr_dates = days[self.date - lo]
+        empty = np.full(len(self), "", dtype=object)
+        lettered = self.lettering >= 0
+        date_lettering = empty.copy()
+        date_lettering[lettered] = days[self.date_lettering[lettered] - lo]
+        if numeric_amounts:
+            debit = self.debit / 100
+            credit = self.credit / 100
+        else:
+            debit = format_cents(self.debit)
+            credit = format_cents(self.credit)
+        return {
+            "JournalCode": tables.journal_codes_text[self.journal],
+            "JournalLib": tables.journal_libs_text[self.journal],
+            "EcritureNum": self.ecr_num_strings(),
+            "EcritureDate": ecr_dates,
+            "CompteNum": tables.accounts_text[self.account],
+            "CompteLib": tables.account_labels_text[self.account],
+            "CompAuxNum": tables.aux_codes_text[self.aux],
+            "CompAuxLib": tables.aux_libs_text[self.aux],
+            "PieceRef": self.piece_ref_strings(),
+            "PieceDate": days[self.piece_date - lo],
+            "EcritureLib": self.label,
+            "Debit": debit,
+            "Credit": credit,
+            "EcritureLet": tables.letterings_text[self.lettering],
+            "DateLet": date_lettering,
+            "ValidDate": days[self.valid_date - lo],
+            "Montantdevise": empty,
+            "Idevise": empty,
+        }
+
+    def iter_records(self):
+        """
+        Convertit à la volée les lignes en dictionnaires au format historique du générateur
+
+        Yields:
+            dict: Ligne d'écriture
+        """
+        tables = get_tables()
+        fec = self.fec_columns(numeric_amounts=True)
+        anomaly_types = self.anomaly_type_strings()
+        for i, (journal, ecr_id, day, hour) in enumerate(zip(
+                self.journal.tolist(), self.ecr_id.tolist(), self.date.tolist(), self.hour.tolist())):
+            yield {
+                'journal_code': tables.journal_codes[journal],
+                'journal_lib': tables.journal_libs[journal],
+                'ecr_id': ecr_id,
+                'ecr_date': fec["EcritureDate"][i],
+                'transaction_date': self.base_date + timedelta(days=day, hours=hour),
+                'piece_ref': fec["PieceRef"][i],
+                'piece_date': fec["PieceDate"][i],
+                'account': fec["CompteNum"][i],
+                'account_lib': fec["CompteLib"][i],
+                'comp_aux': fec["CompAuxNum"][i],
+                'comp_aux_lib': fec["CompAuxLib"][i],
+                'label': fec["EcritureLib"][i],
+                'debit': float(fec["Debit"][i]),
+                'credit': float(fec["Credit"][i]),
+                'lettering': fec["EcritureLet"][i],
+                'date_lettering': fec["DateLet"][i],
+                'valid_date': fec["ValidDate"][i],
+                'anomaly_type': anomaly_types[i]
+            }
+
+
+def as_batches(transactions, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Normalise des transactions en flux de TransactionBatch
+
+    Args:
+        transactions: TransactionBatch, itérable de TransactionBatch ou de lignes (dictionnaires)
+        chunk_size (int, optional): Nombre de lignes par lot (un grand lot est découpé en vues)
+
+    Yields:
+        TransactionBatch: Lots dont les écritures ne sont jamais coupées
+    """
+    if isinstance(transactions, TransactionBatch):
+        # Découpage en vues aux bornes d'écritures : la mise en forme d'un lot
+        # reste bornée en mémoire quelle que soit la taille du grand livre
+        starts = transactions.entry_starts()
+        cuts = np.unique(starts[np.searchsorted(starts, np.arange(0, len(transactions), chunk_size))])
+        for start, end in zip(cuts.tolist(), np.append(cuts[1:], len(transactions)).tolist()):
+            yield transactions[start:end]
+        if not len(transactions):
+            yield transactions
+        return
+
+    pending = []
+    base_date = None
+    for item in transactions:
+        if isinstance(item, TransactionBatch):
+            yield item
+            continue
+        if base_date is None:
+            base_date = item['transaction_date'].replace(hour=0, minute=0, second=0, microsecond=0)
+        # Couper uniquement entre deux écritures
+        if len(pending) >= chunk_size and (
+                (item['journal_code'], item['ecr_id']) !=
+                (pending[-1]['journal_code'], pending[-1]['ecr_id'])):
+            yield TransactionBatch.from_records(pending, base_date)
+            pending = []
+        pending.append(item)
+    if pending:
+        yield TransactionBatch.from_records(pending, base_date)
@@ -0,0 +1,420 @@
+"""
+Moteur de génération vectorisé (NumPy) pour le générateur FEC
+
+Reproduit les distributions de Transaction (dates, montants, lettrage,
+libellés) en tirant des tableaux entiers depuis un numpy.random.Generator
+au lieu d'un appel à random par écriture.
+"""
+
+import string
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from .accounting_data import AccountingData
+from .labels import (
+    LABEL_AC, LABEL_VE, LABEL_BQ_CB, LABEL_BQ_VIR, LABEL_BQ_OP, LABEL_OD, LABEL_OTHER,
+    LABEL_NUMBERS, get_label_pool
+)
+from .transaction import Transaction, LETTERING_PREFIXES, LETTERING_RATE
+
+LETTERS = tuple(string.ascii_uppercase)
+
+# Nombre maximal d'écritures par partition (journal, mois) : fixe, pour que
+# le découpage (et donc les tirages) ne dépende pas du nombre de processus
+PARTITION_SIZE = 100000
+
+
+def _flatten(groups):
+    """Aplatit une liste de tableaux d'indices en (valeurs, offsets, tailles)"""
+    sizes = np.array([len(g) for g in groups], dtype=np.int64)
+    offsets = np.zeros(len(groups), dtype=np.int64)
+    np.cumsum(sizes[:-1], out=offsets[1:])
+    values = np.concatenate([np.asarray(g, dtype=np.int32) for g in groups]) if groups else np.empty(0, np.int32)
+    return values, offsets, sizes
+
+
+class VectorTables:
+    """
+    Tables d'indices entiers dérivées de l'AccountIndex, construites une fois par processus
+    """
+
+    def __init__(self, account_index, journals):
+        self.accounts = account_index.all_accounts
+        self.account_labels = tuple(account_index.plan_comptable[acc] for acc in self.accounts)
+        self.account_pos = account_pos = {acc: i for i, acc in enumerate(self.accounts)}
+
+        # Journaux triés : l'ordre final du FEC est (JournalCode, EcritureNum)
+        self.journal_codes = tuple(sorted(journals))
+        self.journal_libs = tuple(journals[code] for code in self.journal_codes)
+        self.journal_pos = {code: i for i, code in enumerate(self.journal_codes)}
+
+        # Journal -> comptes candidats au débit
+        self.debit_values, self.debit_offsets, self.debit_sizes = _flatten([
+            [account_pos[acc] for acc in account_index.relevant_accounts(code)]
+            for code in self.journal_codes
+        ])
+
+        # Compte au débit -> comptes de contrepartie
+        self.credit_values, self.credit_offsets, self.credit_sizes = _flatten([
+            [account_pos[acc] for acc in account_index.related_accounts_for(acc)]
+            for acc in self.accounts
+        ])
+
+        # Bornes de montant par compte
+        bounds = np.array([Transaction.get_amount_bounds(acc) for acc in self.accounts], dtype=np.float64)
+        self.amount_low = bounds[:, 0]
+        self.amount_high = bounds[:, 1]
+
+        # Comptes lettrables
+        self.letterable = np.array([acc.startswith(LETTERING_PREFIXES) for acc in self.accounts])
+
+        # Comptes auxiliaires : compte -> groupe d'auxiliaires (-1 si aucun)
+        prefixes = tuple(account_index.auxiliary_accounts.keys())
+        self.aux_codes = []
+        self.aux_libs = []
+        aux_groups = []
+        for prefix in prefixes:
+            start = len(self.aux_codes)
+            for code, lib in account_index.auxiliary_accounts[prefix]:
+                self.aux_codes.append(code)
+                self.aux_libs.append(lib)
+            aux_groups.append(range(start, len(self.aux_codes)))
+        self.aux_codes = tuple(self.aux_codes)
+        self.aux_libs = tuple(self.aux_libs)
+        self.aux_pos = {code: i for i, code in enumerate(self.aux_codes)}
+        self.aux_values, self.aux_offsets, self.aux_sizes = _flatten(aux_groups)
+        self.account_aux_group = np.array(
+            [prefixes.index(acc[:3]) if acc[:3] in prefixes else -1 for acc in self.accounts],
+            dtype=np.int32
+        )
+
+        # Premier caractère du compte (pour les familles de libellés BQ)
+        self.account_class = np.array([int(acc[0]) for acc in self.accounts], dtype=np.int8)
+
+        # Lettrages possibles : code = lettre * 10 + chiffre
+        self.letterings = tuple(f"{letter}{num}" for letter in LETTERS for num in range(10))
+
+        # Tables texte indexables par tableau ; le "" final sert l'indice -1 (valeur absente)
+        self.journal_codes_text = _text_table(self.journal_codes)
+        self.journal_libs_text = _text_table(self.journal_libs)
+        self.accounts_text = _text_table(self.accounts)
+        self.account_labels_text = _text_table(self.account_labels)
+        self.aux_codes_text = _text_table(self.aux_codes)
+        self.aux_libs_text = _text_table(self.aux_libs)
+        self.letterings_text = _text_table(self.letterings)
+
+
+def _text_table(values):
+    """Construit un tableau objet de chaînes terminé par "" (indice -1 = vide)"""
+    return np.array(list(values) + [""], dtype=object)
+
+
+@lru_cache(maxsize=None)
+def get_tables():
+    """Retourne les tables vectorisées (construites une seule fois par processus)"""
+    return VectorTables(AccountingData.get_index(), AccountingData.get_journals())
+
+
+def _pick(rng, group, values, offsets, sizes):
+    """Tire uniformément un élément dans le groupe de chaque ligne"""
+    return values[offsets[group] + (rng.random(len(group)) * sizes[group]).astype(np.int64)]
+
+
+class VectorizedTransaction:
+    """
+    Équivalents vectorisés des méthodes de Transaction
+    """
+
+    @staticmethod
+    def generate_transaction_dates(rng, start_date, end_date, size, day_range=None):
+        """Génère des décalages en jours depuis start_date (jours ouvrés, bornés à day_range)"""
+        first, last = day_range or (0, (end_date - start_date).days)
+        offsets = rng.integers(first, last + 1, size=size, dtype=np.int32)
+
+        # Si weekend, ajuster au vendredi précédent ; avant le début de la période,
+        # au lundi suivant ; sans jour ouvré dans la période, la date reste inchangée
+        weekday = (offsets + start_date.weekday()) % 7
+        friday = offsets - np.where(weekday >= 5, weekday - 4, 0).astype(np.int32)
+        monday = offsets + np.where(weekday >= 5, 7 - weekday, 0).astype(np.int32)
+        return np.where(friday >= first, friday, np.where(monday <= last, monday, offsets))
+
+    @staticmethod
+    def generate_valid_dates(rng, date_offsets, period_days):
+        """Génère des décalages de validation postérieurs à la date de transaction"""
+        max_days = np.clip(period_days - date_offsets, 0, 7)
+        return date_offsets + rng.integers(0, max_days + 1, dtype=np.int32)
+
+    @staticmethod
+    def generate_realistic_amounts(rng, accounts, tables):
+        """Génère des montants réalistes (en centimes, entiers exacts) basés sur le type de compte"""
+        low = tables.amount_low[accounts].astype(np.int64) * 100
+        high = tables.amount_high[accounts].astype(np.int64) * 100
+        return rng.integers(low, high, endpoint=True, dtype=np.int64)
+
+    @staticmethod
+    def generate_piece_numbers(rng, size):
+        """Génère les numéros de pièce (4 chiffres)"""
+        return rng.integers(1000, 10000, size=size, dtype=np.int16)
+
+    @staticmethod
+    def get_lettering_info(rng, accounts, period_days, tables):
+        """
+        Génère les informations de lettrage
+
+        Returns:
+            tuple: (lettre, chiffre, décalage de la date de lettrage), lettre à -1 si non lettré
+        """
+        size = len(accounts)
+        lettered = tables.letterable[accounts] & (rng.random(size) < LETTERING_RATE)
+        letter = np.where(lettered, rng.integers(0, len(LETTERS), size=size), -1)
+        number = rng.integers(1, 10, size=size)
+        date_let = (period_days - rng.integers(0, 31, size=size)).astype(np.int32)
+        return letter, number, date_let
+
+    @staticmethod
+    def get_auxiliary_accounts(rng, accounts, tables):
+        """Tire un compte auxiliaire pour les comptes qui en ont (-1 sinon)"""
+        group = tables.account_aux_group[accounts]
+        aux = np.full(len(accounts), -1, dtype=np.int32)
+        has_aux = group >= 0
+        if has_aux.any():
+            aux[has_aux] = _pick(rng, group[has_aux], tables.aux_values, tables.aux_offsets, tables.aux_sizes)
+        return aux
+
+    @staticmethod
+    def generate_label_parts(rng, journals, debit_accounts, tables, today=None):
+        """
+        Tire les composantes des libellés (famille, date de l'année, vocabulaire, numéro)
+
+        Returns:
+            dict: Colonnes 'family', 'day', 'word' et 'number'
+        """
+        size = len(journals)
+        pool = get_label_pool(today or date.today())
+
+        codes = np.array(tables.journal_codes)[journals]
+        account_class = tables.account_class[debit_accounts]
+        family = np.full(size, LABEL_OTHER, dtype=np.int8)
+        family[codes == "AC"] = LABEL_AC
+        family[codes == "VE"] = LABEL_VE
+        family[codes == "OD"] = LABEL_OD
+        is_bq = codes == "BQ"
+        family[is_bq] = LABEL_BQ_OP
+        family[is_bq & (account_class == 6)] = LABEL_BQ_CB
+        family[is_bq & (account_class == 5)] = LABEL_BQ_VIR
+
+        number = np.where(
+            family == LABEL_VE,
+            rng.integers(0, LABEL_NUMBERS[LABEL_VE], size=size),
+            rng.integers(0, LABEL_NUMBERS[LABEL_BQ_VIR], size=size)
+        )
+        return {
+            "family": family,
+            "day": rng.integers(0, pool.day_count, size=size),
+            "word": rng.integers(0, pool.word_count, size=size),
+            "number": number,
+        }
+
+    @staticmethod
+    def render_labels(parts, today=None):
+        """Construit les libellés à partir des composantes tirées (pool précalculé)"""
+        pool = get_label_pool(today or date.today())
+        return pool.render(parts["family"], parts["day"], parts["word"], parts["number"])
+
+
+class Partition(namedtuple("Partition", [
+        "journal", "month", "part", "first_day", "last_day",
+        "count", "ecr_start", "anomaly_count"])):
+    """
+    Partition indépendante de la génération : écritures d'un journal sur un mois
+
+    Attributes:
+        journal (int): Indice du journal (ordre de tables.journal_codes)
+        month (int): Rang du mois dans la période (0 = premier mois)
+        part (int): Rang du morceau dans la cellule (journal, mois)
+        first_day (int): Premier jour du mois (décalage depuis start_date)
+        last_day (int): Dernier jour du mois (décalage depuis start_date)
+        count (int): Nombre d'écritures de la partition
+        ecr_start (int): Premier numéro d'écriture de la partition dans son journal
+        anomaly_count (int): Nombre de lignes à altérer dans la partition
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """Clé stable de la partition (dérivation des graines)"""
+        return (self.journal, self.month, self.part)
+
+
+def month_ranges(start_date, end_date):
+    """
+    Découpe la période en mois calendaires
+
+    Returns:
+        list: Couples (premier jour, dernier jour) en décalages depuis start_date
+    """
+    ranges = []
+    period_days = (end_date - start_date).days
+    first = 0
+    while first <= period_days:
+        day = start_date + timedelta(days=first)
+        next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min((next_month - start_date).days - 1, period_days)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def plan_partitions(rng, start_date, end_date, transaction_count, anomaly_rate=0.0,
+                    partition_size=PARTITION_SIZE, ecr_offsets=None):
+    """
+    Planifie la génération par partitions (journal, mois) en deux phases
+
+    1. Comptage : les effectifs de chaque cellule (journal, mois) suivent une loi
+       multinomiale (journal uniforme, date uniforme sur la période).
+    2. Numérotation : chaque cellule reçoit le premier numéro d'écriture de son
+       journal (cumul des cellules précédentes), d'où une numérotation continue
+       quelle que soit la façon dont les partitions sont générées puis fusionnées.
+
+    Les anomalies sont réparties entre partitions par une loi hypergéométrique
+    multivariée : leur nombre total reste exactement int(lignes * taux).
+
+    Args:
+        rng (numpy.random.Generator): Générateur aléatoire du plan
+        start_date (datetime): Date de début de période
+        end_date (datetime): Date de fin de période
+        transaction_count (int): Nombre d'écritures
+        anomaly_rate (float, optional): Taux d'anomalies. Par défaut à 0.
+        partition_size (int, optional): Nombre maximal d'écritures par partition
+        ecr_offsets (array-like, optional): Derniers numéros d'écriture déjà utilisés par journal
+            (prolongement d'un FEC existant). Par défaut, numérotation à partir de 1.
+
+    Returns:
+        list: Partitions, dans l'ordre final (journal, numéro d'écriture)
+    """
+    journal_count = len(get_tables().journal_codes)
+    months = month_ranges(start_date, end_date)
+    days = np.array([last - first + 1 for first, last in months], dtype=np.float64)
+    probabilities = np.tile(days / days.sum() / journal_count, journal_count)
+    counts = rng.multinomial(transaction_count, probabilities).reshape(journal_count, len(months))
+    ecr_starts = np.cumsum(counts, axis=1) - counts + 1
+    if ecr_offsets is not None:
+        ecr_starts += np.asarray(ecr_offsets, dtype=np.int64)[:, None]
+
+    partitions = []
+    for journal in range(journal_count):
+        for month, (first, last) in enumerate(months):
+            count = int(counts[journal, month])
+            for part, offset in enumerate(range(0, count, partition_size)):
+                partitions.append(Partition(
+                    journal, month, part, first, last, min(partition_size, count - offset),
+                    int(ecr_starts[journal, month]) + offset, 0))
+
+    anomaly_total = int(2 * transaction_count * anomaly_rate)
+    if anomaly_total and partitions:
+        lines = np.array([2 * p.count for p in partitions], dtype=np.int64)
+        anomalies = rng.multivariate_hypergeometric(lines, anomaly_total)
+        partitions = [p._replace(anomaly_count=int(a)) for p, a in zip(partitions, anomalies)]
+    return partitions
+
+
+def generate_partition_columns(rng, partition, start_date, end_date):
+    """
+    Génère les colonnes d'une partition (journal, mois)
+
+    Args:
+        rng (numpy.random.Generator): Générateur propre à la partition
+        partition (Partition): Partition à générer
+        start_date (datetime): Date de début de période
+        end_date (datetime): Date de fin de période
+
+    Returns:
+        dict: Colonnes par écriture
+    """
+    journals = np.full(partition.count, partition.journal, dtype=np.int8)
+    ecr_ids = np.arange(partition.ecr_start, partition.ecr_start + partition.count, dtype=np.int32)
+    return build_columns(rng, journals, ecr_ids, start_date, end_date,
+                         day_range=(partition.first_day, partition.last_day))
+
+
+def build_columns(rng, journals, ecr_ids, start_date, end_date, day_range=None):
+    """
+    Tire toutes les colonnes des écritures dont le journal et le numéro sont fixés
+
+    Args:
+        rng (numpy.random.Generator): Générateur aléatoire
+        journals (numpy.ndarray): Indice du journal de chaque écriture
+        ecr_ids (numpy.ndarray): Numéro d'écriture dans son journal
+        start_date (datetime): Date de début de période
+        end_date (datetime): Date de fin de période
+        day_range (tuple, optional): Jours (premier, dernier) où tirer les dates. Par défaut, toute la période.
+
+    Returns:
+        dict: Colonnes par écriture (indices entiers dans les tables vectorisées,
+            montants en centimes, dates en jours depuis start_date)
+    """
+    tables = get_tables()
+    n = len(journals)
+    period_days = (end_date - start_date).days
+    # Dates des libellés tirées dans l'année de fin de période (reproductible)
+    today = date(end_date.year, end_date.month, end_date.day)
+
+    dates = VectorizedTransaction.generate_transaction_dates(rng, start_date, end_date, n, day_range)
+    valid_dates = VectorizedTransaction.generate_valid_dates(rng, dates, period_days)
+
+    debit_accounts = _pick(rng, journals, tables.debit_values, tables.debit_offsets, tables.debit_sizes)
+    credit_accounts = _pick(rng, debit_accounts, tables.credit_values, tables.credit_offsets, tables.credit_sizes)
+
+    # Aucune contrepartie définie : repli sur les comptes du journal hors compte au débit
+    for i in np.flatnonzero(tables.credit_sizes[debit_accounts] == 0):
+        j = journals[i]
+        start = tables.debit_offsets[j]
+        candidates = tables.debit_values[start:start + tables.debit_sizes[j]]
+        credit_accounts[i] = rng.choice(candidates[candidates != debit_accounts[i]])
+
+    amounts = VectorizedTransaction.generate_realistic_amounts(rng, debit_accounts, tables)
+    piece_refs = encode_piece_refs(
+        journals, month_of(start_date, dates), VectorizedTransaction.generate_piece_numbers(rng, n))
+
+    debit_let, debit_let_num, debit_let_date = VectorizedTransaction.get_lettering_info(
+        rng, debit_accounts, period_days, tables)
+    credit_let, credit_let_num, credit_let_date = VectorizedTransaction.get_lettering_info(
+        rng, credit_accounts, period_days, tables)
+
+    return {
+        "journal": journals,
+        "ecr_id": ecr_ids,
+        "date": dates,
+        "valid_date": valid_dates,
+        "piece_ref": piece_refs,
+        "debit_account": debit_accounts,
+        "credit_account": credit_accounts,
+        "debit_aux": VectorizedTransaction.get_auxiliary_accounts(rng, debit_accounts, tables),
+        "credit_aux": VectorizedTransaction.get_auxiliary_accounts(rng, credit_accounts, tables),
+        "amount": amounts,
+        "debit_lettering": encode_lettering(debit_let, debit_let_num),
+        "debit_date_lettering": debit_let_date,
+        "credit_lettering": encode_lettering(credit_let, credit_let_num),
+        "credit_date_lettering": credit_let_date,
+        "label": VectorizedTransaction.render_labels(
+            VectorizedTransaction.generate_label_parts(rng, journals, debit_accounts, tables, today), today),
+    }
+
+
+def month_of(base_date, day_offsets):
+    """Retourne le mois (1-12) de chaque décalage en jours depuis base_date"""
+    days = np.datetime64(base_date.date(), "D") + day_offsets.astype("timedelta64[D]")
+    return (days.astype("datetime64[M]").astype(np.int64) % 12 + 1).astype(np.int32)
+
+
+def encode_piece_refs(journals, months, numbers):
+    """Encode les références de pièce (journal, mois, numéro) en entiers"""
+    return (journals.astype(np.int32) * 100 + months) * 10000 + numbers
+
+
+def encode_lettering(letters, numbers):
+    """Encode le lettrage (lettre, chiffre) en entiers, -1 si non lettré"""
+    return np.where(letters < 0, -1, letters * 10 + numbers).astype(np.int16)
@@ -15,11 +15,13 @@ setup(
     url="https://github.com/votre-compte/fec-generator",
     packages=find_packages(),
     install_requires=[
-        "pandas>=1.0.0",
         "numpy>=1.18.0",
-        "faker>=8.0.0",
-        "openpyxl>=3.0.0",
     ],
+    extras_require={
+        "parquet": ["pyarrow>=10.0.0"],
+        "zstd": ["zstandard>=0.15.0"],
+        "test": ["pytest>=7.0"],
+    },
     entry_points={
         "console_scripts": [
             "fec-generator=fec_generator.main:main",
@@ -30,12 +32,11 @@ setup(
         "Intended Audience :: Financial and Insurance Industry",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
         "Topic :: Office/Business :: Financial :: Accounting",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 )
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+Données partagées des tests : écritures générées sans anomalie, FEC exporté
+"""
+
+import pytest
+
+from generator import FECGenerator
+from models.transaction_batch import TransactionBatch
+
+
+def clean_batch(transaction_count=2000, seed=11, engine="numpy"):
+    """Écritures générées sans anomalie, en un seul lot"""
+    generator = FECGenerator(transaction_count=transaction_count, anomaly_rate=0, engine=engine, seed=seed)
+    return TransactionBatch.concat(list(generator.iter_batches()), generator.start_date)
+
+
+def copy_batch(batch):
+    """Copie indépendante d'un lot"""
+    return TransactionBatch(batch.base_date, batch.period,
+                            **{name: column.copy() for name, column in batch.columns().items()})
+
+
+@pytest.fixture
+def fec_csv(tmp_path):
+    """FEC CSV généré (période par défaut) et son générateur"""
+    generator = FECGenerator(transaction_count=500, engine="numpy", seed=5)
+    filename = generator.export_to_csv(str(tmp_path / "123456789FEC20241231.csv"))
+    return generator, filename
@@ -0,0 +1,114 @@
+"""
+Noyaux d'anomalies : invariants par écriture et cohérence label / modification
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from conftest import clean_batch, copy_batch
+from utils.anomalies import (ANOMALY_TYPES, FIXED_HOLIDAYS, anomaly_mix, apply_batch_anomalies,
+                             draw_eligible_rows, inject_batch_anomalies)
+from utils.instrumentation import ANOMALIES_SKIPPED, Metrics
+from utils.validators import entry_balances
+
+# Colonnes exportées qu'une anomalie peut modifier
+EXPORTED = ("date", "piece_ref", "account", "debit", "credit")
+
+
+@pytest.fixture(scope="module")
+def batch():
+    return clean_batch()
+
+
+def changed_rows(before, after):
+    changed = np.zeros(len(after), dtype=bool)
+    for name in EXPORTED:
+        changed |= getattr(before, name) != getattr(after, name)
+    return changed
+
+
+def apply_type(batch, anomaly_type, count=300, balanced=False, seed=0):
+    """Applique un type d'anomalie à count lignes d'une copie du lot"""
+    rng = np.random.default_rng(seed)
+    altered = copy_batch(batch)
+    type_idx = ANOMALY_TYPES.index(anomaly_type)
+    indices = rng.choice(len(altered), count, replace=False)
+    types = np.full(count, type_idx)
+    indices = draw_eligible_rows(altered, indices, types, rng)
+    apply_batch_anomalies(altered, indices, types, rng, balanced=balanced)
+    return altered
+
+
+def entry_of_line(batch):
+    starts = batch.entry_starts()
+    return starts, np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(batch))))
+
+
+@pytest.mark.parametrize("balanced", [False, True])
+@pytest.mark.parametrize("anomaly_type", ANOMALY_TYPES)
+def test_labelled_lines_are_changed(batch, anomaly_type, balanced):
+    altered = apply_type(batch, anomaly_type, balanced=balanced)
+    labelled = altered.anomaly == ANOMALY_TYPES.index(anomaly_type)
+    changed = changed_rows(batch, altered)
+
+    assert labelled.any()
+    assert not (labelled & ~changed).any()
+    # Lignes modifiées sans label : seulement dans une écriture portant l'anomalie
+    starts, owners = entry_of_line(altered)
+    entries = np.unique(owners[labelled])
+    assert np.isin(owners[changed & ~labelled], entries).all()
+
+
+@pytest.mark.parametrize("balanced", [False, True])
+@pytest.mark.parametrize("anomaly_type", ANOMALY_TYPES)
+def test_entries_keep_a_single_date_in_period(batch, anomaly_type, balanced):
+    altered = apply_type(batch, anomaly_type, balanced=balanced)
+    starts = altered.entry_starts()
+
+    assert (np.minimum.reduceat(altered.date, starts) == np.maximum.reduceat(altered.date, starts)).all()
+    first, last = altered.period
+    assert first <= altered.date.min() and altered.date.max() <= last
+
+
+@pytest.mark.parametrize("anomaly_type", ANOMALY_TYPES)
+def test_balanced_mode_keeps_entries_balanced(batch, anomaly_type):
+    altered = apply_type(batch, anomaly_type, balanced=True)
+    _, balances = entry_balances(altered)
+
+    assert not balances.any()
+
+
+def labelled_days(altered, anomaly_type):
+    rows = np.flatnonzero(altered.anomaly == ANOMALY_TYPES.index(anomaly_type))
+    return [altered.base_date + timedelta(days=int(day)) for day in altered.date[rows]]
+
+
+def test_unusual_date_moves_entries_to_holidays(batch):
+    days = labelled_days(apply_type(batch, "unusual_date"), "unusual_date")
+
+    assert days
+    assert all((day.month, day.day) in FIXED_HOLIDAYS for day in days)
+    # Les dates ne sont pas regroupées sur un seul jour férié
+    assert len({(day.month, day.day) for day in days}) > 2
+
+
+def test_weekend_transaction_moves_entries_to_weekends(batch):
+    days = labelled_days(apply_type(batch, "weekend_transaction"), "weekend_transaction")
+
+    assert days
+    assert all(day.weekday() >= 5 for day in days)
+
+
+def test_injected_count_is_labelled_or_skipped(batch):
+    altered = copy_batch(batch)
+    metrics = Metrics()
+    count = 200
+    _, mix = anomaly_mix({"unusual_account_usage": 0.05})
+    with metrics.activate():
+        inject_batch_anomalies(altered, count, np.random.default_rng(3), mix=mix)
+
+    labelled = int(np.count_nonzero(altered.anomaly >= 0))
+    assert labelled + metrics.counters[ANOMALIES_SKIPPED] == count
+    assert labelled > 0
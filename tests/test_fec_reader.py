@@ -0,0 +1,85 @@
+"""
+Lecture et validation d'un FEC existant : cas acceptés et rejetés
+"""
+
+import numpy as np
+import pytest
+
+from utils.fec_reader import FECReader, validate_fec_file
+
+_DEBIT, _DATE = 11, 3
+
+
+def rewrite(filename, target, line, field, value):
+    """Copie un FEC en remplaçant un champ d'une ligne (numérotée comme les erreurs, en-tête = 1)"""
+    with open(filename, newline="", encoding="ascii") as f:
+        lines = f.read().split("\r\n")
+    fields = lines[line - 1].split("|")
+    if value is None:
+        del fields[field]
+    else:
+        fields[field] = value
+    lines[line - 1] = "|".join(fields)
+    with open(target, "w", newline="", encoding="ascii") as f:
+        f.write("\r\n".join(lines))
+    return target
+
+
+def test_generated_fec_is_valid(fec_csv):
+    generator, filename = fec_csv
+    report = validate_fec_file(filename)
+
+    assert report.valid, report.errors
+    assert report.lines == 2 * generator.transaction_count
+    assert report.debit_cents == report.credit_cents > 0
+
+
+def test_reader_columns(fec_csv):
+    _, filename = fec_csv
+    reader = FECReader(filename, ("EcritureDate", "Debit", "Credit"))
+    chunks = list(reader)
+    dates = np.concatenate([chunk.columns["EcritureDate"] for chunk in chunks])
+
+    assert reader.lines == len(dates)
+    assert dates.min() >= np.datetime64("2024-01-01") and dates.max() <= np.datetime64("2024-12-31")
+    assert sum(int(chunk.columns["Debit"].sum()) for chunk in chunks) > 0
+
+
+@pytest.mark.parametrize("amount", ["1234", "1234,5", "1234,50", "-12,00", "+3,10", "0,00", "12,"])
+def test_accepted_amounts(fec_csv, tmp_path, amount):
+    _, filename = fec_csv
+    report = validate_fec_file(rewrite(filename, str(tmp_path / "fec.csv"), 4, _DEBIT, amount))
+
+    assert "montant" not in report.error_counts
+
+
+@pytest.mark.parametrize("amount", ["12.50", "1 234,00", "12,345", "1.234,00", "abc", ""])
+def test_rejected_amounts(fec_csv, tmp_path, amount):
+    _, filename = fec_csv
+    report = validate_fec_file(rewrite(filename, str(tmp_path / "fec.csv"), 4, _DEBIT, amount))
+
+    assert report.error_counts["montant"] == 1
+    error = next(error for error in report.errors if error.kind == "montant")
+    assert error.line == 4
+
+
+@pytest.mark.parametrize("value", ["20240231", "2024-03-01", "2024031", ""])
+def test_rejected_dates(fec_csv, tmp_path, value):
+    _, filename = fec_csv
+    report = validate_fec_file(rewrite(filename, str(tmp_path / "fec.csv"), 6, _DATE, value))
+
+    assert report.error_counts["date"] == 1
+    assert [error.line for error in report.errors if error.kind == "date"] == [6]
+
+
+def test_rejected_column_count(fec_csv, tmp_path):
+    _, filename = fec_csv
+    target = rewrite(filename, str(tmp_path / "fec.csv"), 8, _DEBIT, None)
+    report = validate_fec_file(target)
+
+    error = next(error for error in report.errors if error.kind == "colonnes")
+    assert report.error_counts["colonnes"] == 1
+    assert error.line == 8
+    with open(target, "rb") as f:
+        content = f.read()
+    assert error.offset == len(b"".join(content.split(b"\r\n")[:7])) + 7 * len(b"\r\n")
@@ -0,0 +1,117 @@
+"""
+État d'un FEC (models.ledger_state) et prolongement (FECGenerator.extend)
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from generator import FECGenerator
+from models.ledger_state import LedgerState, ledger_files, read_state, state_filename
+from utils.fec_reader import validate_fec_file
+
+
+def read_rows(filename):
+    with open(filename, newline="", encoding="ascii") as f:
+        return [line.split("|") for line in f.read().split("\r\n")[1:] if line]
+
+
+def assert_contiguous_numbering(rows):
+    numbers = defaultdict(list)
+    for row in rows:
+        numbers[row[0]].append(int(row[2][len(row[0]):]))
+    for code, values in numbers.items():
+        assert sorted(set(values)) == list(range(1, max(values) + 1)), code
+
+
+def test_dict_round_trip():
+    state = LedgerState(datetime(2024, 6, 30), {"AC": 12, "VE": 40}, 104, datetime(2024, 12, 31))
+    loaded = LedgerState.from_dict(state.to_dict())
+
+    assert loaded.to_dict() == state.to_dict()
+    assert loaded.next_date == datetime(2025, 1, 1)
+
+
+def test_export_records_period_end(fec_csv):
+    generator, filename = fec_csv
+    state = read_state(filename)
+    rows = read_rows(filename)
+
+    assert os.path.exists(state_filename(filename))
+    assert state.end_date == generator.end_date
+    assert state.lines == len(rows)
+    assert state.to_dict() == dict(LedgerState.from_csv(filename).to_dict(), end_date=f"{generator.end_date:%Y-%m-%d}")
+
+
+def test_save_and_read_state(fec_csv):
+    _, filename = fec_csv
+    state = LedgerState.from_csv(filename)
+    state.end_date = datetime(2025, 1, 31)
+    state.save(filename)
+
+    assert read_state(filename).to_dict() == state.to_dict()
+    # FEC modifié depuis : l'état est relu du fichier
+    os.utime(filename, ns=(0, 0))
+    assert read_state(filename).end_date is None
+
+
+def test_extend_continues_after_period(fec_csv):
+    generator, filename = fec_csv
+    before = read_rows(filename)
+    state = generator.extend(filename, "2025-03-31", transaction_count=100)
+    rows = read_rows(filename)
+    added = rows[len(before):]
+
+    assert len(added) == 200
+    assert min(row[3] for row in added) >= "20250101"
+    assert max(row[3] for row in added) <= "20250331"
+    assert_contiguous_numbering(rows)
+    assert validate_fec_file(filename).valid
+    assert state.lines == len(rows)
+    assert read_state(filename).to_dict() == state.to_dict()
+
+
+def test_extend_keeps_rate(fec_csv):
+    generator, filename = fec_csv
+    generator.extend(filename, "2025-12-31")
+    generator.extend(filename, "2026-12-31")
+
+    # Années de 366, 365 puis 365 jours : même densité d'écritures
+    counts = defaultdict(int)
+    for row in read_rows(filename):
+        counts[row[3][:4]] += 1
+    assert counts["2025"] == counts["2026"] == pytest.approx(counts["2024"] * 365 / 366, abs=2)
+
+
+def test_extend_rejects_covered_period(fec_csv):
+    generator, filename = fec_csv
+
+    with pytest.raises(ValueError):
+        generator.extend(filename, "2024-12-31")
+
+
+def test_extend_parquet_by_parts(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    filename = str(tmp_path / "fec.parquet")
+    generator = FECGenerator(transaction_count=500, engine="numpy", seed=5)
+    generator.export_to_parquet(filename)
+    generator.extend(filename, "2025-06-30")
+    state = generator.extend(filename, "2025-12-31")
+
+    parts = ledger_files(filename)
+    assert [os.path.basename(part) for part in parts] == ["fec.parquet", "fec.part0002.parquet",
+                                                          "fec.part0003.parquet"]
+    table = ds.dataset(parts).to_table()
+    dates = table.column("EcritureDate").to_pylist()
+    assert table.num_rows == state.lines
+    assert max(dates) <= datetime(2025, 12, 31).date()
+    os.remove(state_filename(filename))
+    assert read_state(filename).ecr_counters == state.ecr_counters
+
+    # Un nouvel export sous le même nom remplace le FEC et ses parties
+    generator.export_to_parquet(filename)
+    assert ledger_files(filename) == [filename]
@@ -2,13 +2,19 @@
 Utilitaires pour le générateur FEC
 """
 
-from .formatters import format_decimal, format_fec_ecr_num
+from .formatters import format_cents, format_decimal, format_fec_ecr_num
 from .validators import validate_fec
+from .fec_reader import FECReader, validate_fec_file
 from .anomalies import inject_anomalies
+from .instrumentation import Metrics
 
 __all__ = [
+    "format_cents",
     "format_decimal", 
     "format_fec_ecr_num", 
     "validate_fec", 
-    "inject_anomalies"
+    "FECReader",
+    "validate_fec_file",
+    "inject_anomalies",
+    "Metrics"
 ]
\ No newline at end of file
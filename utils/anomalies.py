@@ -1,78 +1,643 @@
 """
 Fonctions de génération d'anomalies pour le FEC
+
+Chaque type d'anomalie est un noyau vectorisé enregistré dans ANOMALY_KERNELS
+(voir register_anomaly) : de nouveaux types s'ajoutent sans toucher au moteur,
+et la proportion de chaque type est réglable (voir anomaly_mix).
 """
 
-import random
-from datetime import timedelta
+from datetime import date, timedelta
+
+import numpy as np
+
+from .instrumentation import ANOMALIES_SKIPPED, as_metrics, current_metrics
+
+# Registre des anomalies : nom -> noyau vectorisé (voir register_anomaly)
+ANOMALY_KERNELS = {}
+
+# Lignes éligibles par type (types ne s'appliquant qu'à certaines lignes) : nom -> fonction
+# (batch -> masque booléen), voir register_anomaly
+ANOMALY_ELIGIBILITY = {}
+
+# Types d'anomalies, dans l'ordre d'enregistrement : l'indice d'un type est
+# son code dans la colonne anomaly des TransactionBatch
+ANOMALY_TYPES = []
+
+# Nombre maximal de types (codes stockés sur un int8)
+MAX_ANOMALY_TYPES = 127
+
+# Comptes utilisés pour les usages inhabituels, et leurs libellés
+UNUSUAL_ACCOUNTS = ["471000", "486000"]
+UNUSUAL_ACCOUNT_LABELS = {
+    "471000": "Compte d'attente",
+    "486000": "Charges constatees d'avance"
+}
+THRESHOLDS = [1000, 5000, 10000]
+
+# Jours fériés à date fixe (mois, jour), dates inhabituelles des écritures
+FIXED_HOLIDAYS = [(1, 1), (5, 1), (5, 8), (7, 14), (8, 15), (11, 1), (11, 11), (12, 25)]
+
+
+def register_anomaly(name, eligible=None):
+    """
+    Enregistre un noyau d'anomalie (décorateur)
+
+    Un noyau reçoit (batch, rows, rng, previous_ref) : le lot, les indices
+    distincts des lignes à altérer, un numpy.random.Generator et la référence
+    de pièce (encodée) de la ligne précédant le lot. Il modifie les colonnes de
+    ces seules lignes, en une opération sur toutes les lignes, et retourne les
+    indices des lignes effectivement altérées (celles qui reçoivent le label
+    du type) : une ligne n'est retournée que si une colonne exportée a changé.
+    Les dates modifiées restent dans batch.period lorsqu'elle est connue, et
+    une date est toujours modifiée pour toutes les lignes d'une écriture (voir
+    _drawn_entries). En mode équilibré, le moteur reporte ensuite les
+    variations de montant sur l'autre jambe de chaque écriture (voir
+    mirror_amounts).
+
+    Example:
+        @register_anomaly("zero_amount")
+        def _zero_amount(batch, rows, rng, previous_ref=None):
+            batch.debit[rows] = 0
+            return rows
+
+    Args:
+        name (str): Nom du type (valeur de la colonne anomaly_type)
+        eligible (callable, optional): Masque des lignes auxquelles le type s'applique
+            (batch -> numpy.ndarray de booléens) : les lignes de ce type sont tirées parmi
+            elles. Par défaut, toutes les lignes.
+
+    Returns:
+        callable: Décorateur enregistrant le noyau
+    """
+    def decorator(kernel):
+        if name not in ANOMALY_KERNELS:
+            if len(ANOMALY_TYPES) >= MAX_ANOMALY_TYPES:
+                raise ValueError(f"Trop de types d'anomalies (maximum {MAX_ANOMALY_TYPES})")
+            ANOMALY_TYPES.append(name)
+        ANOMALY_KERNELS[name] = kernel
+        if eligible is None:
+            ANOMALY_ELIGIBILITY.pop(name, None)
+        else:
+            ANOMALY_ELIGIBILITY[name] = eligible
+        return kernel
+    return decorator
+
+
+def anomaly_mix(anomaly_rates):
+    """
+    Convertit des taux par type d'anomalie en taux global et proportions
+
+    Les lignes d'un type réservé à certaines lignes (voir register_anomaly)
+    sont tirées parmi les lignes éligibles : le taux est atteint tant qu'elles
+    sont assez nombreuses (dans chaque lot ou partition), et plafonné à leur
+    nombre sinon. Les lignes étiquetées en moins sont comptées dans le
+    compteur anomalies_skipped des mesures (voir utils.instrumentation).
+
+    Args:
+        anomaly_rates (dict): Type d'anomalie -> taux (part des lignes altérées par ce type)
+
+    Returns:
+        tuple: (taux global, proportions par type dans l'ordre d'ANOMALY_TYPES)
+    """
+    unknown = sorted(set(anomaly_rates) - set(ANOMALY_KERNELS))
+    if unknown:
+        raise ValueError(f"Types d'anomalies inconnus: {', '.join(unknown)} "
+                         f"(attendu: {', '.join(ANOMALY_TYPES)})")
+    rates = np.array([anomaly_rates.get(name, 0.0) for name in ANOMALY_TYPES], dtype=np.float64)
+    if (rates < 0).any():
+        raise ValueError("Les taux d'anomalies doivent être positifs")
+    total = float(rates.sum())
+    if not total:
+        return 0.0, None
+    return total, rates / total
+
+
+def _is_batch(transactions):
+    """Indique si les transactions sont un TransactionBatch (import local : évite un import circulaire)"""
+    from models.transaction_batch import TransactionBatch
+    return isinstance(transactions, TransactionBatch)
+
+
+def _day_bounds(batch, rows):
+    """Premier et dernier jour autorisés pour les dates modifiées (période du lot, sinon un an autour)"""
+    if batch.period is not None:
+        return batch.period
+    dates = batch.date[rows]
+    return int(dates.min()) - 366, int(dates.max()) + 366
+
+
+def _holiday_offsets(base_date, first, last):
+    """Jours fériés à date fixe entre deux décalages depuis base_date (triés)"""
+    origin = base_date.toordinal()
+    first_year = date.fromordinal(origin + first).year
+    last_year = date.fromordinal(origin + last).year
+    offsets = [date(year, month, day).toordinal() - origin
+               for year in range(first_year, last_year + 1) for month, day in FIXED_HOLIDAYS]
+    return np.array(sorted(offset for offset in offsets if first <= offset <= last), dtype=np.int64)
+
+
+def _drawn_entries(batch, rows):
+    """
+    Écritures des lignes tirées, pour les anomalies portant sur toute l'écriture (dates)
+
+    Les écritures sont retenues dans l'ordre du tirage, jusqu'à couvrir au
+    moins autant de lignes que de lignes tirées : le nombre de lignes altérées
+    suit le taux demandé.
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures complètes
+        rows (numpy.ndarray): Indices des lignes tirées
+
+    Returns:
+        tuple: (première ligne de chaque écriture retenue, indices de leurs lignes,
+            rang de l'écriture de chaque ligne)
+    """
+    starts = batch.entry_starts()
+    ends = np.append(starts[1:], len(batch))
+    entries = np.searchsorted(starts, rows, side="right") - 1
+    _, first = np.unique(entries, return_index=True)
+    entries = entries[np.sort(first)]
+    sizes = ends[entries] - starts[entries]
+    keep = np.cumsum(sizes) - sizes < len(rows)
+    entries, sizes = entries[keep], sizes[keep]
+    owners = np.repeat(np.arange(len(entries)), sizes)
+    lines = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts[entries], sizes)
+    return starts[entries], lines, owners
+
+
+def _move_entries(batch, heads, lines, owners, targets):
+    """Date les écritures retenues (voir _drawn_entries) ; retourne les lignes redatées et leur écriture"""
+    changed = (targets != batch.date[heads])[owners]
+    lines, owners = lines[changed], owners[changed]
+    batch.date[lines] = targets[owners]
+    return lines, owners
+
+
+@register_anomaly("round_amount")
+def _round_amount(batch, rows, rng, previous_ref=None):
+    """Montants ronds suspects (les lignes déjà rondes ne sont pas altérées)"""
+    debit = np.round(batch.debit[rows] / 100).astype(np.int64) * 100
+    credit = np.round(batch.credit[rows] / 100).astype(np.int64) * 100
+    changed = (debit != batch.debit[rows]) | (credit != batch.credit[rows])
+    rows = rows[changed]
+    batch.debit[rows] = debit[changed]
+    batch.credit[rows] = credit[changed]
+    return rows
+
+
+@register_anomaly("unusual_date")
+def _unusual_date(batch, rows, rng, previous_ref=None):
+    """Écriture datée d'un jour férié de la période (tiré au hasard), saisie en dehors des heures de bureau"""
+    first, last = _day_bounds(batch, rows)
+    holidays = _holiday_offsets(batch.base_date, first, last)
+    if not len(holidays):
+        return rows[:0]
+    heads, lines, owners = _drawn_entries(batch, rows)
+    targets = holidays[rng.integers(len(holidays), size=len(heads))]
+    hours = rng.integers(20, 24, size=len(heads))
+    lines, owners = _move_entries(batch, heads, lines, owners, targets)
+    batch.hour[lines] = hours[owners]
+    # Les lignes déjà étiquetées par un autre type gardent leur étiquette
+    return lines[batch.anomaly[lines] < 0]
+
+
+@register_anomaly("duplicate_ref")
+def _duplicate_ref(batch, rows, rng, previous_ref=None):
+    """Référence de pièce de l'écriture précédente (la première écriture du lot reprend previous_ref)"""
+    # Dernière ligne de l'écriture précédente, lue avant toute duplication
+    starts = batch.entry_starts()
+    sources = starts[np.searchsorted(starts, rows, side="right") - 1] - 1
+    refs = batch.piece_ref[np.maximum(sources, 0)]
+    first = sources < 0
+    if first.any():
+        if previous_ref is None:
+            rows, refs = rows[~first], refs[~first]
+        else:
+            refs[first] = previous_ref
+    changed = refs != batch.piece_ref[rows]
+    rows = rows[changed]
+    batch.piece_ref[rows] = refs[changed]
+    return rows
+
+
+def _is_class_5(batch):
+    """Lignes sur un compte de classe 5 (comptes financiers)"""
+    from models.vectorized import get_tables
+    return get_tables().account_class[batch.account] == 5
+
+
+@register_anomaly("unusual_account_usage", eligible=_is_class_5)
+def _unusual_account_usage(batch, rows, rng, previous_ref=None):
+    """Utilisation inhabituelle d'un compte de classe 5 (le libellé suit le compte)"""
+    from models.vectorized import get_tables
+
+    tables = get_tables()
+    rows = rows[tables.account_class[batch.account[rows]] == 5]
+    unusual = np.array([tables.account_pos[account] for account in UNUSUAL_ACCOUNTS])
+    batch.account[rows] = unusual[rng.integers(len(unusual), size=len(rows))]
+    return rows
+
+
+@register_anomaly("threshold_amount")
+def _threshold_amount(batch, rows, rng, previous_ref=None):
+    """Montant juste sous un seuil d'autorisation (en centimes : 1 à 100 sous le seuil)"""
+    amounts = (np.array(THRESHOLDS, dtype=np.int64)[rng.integers(len(THRESHOLDS), size=len(rows))] * 100
+               - rng.integers(1, 101, size=len(rows)))
+    on_debit = batch.debit[rows] > 0
+    changed = amounts != np.where(on_debit, batch.debit[rows], batch.credit[rows])
+    rows, amounts, on_debit = rows[changed], amounts[changed], on_debit[changed]
+    batch.debit[rows[on_debit]] = amounts[on_debit]
+    batch.credit[rows[~on_debit]] = amounts[~on_debit]
+    return rows
+
+
+@register_anomaly("weekend_transaction")
+def _weekend_transaction(batch, rows, rng, previous_ref=None):
+    """
+    Transaction un weekend : décaler l'écriture au samedi suivant (dimanche si déjà samedi)
+
+    Après la fin de la période, la date recule au jour de weekend précédent
+    (dimanche, samedi si déjà dimanche) ; une écriture sans weekend dans la
+    période n'est pas altérée.
+    """
+    first, last = _day_bounds(batch, rows)
+    heads, lines, owners = _drawn_entries(batch, rows)
+    dates = batch.date[heads].astype(np.int64)
+    weekdays = (batch.base_date.weekday() + dates) % 7
+    days_to_add = (5 - weekdays) % 7
+    days_to_add[days_to_add == 0] = 1
+    targets = dates + days_to_add
+    late = targets > last
+    targets[late] = dates[late] - np.where(weekdays[late] == 6, 1, weekdays[late] + 1)
+    targets[targets < first] = dates[targets < first]
+    lines, _ = _move_entries(batch, heads, lines, owners, targets)
+    # Les lignes déjà étiquetées par un autre type gardent leur étiquette
+    return lines[batch.anomaly[lines] < 0]
+
+
+def mirror_amounts(batch, rows, debit_before, credit_before):
+    """
+    Reporte les variations de montant de lignes altérées sur l'autre jambe de leur écriture
+
+    Pour chaque écriture touchée, la variation nette (débit - crédit) des lignes
+    altérées est reportée sur la ligne de montant maximal du côté opposé à la
+    première ligne altérée, de préférence une ligne sans anomalie : pour une
+    écriture à deux lignes, les deux jambes portent la même anomalie de montant
+    et l'écriture reste équilibrée, sans passe de correction. La ligne reportée
+    reçoit le type de la première ligne altérée, qui remplace son éventuel
+    type précédent (son montant a été réécrit).
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures complètes (modifiées en place)
+        rows (numpy.ndarray): Indices des lignes altérées (distincts)
+        debit_before (numpy.ndarray): Débits de ces lignes avant altération (centimes)
+        credit_before (numpy.ndarray): Crédits de ces lignes avant altération (centimes)
+
+    Returns:
+        int: Nombre d'écritures rééquilibrées
+    """
+    net = (batch.debit[rows] - debit_before) - (batch.credit[rows] - credit_before)
+    changed = net != 0
+    if not changed.any():
+        return 0
+    order = np.argsort(rows[changed])
+    rows, net, on_debit = rows[changed][order], net[changed][order], (debit_before[changed] > 0)[order]
+    types = batch.anomaly[rows]
+
+    # Écritures touchées : variation nette et côté de la première ligne altérée
+    starts = batch.entry_starts()
+    ends = np.append(starts[1:], len(batch))
+    line_entries = np.searchsorted(starts, rows, side="right") - 1
+    entries, first, inverse = np.unique(line_entries, return_index=True, return_inverse=True)
+    entry_net = np.bincount(inverse, weights=net).astype(np.int64)
+    entry_on_debit = on_debit[first]
+    entry_types = types[first]
+
+    # Lignes candidates : toutes les lignes des écritures touchées
+    sizes = ends[entries] - starts[entries]
+    candidate_entries = np.repeat(np.arange(len(entries)), sizes)
+    candidates = (np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+                  + np.repeat(starts[entries], sizes))
+    amounts = np.where(entry_on_debit[candidate_entries], batch.credit[candidates], batch.debit[candidates])
+    # Rang : sans anomalie, puis montant altéré, puis autre anomalie (écrasée)
+    rank = np.where(batch.anomaly[candidates] < 0, 0, np.where(np.isin(candidates, rows), 1, 2))
+
+    # Par écriture : ligne du côté opposé, de rang puis de montant maximal
+    order = np.lexsort((candidates, -amounts, rank, candidate_entries))
+    keep = np.concatenate(([True], candidate_entries[order][1:] != candidate_entries[order][:-1]))
+    best = order[keep]
+    targets, target_entries = candidates[best], candidate_entries[best]
+    valid = amounts[best] > 0
+    targets, target_entries = targets[valid], target_entries[valid]
+
+    to_credit = entry_on_debit[target_entries]
+    batch.credit[targets[to_credit]] += entry_net[target_entries[to_credit]]
+    batch.debit[targets[~to_credit]] -= entry_net[target_entries[~to_credit]]
+    batch.anomaly[targets] = entry_types[target_entries]
+    return int(len(targets))
+
 
-def inject_anomalies(transactions, anomaly_rate=0.05):
+def apply_batch_anomalies(batch, indices, types, rng, previous_ref=None, balanced=False):
+    """
+    Applique des anomalies à des lignes d'un TransactionBatch (modification en place)
+
+    Les lignes sont regroupées par type en un seul tri, puis chaque noyau est
+    appliqué une fois à toutes les lignes de son type, sans boucle par ligne.
+    La colonne anomaly des lignes altérées reçoit le code du type ; elle reste
+    inchangée si l'anomalie ne s'applique pas à la ligne.
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+        indices (numpy.ndarray): Indices des lignes à modifier (distincts)
+        types (numpy.ndarray): Code du type d'anomalie de chaque ligne (indice dans ANOMALY_TYPES)
+        rng (numpy.random.Generator): Générateur aléatoire
+        previous_ref (int, optional): Référence de pièce (encodée) de la ligne précédant le lot
+        balanced (bool, optional): Reporte les variations de montant sur l'autre jambe de chaque
+            écriture (écritures complètes requises), qui reste équilibrée. Par défaut à False.
+
+    Returns:
+        TransactionBatch: Lot modifié en place
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    types = np.asarray(types, dtype=np.int64)
+    order = np.argsort(types, kind="stable")
+    indices, types = indices[order], types[order]
+    bounds = np.searchsorted(types, np.arange(len(ANOMALY_TYPES) + 1))
+    if balanced:
+        debit_before, credit_before = batch.debit[indices], batch.credit[indices]
+
+    for type_idx, anomaly_type in enumerate(ANOMALY_TYPES):
+        rows = indices[bounds[type_idx]:bounds[type_idx + 1]]
+        if len(rows):
+            applied = ANOMALY_KERNELS[anomaly_type](batch, rows, rng, previous_ref)
+            batch.anomaly[applied] = type_idx
+
+    if balanced:
+        mirror_amounts(batch, indices, debit_before, credit_before)
+    return batch
+
+
+def apply_batch_anomaly(batch, idx, anomaly_type, rng, previous_ref=None):
+    """
+    Applique une anomalie à une ligne d'un TransactionBatch (modification en place)
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+        idx (int): Indice de la ligne à modifier
+        anomaly_type (str): Type d'anomalie (voir ANOMALY_TYPES)
+        rng (numpy.random.Generator): Générateur aléatoire
+        previous_ref (int, optional): Référence de pièce (encodée) de la ligne précédant le lot
+    """
+    apply_batch_anomalies(batch, [idx], [ANOMALY_TYPES.index(anomaly_type)], rng, previous_ref)
+
+
+def draw_anomaly_types(rng, count, mix=None):
+    """
+    Tire le type de count anomalies
+
+    Args:
+        rng (numpy.random.Generator): Générateur aléatoire
+        count (int): Nombre d'anomalies
+        mix (numpy.ndarray, optional): Proportions par type (voir anomaly_mix).
+            Par défaut, types équiprobables.
+
+    Returns:
+        numpy.ndarray: Codes des types (indices dans ANOMALY_TYPES)
+    """
+    if mix is None:
+        return rng.integers(len(ANOMALY_TYPES), size=count)
+    return rng.choice(len(mix), size=count, p=mix)
+
+
+def draw_eligible_rows(batch, indices, types, rng):
+    """
+    Remplace les lignes tirées pour un type auquel elles ne sont pas éligibles
+
+    Chaque ligne non éligible est remplacée par une ligne éligible non encore
+    tirée, au hasard ; faute de lignes éligibles en nombre suffisant, les
+    lignes restantes sont conservées (et ignorées par le noyau).
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+        indices (numpy.ndarray): Indices des lignes tirées (distincts, modifiés en place)
+        types (numpy.ndarray): Code du type d'anomalie de chaque ligne
+        rng (numpy.random.Generator): Générateur aléatoire
+
+    Returns:
+        numpy.ndarray: Indices des lignes
+    """
+    taken = np.zeros(len(batch), dtype=bool)
+    taken[indices] = True
+    for type_idx, anomaly_type in enumerate(ANOMALY_TYPES):
+        eligible = ANOMALY_ELIGIBILITY.get(anomaly_type)
+        selected = np.flatnonzero(types == type_idx)
+        if eligible is None or not len(selected):
+            continue
+        mask = eligible(batch)
+        wrong = selected[~mask[indices[selected]]]
+        pool = np.flatnonzero(mask & ~taken)
+        count = min(len(wrong), len(pool))
+        if count:
+            chosen = rng.choice(pool, count, replace=False)
+            taken[indices[wrong[:count]]] = False
+            taken[chosen] = True
+            indices[wrong[:count]] = chosen
+    return indices
+
+
+def inject_batch_anomalies(batch, anomaly_count, rng, previous_ref=None, mix=None, balanced=False):
+    """
+    Injecte un nombre donné d'anomalies dans un TransactionBatch (lignes tirées sans remise)
+
+    Le tirage des lignes et des types, puis l'application de chaque type, se
+    font sur des tableaux : le coût est linéaire en la taille du lot. Les lignes
+    étiquetées en moins de anomaly_count (aucune ligne éligible disponible,
+    valeur inchangée) sont comptées dans le compteur anomalies_skipped des
+    mesures courantes.
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+        anomaly_count (int): Nombre de lignes à altérer
+        rng (numpy.random.Generator): Générateur aléatoire
+        previous_ref (int, optional): Référence de pièce (encodée) de la ligne précédant le lot
+        mix (numpy.ndarray, optional): Proportions par type (voir anomaly_mix).
+            Par défaut, types équiprobables.
+        balanced (bool, optional): Écritures maintenues équilibrées (voir mirror_amounts).
+            Par défaut à False.
+
+    Returns:
+        TransactionBatch: Lot modifié en place
+    """
+    if anomaly_count:
+        indices = rng.choice(len(batch), anomaly_count, replace=False)
+        types = draw_anomaly_types(rng, anomaly_count, mix)
+        indices = draw_eligible_rows(batch, indices, types, rng)
+        labelled = int(np.count_nonzero(batch.anomaly >= 0))
+        apply_batch_anomalies(batch, indices, types, rng, previous_ref, balanced)
+        skipped = anomaly_count - (int(np.count_nonzero(batch.anomaly >= 0)) - labelled)
+        if skipped > 0:
+            current_metrics().add(ANOMALIES_SKIPPED, skipped)
+    return batch
+
+
+def apply_anomaly(transaction, anomaly_type, previous=None, rng=None):
+    """
+    Applique une anomalie à une ligne d'écriture (modification en place)
+
+    La clé 'anomaly_type' de la ligne reçoit le type appliqué, sauf si
+    l'anomalie ne s'applique pas à la ligne. Seuls les six types historiques
+    sont disponibles ligne à ligne ; inject_anomalies utilise les noyaux du
+    registre.
+
+    Args:
+        transaction (dict): Ligne d'écriture à modifier
+        anomaly_type (str): Type d'anomalie historique (round_amount, unusual_date, duplicate_ref,
+            unusual_account_usage, threshold_amount, weekend_transaction)
+        previous (dict, optional): Ligne précédente, utilisée pour les références dupliquées
+        rng (numpy.random.Generator, optional): Générateur aléatoire. Par défaut, un nouveau générateur.
+
+    Returns:
+        dict: Ligne modifiée
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+
+    if anomaly_type == "round_amount":
+        # Montants ronds suspects
+        transaction['debit'] = round(transaction['debit'])
+        transaction['credit'] = round(transaction['credit'])
+
+    elif anomaly_type == "unusual_date":
+        # Jour férié de l'année (au hasard), en dehors des heures de bureau
+        current = transaction['transaction_date']
+        holidays = [current.replace(month=month, day=day) for month, day in FIXED_HOLIDAYS
+                    if (month, day) != (current.month, current.day)]
+        holiday = holidays[rng.integers(len(holidays))]
+        hour = int(rng.integers(20, 24))
+        transaction['transaction_date'] = holiday.replace(hour=hour)
+        transaction['ecr_date'] = holiday.strftime("%Y%m%d")
+
+    elif anomaly_type == "duplicate_ref":
+        # Référence de pièce dupliquée
+        if previous is None:
+            return transaction
+        transaction['piece_ref'] = previous['piece_ref']
+
+    elif anomaly_type == "unusual_account_usage":
+        # Utilisation inhabituelle d'un compte
+        if not transaction['account'].startswith("5"):
+            return transaction
+        transaction['account'] = UNUSUAL_ACCOUNTS[rng.integers(len(UNUSUAL_ACCOUNTS))]
+        # Mise à jour du libellé du compte
+        transaction['account_lib'] = UNUSUAL_ACCOUNT_LABELS[transaction['account']]
+
+    elif anomaly_type == "threshold_amount":
+        # Montant juste sous un seuil d'autorisation (par exemple, 999,42€ au lieu de 1000€),
+        # calculé en centimes puis arrondi au centime
+        chosen_threshold = THRESHOLDS[rng.integers(len(THRESHOLDS))]
+        amount = (chosen_threshold * 100 - int(rng.integers(1, 101))) / 100
+        if transaction['debit'] > 0:
+            transaction['debit'] = amount
+        else:
+            transaction['credit'] = amount
+
+    elif anomaly_type == "weekend_transaction":
+        # Transaction un weekend
+        # Trouver un samedi ou dimanche proche
+        current_date = transaction['transaction_date']
+        days_to_add = (5 - current_date.weekday()) % 7  # Pour atteindre samedi
+        if days_to_add == 0:
+            days_to_add = 1  # Pour dimanche si on est déjà samedi
+        transaction['transaction_date'] = current_date + timedelta(days=days_to_add)
+        transaction['ecr_date'] = transaction['transaction_date'].strftime("%Y%m%d")
+
+    else:
+        raise ValueError(f"Type d'anomalie sans application ligne à ligne: {anomaly_type!r}")
+
+    transaction['anomaly_type'] = anomaly_type
+    return transaction
+
+
+def inject_anomalies(transactions, anomaly_rate=0.05, rng=None, mix=None, balanced=False):
     """
     Injecte des anomalies dans les transactions pour l'IA prédictive
-    
+
+    Les lignes (dictionnaires) passent par les mêmes noyaux vectorisés que les
+    lots en colonnes, puis sont mises à jour en place.
+
     Args:
-        transactions (list): Liste des transactions
+        transactions (list | TransactionBatch): Liste des transactions ou lot en colonnes
         anomaly_rate (float, optional): Taux d'anomalies à injecter. Par défaut à 0.05.
-    
+        rng (numpy.random.Generator, optional): Générateur aléatoire. Par défaut, un nouveau générateur.
+        mix (numpy.ndarray, optional): Proportions par type (voir anomaly_mix).
+            Par défaut, types équiprobables.
+        balanced (bool, optional): Écritures maintenues équilibrées (voir mirror_amounts).
+            Par défaut à False.
+
     Returns:
-        list: Transactions avec anomalies injectées
+        list | TransactionBatch: Transactions avec anomalies injectées
     """
     anomaly_count = int(len(transactions) * anomaly_rate)
-    anomaly_indices = random.sample(range(len(transactions)), anomaly_count)
-    
-    for idx in anomaly_indices:
-        anomaly_type = random.choice([
-            "round_amount", 
-            "unusual_date", 
-            "duplicate_ref", 
-            "unusual_account_usage",
-            "threshold_amount",
-            "weekend_transaction"
-        ])
-        
-        if anomaly_type == "round_amount":
-            # Montants ronds suspects
-            transactions[idx]['debit'] = round(transactions[idx]['debit'])
-            transactions[idx]['credit'] = round(transactions[idx]['credit'])
-        
-        elif anomaly_type == "unusual_date":
-            # Transaction en dehors des heures de bureau
-            hour = random.randint(20, 23)
-            transactions[idx]['transaction_date'] = transactions[idx]['transaction_date'].replace(hour=hour)
-        
-        elif anomaly_type == "duplicate_ref":
-            # Référence de pièce dupliquée
-            if idx > 0:
-                transactions[idx]['piece_ref'] = transactions[idx-1]['piece_ref']
-        
-        elif anomaly_type == "unusual_account_usage":
-            # Utilisation inhabituelle d'un compte
-            if transactions[idx]['account'].startswith("5"):
-                unusual_accounts = ["471000", "486000"]
-                transactions[idx]['account'] = random.choice(unusual_accounts)
-                # Mise à jour du libellé du compte
-                plan_comptable = {
-                    "471000": "Compte d'attente",
-                    "486000": "Charges constatees d'avance"
-                }
-                transactions[idx]['account_lib'] = plan_comptable[transactions[idx]['account']]
-        
-        elif anomaly_type == "threshold_amount":
-            # Montant juste sous un seuil d'autorisation (par exemple, 999€ au lieu de 1000€)
-            thresholds = [1000, 5000, 10000]
-            chosen_threshold = random.choice(thresholds)
-            if transactions[idx]['debit'] > 0:
-                transactions[idx]['debit'] = chosen_threshold - random.uniform(0.01, 1)
+    rng = rng if rng is not None else np.random.default_rng()
+
+    if _is_batch(transactions):
+        return inject_batch_anomalies(transactions, anomaly_count, rng, mix=mix, balanced=balanced)
+
+    if not anomaly_count:
+        return transactions
+
+    from models.transaction_batch import TransactionBatch
+    base_date = transactions[0]['transaction_date'].replace(hour=0, minute=0, second=0, microsecond=0)
+    batch = TransactionBatch.from_records(transactions, base_date)
+    debit, credit = batch.debit.copy(), batch.credit.copy()
+    inject_batch_anomalies(batch, anomaly_count, rng, mix=mix, balanced=balanced)
+    changed = (batch.anomaly >= 0) | (batch.debit != debit) | (batch.credit != credit)
+    for transaction, record, update in zip(transactions, batch.iter_records(), changed.tolist()):
+        if update:
+            transaction.update(record)
+
+    return transactions
+
+
+def iter_inject_anomalies(batches, total, anomaly_rate=0.05, rng=None, mix=None, balanced=False, metrics=None):
+    """
+    Injecte des anomalies à la volée dans un flux de TransactionBatch
+
+    Le nombre d'anomalies est exactement celui d'inject_anomalies et les lignes
+    touchées forment un tirage uniforme sur l'ensemble du flux : le nombre
+    d'anomalies de chaque lot suit une loi hypergéométrique (lignes restantes,
+    anomalies restantes), sans jamais conserver le flux en mémoire.
+
+    Args:
+        batches (iterable): Flux de TransactionBatch
+        total (int): Nombre total de lignes du flux
+        anomaly_rate (float, optional): Taux d'anomalies à injecter. Par défaut à 0.05.
+        rng (numpy.random.Generator, optional): Générateur aléatoire
+        mix (numpy.ndarray, optional): Proportions par type (voir anomaly_mix).
+            Par défaut, types équiprobables.
+        balanced (bool, optional): Écritures maintenues équilibrées (voir mirror_amounts) ;
+            les lots doivent contenir des écritures complètes. Par défaut à False.
+        metrics (Metrics, optional): Mesures (anomalies non appliquées). Par défaut à None.
+
+    Yields:
+        TransactionBatch: Lots avec anomalies injectées
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    remaining = int(total * anomaly_rate)
+    previous_ref = None
+
+    for batch in batches:
+        size = len(batch)
+        count = 0
+        if remaining and size:
+            if size >= total:
+                count = remaining
             else:
-                transactions[idx]['credit'] = chosen_threshold - random.uniform(0.01, 1)
-        
-        elif anomaly_type == "weekend_transaction":
-            # Transaction un weekend
-            # Trouver un samedi ou dimanche proche
-            current_date = transactions[idx]['transaction_date']
-            days_to_add = (5 - current_date.weekday()) % 7  # Pour atteindre samedi
-            if days_to_add == 0:
-                days_to_add = 1  # Pour dimanche si on est déjà samedi
-            transactions[idx]['transaction_date'] = current_date + timedelta(days=days_to_add)
-            transactions[idx]['ecr_date'] = transactions[idx]['transaction_date'].strftime("%Y%m%d")
-            
-    return transactions
\ No newline at end of file
+                count = rng.hypergeometric(remaining, total - remaining, size)
+        if count:
+            with as_metrics(metrics).activate():
+                inject_batch_anomalies(batch, count, rng, previous_ref, mix, balanced)
+            remaining -= count
+        total -= size
+        if size:
+            previous_ref = batch.piece_ref[-1]
+        yield batch
@@ -0,0 +1,601 @@
+"""
+Lecture rapide et validation des FEC existants (séparateur |)
+
+Le fichier est projeté en mémoire (mmap) ou, s'il est compressé (.gz, .zst),
+décompressé en flux, puis découpé en blocs de lignes complètes. Chaque bloc
+est analysé en colonnes avec NumPy, sans dictionnaire ni objet par ligne :
+positions des séparateurs, nombre de colonnes, caractères non ASCII, dates
+AAAAMMJJ et montants (convertis en centimes) sont vérifiés pour toutes les
+lignes du bloc à la fois. Seules les lignes contenant des guillemets (champs
+protégés par le module csv) sont relues une à une par le module csv ; un champ
+entre guillemets ne peut donc pas contenir de fin de ligne.
+
+Les erreurs sont repérées par numéro de ligne (l'en-tête est la ligne 1) et
+par position en octets dans le fichier (dans le flux décompressé pour un
+fichier compressé).
+"""
+
+import csv
+import mmap
+import os
+import re
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+import numpy as np
+
+# Taille des blocs analysés (lignes complètes)
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Erreurs détaillées conservées (les autres sont seulement comptées)
+DEFAULT_MAX_ERRORS = 100
+
+# Colonnes lues par défaut
+DEFAULT_FIELDS = ("JournalCode", "EcritureNum", "EcritureDate", "Debit", "Credit")
+
+# Clé d'une écriture
+KEY_FIELDS = ("JournalCode", "EcritureNum")
+
+# Montants (convertis en centimes)
+AMOUNT_FIELDS = ("Debit", "Credit")
+
+# Dates AAAAMMJJ obligatoires, et facultatives (champ vide accepté)
+DATE_FIELDS = ("EcritureDate", "PieceDate", "ValidDate")
+OPTIONAL_DATE_FIELDS = ("DateLet",)
+
+# Longueur maximale d'un code journal ou d'un numéro d'écriture
+MAX_KEY_LENGTH = 64
+
+# Longueur maximale d'un montant : signe, 16 chiffres, séparateur et 2 décimales
+_MAX_AMOUNT_LENGTH = 20
+_MAX_UNIT_DIGITS = 16
+_AMOUNT_PATTERN = re.compile(r"[+-]?\d{1,16}(?:,\d{0,2})?")
+
+_NEWLINE, _CR, _PIPE, _QUOTE, _MINUS = 10, 13, 124, 34, 45
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+_NAT = np.datetime64("NaT", "D")
+
+# Erreur repérée dans un FEC (line : numéro de ligne, offset : position en octets)
+FECError = namedtuple("FECError", ["line", "offset", "kind", "message"])
+FECError.__str__ = lambda error: f"Ligne {error.line} (octet {error.offset}): {error.message}"
+
+# Bloc de lignes lu : numéros de ligne, positions et colonnes des lignes valides, erreurs du bloc
+FECChunk = namedtuple("FECChunk", ["line", "offset", "columns", "errors", "error_counts"])
+
+
+def _mapped_chunks(filename, chunk_bytes):
+    """Blocs de lignes complètes d'un fichier brut, projeté en mémoire (vues sans copie)"""
+    with open(filename, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            start = 0
+            while start < size:
+                end = min(start + chunk_bytes, size)
+                if end < size:
+                    cut = mapped.rfind(b"\n", start, end)
+                    if cut < 0:
+                        cut = mapped.find(b"\n", end)
+                    end = size if cut < 0 else cut + 1
+                chunk = np.frombuffer(mapped, dtype=np.uint8, count=end - start, offset=start)
+                try:
+                    yield chunk, start
+                finally:
+                    del chunk
+                start = end
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # Vue encore référencée (exception en cours) : projection libérée avec elle
+                pass
+
+
+def _stream_chunks(filename, chunk_bytes):
+    """Blocs de lignes complètes d'un fichier compressé, décompressé en flux"""
+    from exporters.compression import compression_of
+
+    if compression_of(filename) == "gzip":
+        import gzip
+        f = gzip.open(filename, "rb")
+    else:
+        import zstandard
+        f = zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), read_across_frames=True, closefd=True)
+    with f:
+        offset, rest = 0, b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                yield np.frombuffer(data, dtype=np.uint8, count=cut), offset
+                offset += cut
+            rest = data[cut:]
+        if rest:
+            yield np.frombuffer(rest, dtype=np.uint8), offset
+
+
+def read_chunks(filename, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Découpe un FEC en blocs de lignes complètes
+
+    Args:
+        filename (str): Fichier FEC (brut, .gz ou .zst)
+        chunk_bytes (int, optional): Taille visée des blocs. Par défaut à 16 Mio.
+
+    Yields:
+        tuple: (octets du bloc en numpy.ndarray uint8, position du bloc dans le fichier)
+    """
+    from exporters.compression import compression_of
+
+    filename = os.fspath(filename)
+    if compression_of(filename) is None:
+        return _mapped_chunks(filename, chunk_bytes)
+    return _stream_chunks(filename, chunk_bytes)
+
+
+def _field_matrix(buf, begin, end, width):
+    """Octets d'un champ de chaque ligne, complétés par des zéros (une ligne par ligne FEC)"""
+    index = begin[:, None] + np.arange(width)
+    if len(begin) and int(begin.max()) + width > len(buf):
+        index = np.minimum(index, len(buf) - 1)
+    matrix = buf[index]
+    if (end - begin != width).any():
+        matrix *= index < end[:, None]
+    return matrix
+
+
+def _field_bytes(buf, begin, end):
+    """Valeurs d'un champ de chaque ligne (tableau d'octets numpy.bytes_)"""
+    width = max(int((end - begin).max(initial=0)), 1)
+    return np.ascontiguousarray(_field_matrix(buf, begin, end, width)).view(f"S{width}").ravel()
+
+
+def _parse_amounts(buf, begin, end):
+    """
+    Convertit en centimes les montants d'un champ, sans passer par des flottants
+
+    Montants acceptés : signe facultatif, 1 à 16 chiffres, virgule décimale
+    (séparateur imposé par le format FEC, comme utils.formatters.parse_cents)
+    suivie d'au plus 2 décimales. Un point, ou tout autre caractère, rend le
+    montant invalide.
+
+    Returns:
+        tuple: (montants en centimes, validité de chaque montant)
+    """
+    lengths = end - begin
+    width = int(min(lengths.max(initial=0), _MAX_AMOUNT_LENGTH))
+    if not width:
+        return np.zeros(len(begin), dtype=np.int64), np.zeros(len(begin), dtype=bool)
+    matrix = _field_matrix(buf, begin, np.minimum(end, begin + width), width)
+    values = matrix - np.uint8(48)
+    digit = values <= 9
+    separator = matrix == 44
+    signed = (matrix[:, 0] == _MINUS) | (matrix[:, 0] == 43)
+    digits = digit.sum(axis=1)
+    separators = separator.sum(axis=1)
+    decimals = np.where(separators > 0, lengths - separator.argmax(axis=1) - 1, 0)
+    valid = ((lengths > 0) & (lengths <= width) & (digits + separators + signed == lengths)
+             & (separators <= 1) & (decimals <= 2) & (digits - decimals >= 1) & (digits - decimals <= _MAX_UNIT_DIGITS))
+
+    # Chiffres lus de gauche à droite (schéma de Horner), séparateur et signe ignorés
+    cents = np.zeros(len(begin), dtype=np.int64)
+    for column in range(width):
+        cents = np.where(digit[:, column], cents * 10 + values[:, column], cents)
+    cents *= _POW10[np.clip(2 - decimals, 0, 2)]
+    cents = np.where(matrix[:, 0] == _MINUS, -cents, cents)
+    return np.where(valid, cents, 0), valid
+
+
+def _parse_dates(buf, begin, end, optional=False):
+    """
+    Convertit les dates AAAAMMJJ d'un champ (calendrier vérifié)
+
+    Returns:
+        tuple: (dates en numpy.datetime64[D], NaT si vide ou invalide ; validité de chaque date)
+    """
+    lengths = end - begin
+    # Une période compte peu de dates distinctes : seules celles-ci sont converties
+    values, inverse = np.unique(_field_matrix(buf, begin, begin + 8, 8).view(np.uint64).ravel(), return_inverse=True)
+    matrix = values.view(np.uint8).reshape(-1, 8).astype(np.int64) - 48
+    year = matrix[:, 0] * 1000 + matrix[:, 1] * 100 + matrix[:, 2] * 10 + matrix[:, 3]
+    month = matrix[:, 4] * 10 + matrix[:, 5]
+    day = matrix[:, 6] * 10 + matrix[:, 7]
+    valid = ((matrix >= 0) & (matrix <= 9)).all(axis=1) & (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    first = months.astype("datetime64[D]")
+    valid &= day <= ((months + 1).astype("datetime64[D]") - first).astype(np.int64)
+    dates = np.where(valid, first + (day - 1), _NAT)[inverse]
+    valid = valid[inverse] & (lengths == 8)
+    dates[lengths != 8] = _NAT
+    if optional:
+        valid |= lengths == 0
+    return dates, valid
+
+
+def _parse_amount_text(text):
+    """Montant texte en centimes (None s'il est invalide), pour les lignes lues par le module csv"""
+    if not _AMOUNT_PATTERN.fullmatch(text):
+        return None
+    sign = -1 if text.startswith("-") else 1
+    units, _, decimals = text.lstrip("+-").partition(",")
+    return sign * (int(units) * 100 + int((decimals + "00")[:2]))
+
+
+def _parse_date_text(text, optional=False):
+    """Date AAAAMMJJ texte (NaT si vide, None si invalide), pour les lignes lues par le module csv"""
+    if optional and not text:
+        return _NAT
+    if len(text) != 8 or not text.isdigit():
+        return None
+    try:
+        return np.datetime64(datetime.strptime(text, "%Y%m%d").date(), "D")
+    except ValueError:
+        return None
+
+
+class _ChunkErrors:
+    """Erreurs d'un bloc : comptées par type, détaillées dans la limite fixée (par type)"""
+
+    def __init__(self, limit, first_line, offset):
+        self.limit = limit
+        self.first_line = first_line
+        self.offset = offset
+        self.starts = None
+        self.counts = Counter()
+        self.items = []
+
+    def add(self, kind, lines, message):
+        """
+        Args:
+            kind (str): Type d'erreur
+            lines (numpy.ndarray): Indices des lignes en erreur dans le bloc
+            message (callable): Message de la k-ième ligne en erreur
+        """
+        if not len(lines):
+            return
+        self.counts[kind] += len(lines)
+        for k, line in enumerate(lines[:self.limit].tolist()):
+            self.items.append(FECError(self.first_line + line, self.offset + int(self.starts[line]), kind, message(k)))
+
+
+class FECReader:
+    """
+    Lecteur en colonnes d'un FEC existant (CSV brut, .gz ou .zst)
+
+    Chaque bloc lu donne, pour ses lignes valides, les colonnes demandées :
+    montants en centimes (int64), dates en numpy.datetime64[D] et autres champs
+    en octets (numpy.bytes_). Les lignes mal formées (nombre de colonnes, clé
+    d'écriture vide, montant illisible) sont écartées et signalées dans les
+    erreurs du bloc ; une date invalide est signalée et lue comme NaT.
+
+    Attributes:
+        columns (list): Colonnes de l'en-tête (18 colonnes FEC, plus anomaly_type le cas échéant)
+        lines (int): Lignes de données lues (hors en-tête)
+    """
+
+    def __init__(self, filename, fields=DEFAULT_FIELDS, max_errors=DEFAULT_MAX_ERRORS,
+                 chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """
+        Args:
+            filename (str): Fichier FEC
+            fields (tuple, optional): Colonnes à lire. Par défaut, clé, date et montants.
+            max_errors (int, optional): Erreurs détaillées par type et par bloc. Par défaut à 100.
+            chunk_bytes (int, optional): Taille visée des blocs. Par défaut à 16 Mio.
+        """
+        self.filename = os.fspath(filename)
+        self.fields = tuple(fields)
+        self.max_errors = max_errors
+        self.chunk_bytes = chunk_bytes
+        self.columns = None
+        self.lines = 0
+
+    def _read_header(self, buf):
+        """Lit l'en-tête ; renvoie sa longueur en octets et l'erreur éventuelle"""
+        from exporters.fec_writer import ANOMALY_COLUMN, FEC_COLUMNS
+
+        head = bytes(buf[:65536])
+        cut = head.find(b"\n")
+        cut = len(buf) if cut < 0 else cut + 1
+        columns = head[:cut].rstrip(b"\r\n").decode("ascii", errors="replace").split("|")
+        if columns in (FEC_COLUMNS, FEC_COLUMNS + [ANOMALY_COLUMN]):
+            self.columns, error = columns, None
+        else:
+            self.columns = FEC_COLUMNS + [ANOMALY_COLUMN] if len(columns) == len(FEC_COLUMNS) + 1 else FEC_COLUMNS
+            error = FECError(1, 0, "entete", f"En-tête FEC invalide: {'|'.join(columns)[:200]!r}")
+        unknown = sorted(set(self.fields) - set(self.columns))
+        if unknown:
+            raise ValueError(f"Colonne inconnue: {', '.join(unknown)}")
+        return cut, error
+
+    def __iter__(self):
+        """
+        Yields:
+            FECChunk: Blocs de lignes lus, dans l'ordre du fichier
+        """
+        self.lines = 0
+        first_line, header_error = 2, None
+        for buf, offset in read_chunks(self.filename, self.chunk_bytes):
+            if self.columns is None:
+                cut, header_error = self._read_header(buf)
+                buf, offset = buf[cut:], offset + cut
+            chunk, count = self._parse(buf, offset, first_line)
+            del buf
+            if header_error is not None:
+                chunk.errors.insert(0, header_error)
+                chunk.error_counts["entete"] += 1
+                header_error = None
+            first_line += count
+            self.lines += count
+            yield chunk
+        if self.columns is None:
+            self._read_header(np.empty(0, dtype=np.uint8))
+            errors = _ChunkErrors(self.max_errors, 1, 0)
+            errors.starts = np.zeros(1, dtype=np.int64)
+            errors.add("entete", np.zeros(1, dtype=np.int64), lambda k: "Fichier vide")
+            chunk, _ = self._parse(np.empty(0, dtype=np.uint8), 0, first_line)
+            yield chunk._replace(errors=errors.items, error_counts=errors.counts)
+
+    def _parse(self, buf, offset, first_line):
+        """Analyse un bloc de lignes complètes ; renvoie le bloc lu et son nombre de lignes"""
+        errors = _ChunkErrors(self.max_errors, first_line, offset)
+        newlines = np.flatnonzero(buf == _NEWLINE)
+        if len(buf) and buf[-1] != _NEWLINE:
+            newlines = np.append(newlines, len(buf))
+        count = len(newlines)
+        starts = np.zeros(count, dtype=np.int64)
+        starts[1:] = newlines[:-1] + 1
+        ends = newlines.astype(np.int64)
+        ends -= (ends > starts) & (buf[np.maximum(ends - 1, 0)] == _CR)
+        errors.starts = starts
+
+        empty = ends == starts
+        errors.add("ligne_vide", np.flatnonzero(empty), lambda k: "Ligne vide")
+        high = np.flatnonzero(buf >= 128)
+        if len(high):
+            errors.add("ascii", np.unique(np.searchsorted(newlines, high)), lambda k: "Caractère non ASCII")
+
+        # Nombre de séparateurs par ligne (les lignes avec guillemets sont relues par le module csv)
+        expected = len(self.columns) - 1
+        pipes = np.flatnonzero(buf == _PIPE)
+        quoted = np.zeros(count, dtype=bool)
+        quoted[np.searchsorted(newlines, np.flatnonzero(buf == _QUOTE))] = True
+        if len(pipes) == count * expected and not quoted.any() and not empty.any():
+            # Cas courant : chaque groupe de séparateurs consécutifs tient dans sa ligne
+            pipes = pipes.reshape(-1, expected)
+            regular = count == 0 or bool((pipes[:, 0] >= starts).all() and (pipes[:, -1] < ends).all())
+        else:
+            regular = False
+        if regular:
+            rows = np.arange(count)
+        else:
+            pipes = pipes.ravel()
+            pipe_lines = np.searchsorted(newlines, pipes)
+            pipe_counts = np.bincount(pipe_lines, minlength=count)
+            wrong = np.flatnonzero((pipe_counts != expected) & ~quoted & ~empty)
+            errors.add("colonnes", wrong,
+                       lambda k: f"{pipe_counts[wrong[k]] + 1} colonnes au lieu de {expected + 1}")
+            fast = (pipe_counts == expected) & ~quoted & ~empty
+            rows = np.flatnonzero(fast)
+            pipes = pipes[fast[pipe_lines]].reshape(-1, expected)
+
+        def bounds(name):
+            index = self.columns.index(name)
+            begin = starts[rows] if index == 0 else pipes[:, index - 1] + 1
+            end = ends[rows] if index == expected else pipes[:, index]
+            return begin, end
+
+        keep = np.ones(len(rows), dtype=bool)
+        values = {}
+        for name in KEY_FIELDS:
+            begin, end = bounds(name)
+            bad = np.flatnonzero((end == begin) | (end - begin > MAX_KEY_LENGTH))
+            errors.add("cle", rows[bad], lambda k, name=name: f"{name} vide ou trop long")
+            keep[bad] = False
+        for name in AMOUNT_FIELDS:
+            begin, end = bounds(name)
+            values[name], valid = _parse_amounts(buf, begin, end)
+            bad = np.flatnonzero(~valid)
+            errors.add("montant", rows[bad], lambda k, name=name, begin=begin, end=end, bad=bad:
+                       f"{name} invalide: {bytes(buf[begin[bad[k]]:end[bad[k]]]).decode('latin-1')[:40]!r}")
+            keep &= valid
+        for name in DATE_FIELDS + OPTIONAL_DATE_FIELDS:
+            begin, end = bounds(name)
+            values[name], valid = _parse_dates(buf, begin, end, optional=name in OPTIONAL_DATE_FIELDS)
+            bad = np.flatnonzero(~valid)
+            errors.add("date", rows[bad], lambda k, name=name, begin=begin, end=end, bad=bad:
+                       f"{name} invalide: {bytes(buf[begin[bad[k]]:end[bad[k]]]).decode('latin-1')[:40]!r}")
+
+        columns = {}
+        for name in self.fields:
+            if name in values:
+                columns[name] = values[name][keep]
+            else:
+                begin, end = bounds(name)
+                columns[name] = _field_bytes(buf, begin[keep], end[keep])
+        rows = rows[keep]
+
+        slow = np.flatnonzero(quoted & ~empty)
+        if len(slow):
+            rows, columns = self._parse_quoted(buf, starts, ends, slow, rows, columns, errors)
+
+        chunk = FECChunk(first_line + rows, offset + starts[rows], columns,
+                         sorted(errors.items, key=lambda error: error.line), errors.counts)
+        return chunk, count
+
+    def _parse_quoted(self, buf, starts, ends, lines, rows, columns, errors):
+        """Lit une à une, avec le module csv, les lignes contenant des guillemets"""
+        expected = len(self.columns)
+        parsed = {name: [] for name in self.fields}
+        kept = []
+        for line in lines.tolist():
+            text = bytes(buf[starts[line]:ends[line]]).decode("latin-1")
+            fields = next(csv.reader([text], delimiter="|"), [])
+            at = np.array([line])
+            if len(fields) != expected:
+                errors.add("colonnes", at, lambda k: f"{len(fields)} colonnes au lieu de {expected}")
+                continue
+            row = dict(zip(self.columns, fields))
+            valid = True
+            for name in KEY_FIELDS:
+                if not row[name] or len(row[name]) > MAX_KEY_LENGTH:
+                    errors.add("cle", at, lambda k: f"{name} vide ou trop long")
+                    valid = False
+            for name in AMOUNT_FIELDS:
+                row[name] = _parse_amount_text(row[name])
+                if row[name] is None:
+                    errors.add("montant", at, lambda k: f"{name} invalide: {fields[self.columns.index(name)][:40]!r}")
+                    valid = False
+            for name in DATE_FIELDS + OPTIONAL_DATE_FIELDS:
+                date = _parse_date_text(row[name], optional=name in OPTIONAL_DATE_FIELDS)
+                if date is None:
+                    errors.add("date", at, lambda k: f"{name} invalide: {row[name][:40]!r}")
+                    date = _NAT
+                row[name] = date
+            if not valid:
+                continue
+            kept.append(line)
+            for name in self.fields:
+                value = row[name]
+                parsed[name].append(value.encode("latin-1") if isinstance(value, str) else value)
+
+        if not kept:
+            return rows, columns
+        order = np.argsort(np.concatenate((rows, kept)), kind="stable")
+        rows = np.concatenate((rows, kept))[order]
+        columns = {name: np.concatenate((column, np.array(parsed[name], dtype="S" if column.dtype.kind == "S"
+                                                          else column.dtype)))[order]
+                   for name, column in columns.items()}
+        return rows, columns
+
+
+class FECValidationReport:
+    """
+    Résultat de la validation d'un FEC existant
+
+    Attributes:
+        filename (str): Fichier validé
+        columns (list): Colonnes de l'en-tête
+        lines (int): Lignes de données (hors en-tête)
+        debit_cents (int): Total des débits des lignes lisibles, en centimes
+        credit_cents (int): Total des crédits des lignes lisibles, en centimes
+        unbalanced (int): Écritures non équilibrées
+        error_counts (Counter): Nombre d'erreurs par type (entete, ligne_vide, ascii,
+            colonnes, cle, montant, date, equilibre)
+        errors (list): Premières erreurs (FECError), par numéro de ligne
+        seconds (float): Durée de la validation
+    """
+
+    def __init__(self, filename, max_errors=DEFAULT_MAX_ERRORS):
+        self.filename = os.fspath(filename)
+        self.max_errors = max_errors
+        self.columns = None
+        self.lines = 0
+        self.debit_cents = 0
+        self.credit_cents = 0
+        self.unbalanced = 0
+        self.error_counts = Counter()
+        self.errors = []
+        self.seconds = 0.0
+
+    def __repr__(self):
+        status = "valide" if self.valid else f"{sum(self.error_counts.values())} erreurs"
+        return f"<FECValidationReport {self.filename}: {self.lines} lignes, {status}>"
+
+    @property
+    def valid(self):
+        """Indique si le FEC ne contient aucune erreur"""
+        return not self.error_counts
+
+    def add_errors(self, errors, counts):
+        """Ajoute des erreurs ; seules les max_errors premières (par ligne) sont conservées"""
+        self.error_counts.update(counts)
+        self.errors.extend(errors)
+        self.errors.sort(key=lambda error: error.line)
+        del self.errors[self.max_errors:]
+
+    def to_dict(self):
+        """Description JSON du rapport"""
+        return {
+            "file": self.filename,
+            "valid": self.valid,
+            "lines": self.lines,
+            "debit": self.debit_cents / 100,
+            "credit": self.credit_cents / 100,
+            "unbalanced": self.unbalanced,
+            "error_counts": dict(self.error_counts),
+            "errors": [error._asdict() for error in self.errors],
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _balance_chunk(chunk, open_entries):
+    """
+    Cumule le solde des écritures d'un bloc
+
+    Les lignes d'une écriture étant normalement contiguës, le solde est calculé
+    par suite de lignes de même clé ; seules les suites non soldées (écriture à
+    cheval sur deux blocs, lignes dispersées ou écriture déséquilibrée) sont
+    reportées dans open_entries, par clé : [solde, ligne, position de la première ligne].
+    """
+    journal, number = chunk.columns["JournalCode"], chunk.columns["EcritureNum"]
+    if not len(journal):
+        return
+    net = chunk.columns["Debit"] - chunk.columns["Credit"]
+    runs = np.flatnonzero(np.concatenate(([True], (journal[1:] != journal[:-1]) | (number[1:] != number[:-1]))))
+    totals = np.add.reduceat(net, runs)
+    for run in np.flatnonzero(totals).tolist():
+        row = runs[run]
+        key = (journal[row].decode("latin-1"), number[row].decode("latin-1"))
+        entry = open_entries.get(key)
+        if entry is None:
+            open_entries[key] = [int(totals[run]), int(chunk.line[row]), int(chunk.offset[row])]
+        else:
+            entry[0] += int(totals[run])
+            if not entry[0]:
+                del open_entries[key]
+
+
+def validate_fec_file(filename, max_errors=DEFAULT_MAX_ERRORS, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Valide un FEC existant en une passe, à la vitesse du disque
+
+    Contrôles : en-tête (18 colonnes FEC, plus anomaly_type le cas échéant),
+    lignes vides, caractères ASCII, nombre de colonnes, code journal et numéro
+    d'écriture, montants Debit/Credit, dates AAAAMMJJ (EcritureDate, PieceDate,
+    ValidDate, et DateLet si renseignée) et équilibre de chaque écriture
+    (comparaison exacte en centimes ; une ligne écartée n'y contribue pas).
+
+    Args:
+        filename (str): Fichier FEC (brut, .gz ou .zst)
+        max_errors (int, optional): Erreurs détaillées dans le rapport. Par défaut à 100.
+        chunk_bytes (int, optional): Taille visée des blocs analysés. Par défaut à 16 Mio.
+
+    Returns:
+        FECValidationReport: Rapport de validation
+    """
+    start = time.perf_counter()
+    report = FECValidationReport(filename, max_errors)
+    reader = FECReader(filename, KEY_FIELDS + AMOUNT_FIELDS, max_errors, chunk_bytes)
+    open_entries = {}
+    for chunk in reader:
+        report.add_errors(chunk.errors, chunk.error_counts)
+        report.debit_cents += int(chunk.columns["Debit"].sum())
+        report.credit_cents += int(chunk.columns["Credit"].sum())
+        _balance_chunk(chunk, open_entries)
+
+    report.columns = reader.columns
+    report.lines = reader.lines
+    report.unbalanced = len(open_entries)
+    errors = [FECError(line, offset, "equilibre", f"Écriture {key} non équilibrée: {balance / 100}")
+              for key, (balance, line, offset) in open_entries.items()]
+    report.add_errors(errors[:max_errors], Counter({"equilibre": len(errors)}) if errors else Counter())
+    report.seconds = time.perf_counter() - start
+    return report
@@ -2,6 +2,23 @@
 Fonctions de formatage pour le générateur FEC
 """
 
+from functools import lru_cache
+
+import numpy as np
+
+# Parties décimales "00" à "99"
+_CENTS_TEXT = np.array([f"{c:02d}" for c in range(100)], dtype=object)
+
+# Parties entières couvertes par la table précalculée (au-delà : conversion directe)
+UNITS_TABLE_SIZE = 100000
+
+
+@lru_cache(maxsize=None)
+def _units_text():
+    """Table des parties entières "0" à "99999" (construite au premier appel)"""
+    return np.array([str(u) for u in range(UNITS_TABLE_SIZE)], dtype=object)
+
+
 def format_decimal(value):
     """
     Formate un nombre décimal selon les normes FEC (virgule comme séparateur)
@@ -15,6 +32,65 @@ def format_decimal(value):
     return f"{value:.2f}".replace(".", ",")
 
 
+def format_cents(cents, separator=","):
+    """
+    Formate des montants en centimes selon les normes FEC, sans passer par des flottants
+
+    Produit exactement le texte de format_decimal(centimes / 100).
+
+    Args:
+        cents (array-like): Montants en centimes (entiers)
+        separator (str, optional): Séparateur décimal ("." pour une valeur numérique XML). Par défaut à ",".
+
+    Returns:
+        numpy.ndarray: Montants formatés (tableau d'objets), ex. 123456 -> "1234,56"
+    """
+    cents = np.asarray(cents, dtype=np.int64)
+    text = np.full(len(cents), f"0{separator}00", dtype=object)
+    nonzero = np.flatnonzero(cents)
+    if len(nonzero):
+        values = cents[nonzero]
+        units, frac = np.divmod(np.abs(values), 100)
+        if units.max() < UNITS_TABLE_SIZE:
+            units_text = _units_text()[units]
+        else:
+            units_text = units.astype(str).astype(object)
+        formatted = units_text + separator + _CENTS_TEXT[frac]
+        negative = values < 0
+        formatted[negative] = "-" + formatted[negative]
+        text[nonzero] = formatted
+    return text
+
+
+def parse_cents(text):
+    """
+    Convertit un montant au format FEC en centimes, sans passer par des flottants
+
+    Args:
+        text (str): Montant formaté (ex. "1234,56" ou "-0,05")
+
+    Returns:
+        int: Montant en centimes
+    """
+    text = text.strip()
+    sign = -1 if text.startswith("-") else 1
+    units, _, frac = text.lstrip("+-").partition(",")
+    return sign * (int(units or 0) * 100 + int((frac + "00")[:2]))
+
+
+def to_cents(value):
+    """
+    Convertit un montant en euros (nombre) en centimes entiers
+
+    Args:
+        value (float | int): Montant en euros
+
+    Returns:
+        int: Montant en centimes (arrondi au centime le plus proche)
+    """
+    return int(round(value * 100))
+
+
 def format_fec_ecr_num(journal_code, ecr_id):
     """
     Formate le numéro d'écriture selon les normes FEC
@@ -0,0 +1,430 @@
+"""
+Instrumentation de la génération FEC : durées par étape, compteurs et profilage
+
+Un objet Metrics passé au générateur et aux exports mesure le temps exclusif
+de chaque étape (une étape imbriquée suspend celle qui l'englobe), compte les
+lignes générées et écrites, les octets écrits et les appels aux générateurs
+aléatoires, et peut capturer un profil cProfile et le pic de mémoire
+tracemalloc de chaque étape. Sans Metrics, NULL_METRICS ne mesure rien et
+n'ajoute aucun coût.
+
+Example:
+    metrics = Metrics(callbacks=[lambda name, m: print(name, m.counters[name])], profile=True)
+    FECGenerator(transaction_count=100000, metrics=metrics).export_to_csv("fec.csv", stream=True)
+    metrics.log_summary()
+    metrics.profile_stats("generate").sort_stats("cumulative").print_stats(10)
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Compteurs usuels
+LINES_GENERATED = "lines_generated"
+LINES_WRITTEN = "lines_written"
+BYTES_WRITTEN = "bytes_written"
+RNG_CALLS = "rng_calls"
+CACHE_HITS = "cache_hits"
+CACHE_MISSES = "cache_misses"
+LINES_CACHED = "lines_cached"
+ANOMALIES_SKIPPED = "anomalies_skipped"
+
+
+class CountingRNG:
+    """
+    Générateur aléatoire (random.Random ou numpy.random.Generator) comptant les appels à ses méthodes
+
+    Les tirages sont délégués tels quels : le flux aléatoire est inchangé.
+    """
+
+    __slots__ = ("_rng", "_counters")
+
+    def __init__(self, rng, counters):
+        self._rng = rng
+        self._counters = counters
+
+    def __getattr__(self, name):
+        attr = getattr(self._rng, name)
+        if not callable(attr):
+            return attr
+        counters = self._counters
+
+        def counted(*args, **kwargs):
+            counters[RNG_CALLS] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+class Metrics:
+    """
+    Mesures d'une génération : durées exclusives par étape, compteurs et profils
+
+    Attributes:
+        stages (dict): Par étape, {"seconds", "calls"} et, avec trace_memory, "peak_memory" (octets)
+        counters (collections.Counter): lines_generated, lines_written, bytes_written, rng_calls...
+        callbacks (list): Fonctions appelées à chaque mise à jour d'un compteur, avec
+            (nom du compteur, metrics) : suivi de progression
+
+    Les étapes sont suivies par thread : des exports exécutés en parallèle (voir
+    exporters.fanout) mesurent chacun leurs propres étapes.
+    """
+
+    enabled = True
+
+    def __init__(self, callbacks=(), profile=False, trace_memory=False, count_rng=True):
+        """
+        Initialise les mesures
+
+        Args:
+            callbacks (iterable, optional): Fonctions de suivi (nom du compteur, metrics). Par défaut, aucune.
+            profile (bool, optional): Profil cProfile par étape. Par défaut à False.
+            trace_memory (bool, optional): Pic de mémoire tracemalloc par étape (avant Python 3.9,
+                pic cumulé depuis le début du traçage). Par défaut à False.
+            count_rng (bool, optional): Compte les appels aux générateurs aléatoires. Par défaut à True.
+        """
+        self.callbacks = list(callbacks)
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.count_rng = count_rng
+        self.stages = {}
+        self.counters = Counter()
+        self._profiles = {}  # (étape, thread) -> cProfile.Profile
+        self._merged_profiles = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracing = False
+
+    @property
+    def _stack(self):
+        """Étapes en cours du thread courant (la dernière est active)"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def options(self):
+        """Options transmises aux processus du pool (hors fonctions de suivi)"""
+        return {"profile": self.profile, "trace_memory": self.trace_memory, "count_rng": self.count_rng}
+
+    # Étapes
+
+    def _pause(self, now):
+        """Suspend l'étape en cours (temps, profil, mémoire)"""
+        name, start = self._stack[-1]
+        stats = self.stages[name]
+        with self._lock:
+            stats["seconds"] += now - start
+        if self.profile:
+            self._profiles[name, threading.get_ident()].disable()
+        if self.trace_memory:
+            stats["peak_memory"] = max(stats["peak_memory"], tracemalloc.get_traced_memory()[1])
+
+    def _resume(self, name):
+        """Reprend une étape (temps, profil, mémoire)"""
+        # tracemalloc.reset_peak n'existe qu'à partir de Python 3.9 : avant, le pic
+        # est celui du processus depuis le début du traçage
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        if self.profile:
+            self._profiles[name, threading.get_ident()].enable()
+        self._stack.append((name, time.perf_counter()))
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Mesure un bloc comme une étape ; une étape imbriquée suspend l'étape englobante
+
+        Args:
+            name (str): Nom de l'étape (ex. "generate", "balance", "write")
+        """
+        with self._lock:
+            stats = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stats["calls"] += 1
+            if self.profile:
+                self._profiles.setdefault((name, threading.get_ident()), cProfile.Profile())
+        if self.trace_memory:
+            stats.setdefault("peak_memory", 0)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        if self._stack:
+            self._pause(time.perf_counter())
+            outer = self._stack.pop()[0]
+        else:
+            outer = None
+        self._resume(name)
+        try:
+            yield
+        finally:
+            self._pause(time.perf_counter())
+            self._stack.pop()
+            if outer is not None:
+                self._resume(outer)
+
+    def timed(self, name, iterable, counter=None):
+        """
+        Mesure la production de chaque élément d'un itérable comme une étape
+
+        Args:
+            name (str): Nom de l'étape
+            iterable (iterable): Flux à mesurer (ex. lots d'écritures)
+            counter (str, optional): Compteur incrémenté de la taille de chaque élément
+
+        Yields:
+            Éléments de l'itérable ; le temps passé chez le consommateur n'est pas compté
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if counter is not None:
+                self.add(counter, len(item))
+            yield item
+
+    # Compteurs
+
+    def add(self, name, value=1):
+        """
+        Incrémente un compteur et prévient les fonctions de suivi
+
+        Args:
+            name (str): Nom du compteur
+            value (int, optional): Incrément. Par défaut à 1.
+        """
+        with self._lock:
+            self.counters[name] += value
+        for callback in self.callbacks:
+            callback(name, self)
+
+    def counting(self, rng):
+        """
+        Retourne le générateur aléatoire, instrumenté pour compter ses appels si demandé
+
+        Args:
+            rng (random.Random | numpy.random.Generator): Générateur aléatoire
+
+        Returns:
+            Générateur (CountingRNG si count_rng)
+        """
+        return CountingRNG(rng, self.counters) if self.count_rng else rng
+
+    # Processus
+
+    @contextmanager
+    def activate(self):
+        """Rend ces mesures courantes (voir current_metrics) le temps d'un bloc"""
+        global _current
+        previous, _current = _current, self
+        try:
+            yield self
+        finally:
+            _current = previous
+
+    def map(self, function, jobs, workers=1):
+        """
+        ordered_map instrumenté : les fonctions exécutées mesurent via current_metrics()
+
+        En série, les tâches mesurent directement dans ces mesures. Sur un pool,
+        chaque processus mesure ses tâches et renvoie ses mesures, fusionnées ici ;
+        l'attente des résultats est comptée dans l'étape "wait".
+
+        Args:
+            function (callable): Fonction de niveau module (sérialisable)
+            jobs (iterable): Tâches à traiter
+            workers (int, optional): Nombre de processus. Par défaut à 1.
+
+        Yields:
+            Résultats, dans l'ordre des tâches
+        """
+        from exporters.parallel import ordered_map
+
+        if workers <= 1:
+            for job in jobs:
+                with self.activate():
+                    result = function(job)
+                yield result
+            return
+
+        options = self.options()
+        calls = ((function, job, options) for job in jobs)
+        for result, snapshot in self.timed("wait", ordered_map(_instrumented_call, calls, workers)):
+            self.merge(snapshot)
+            yield result
+
+    def snapshot(self):
+        """
+        Mesures sérialisables (transmission entre processus)
+
+        Returns:
+            dict: Étapes, compteurs et profils (statistiques pstats brutes)
+        """
+        profiles = {name: self.profile_stats(name).stats for name in self._profile_names()}
+        return {"stages": self.stages, "counters": dict(self.counters), "profiles": profiles}
+
+    def merge(self, snapshot):
+        """
+        Ajoute les mesures d'un autre processus (voir snapshot)
+
+        Args:
+            snapshot (dict): Mesures à ajouter
+        """
+        for name, stats in snapshot["stages"].items():
+            own = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            own["seconds"] += stats["seconds"]
+            own["calls"] += stats["calls"]
+            if "peak_memory" in stats:
+                own["peak_memory"] = max(own.get("peak_memory", 0), stats["peak_memory"])
+        for name, stats in snapshot.get("profiles", {}).items():
+            other = pstats.Stats()
+            other.stats = stats
+            other.get_top_level_stats()
+            self._merged_profiles.setdefault(name, pstats.Stats()).add(other)
+        for name, value in snapshot["counters"].items():
+            self.add(name, value)
+
+    # Résultats
+
+    def _profile_names(self):
+        """Étapes profilées, dans ce processus ou dans les processus du pool"""
+        return sorted({name for name, _ in self._profiles} | set(self._merged_profiles))
+
+    def profile_stats(self, name):
+        """
+        Profil cProfile d'une étape (tous processus confondus)
+
+        Args:
+            name (str): Nom de l'étape
+
+        Returns:
+            pstats.Stats: Statistiques de l'étape
+        """
+        stats = pstats.Stats()
+        for (stage, _), profile in list(self._profiles.items()):
+            if stage == name:
+                stats.add(profile)
+        if name in self._merged_profiles:
+            stats.add(self._merged_profiles[name])
+        return stats
+
+    def dump_profiles(self, directory):
+        """
+        Écrit un fichier .prof par étape profilée (lisible par pstats, snakeviz...)
+
+        Args:
+            directory (str): Répertoire de sortie
+
+        Returns:
+            list: Fichiers écrits
+        """
+        os.makedirs(directory, exist_ok=True)
+        filenames = []
+        for name in self._profile_names():
+            filename = os.path.join(directory, f"{name}.prof")
+            self.profile_stats(name).dump_stats(filename)
+            filenames.append(filename)
+        return filenames
+
+    def summary(self):
+        """
+        Résumé sérialisable en JSON
+
+        Returns:
+            dict: {"stages": {étape: {"seconds", "calls", ["peak_memory"]}}, "counters": {...}}
+        """
+        return {
+            "stages": {name: dict(stats, seconds=round(stats["seconds"], 6)) for name, stats in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def log_summary(self, level=logging.INFO):
+        """Journalise les durées par étape et les compteurs"""
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"]):
+            memory = f", pic mémoire {stats['peak_memory'] / 2**20:.1f} Mo" if "peak_memory" in stats else ""
+            logger.log(level, "Étape %s: %.3f s (%d appels%s)", name, stats["seconds"], stats["calls"], memory)
+        for name, value in sorted(self.counters.items()):
+            logger.log(level, "%s: %d", name, value)
+
+    def close(self):
+        """Arrête tracemalloc s'il a été démarré par ces mesures"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NullMetrics:
+    """Mesures désactivées : mêmes méthodes, aucun coût"""
+
+    enabled = False
+
+    def stage(self, name):
+        return nullcontext()
+
+    def timed(self, name, iterable, counter=None):
+        return iterable
+
+    def add(self, name, value=1):
+        pass
+
+    def counting(self, rng):
+        return rng
+
+    def activate(self):
+        return nullcontext(self)
+
+    def map(self, function, jobs, workers=1):
+        from exporters.parallel import ordered_map
+        return ordered_map(function, jobs, workers)
+
+
+NULL_METRICS = NullMetrics()
+
+# Mesures courantes du processus (voir Metrics.activate)
+_current = NULL_METRICS
+
+
+def current_metrics():
+    """
+    Retourne les mesures courantes du processus (NULL_METRICS hors d'une exécution instrumentée)
+
+    Returns:
+        Metrics | NullMetrics: Mesures courantes
+    """
+    return _current
+
+
+def as_metrics(metrics):
+    """
+    Normalise un paramètre metrics optionnel
+
+    Args:
+        metrics (Metrics, optional): Mesures, ou None
+
+    Returns:
+        Metrics | NullMetrics: Mesures (NULL_METRICS si None)
+    """
+    return NULL_METRICS if metrics is None else metrics
+
+
+def _instrumented_call(call):
+    """Exécute une tâche avec des mesures propres au processus du pool et les renvoie"""
+    function, job, options = call
+    with Metrics(**options) as metrics, metrics.activate():
+        result = function(job)
+    return result, metrics.snapshot()
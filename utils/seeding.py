@@ -0,0 +1,107 @@
+"""
+Dérivation des graines aléatoires pour le générateur FEC
+"""
+
+import random
+
+import numpy as np
+
+
+def as_seed_sequence(seed):
+    """
+    Convertit une graine en numpy.random.SeedSequence
+
+    Args:
+        seed (int | SeedSequence | None): Graine (None = entropie fraîche)
+
+    Returns:
+        numpy.random.SeedSequence: Séquence de graines
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def derive_seed(seed, *key):
+    """
+    Dérive de façon déterministe et sans état une sous-graine indépendante
+
+    Contrairement à SeedSequence.spawn, le résultat ne dépend que de la graine
+    et de la clé : le même (graine, clé) donne toujours le même flux, quel que
+    soit le processus ou l'ordre des appels.
+
+    Args:
+        seed (int | SeedSequence): Graine parente
+        *key (int): Chemin de dérivation (ex. numéro d'entreprise)
+
+    Returns:
+        numpy.random.SeedSequence: Sous-graine
+    """
+    parent = as_seed_sequence(seed)
+    return np.random.SeedSequence(
+        parent.entropy, spawn_key=tuple(parent.spawn_key) + tuple(key), pool_size=parent.pool_size)
+
+
+class RandomContext:
+    """
+    Contexte aléatoire d'une génération : une graine et les flux qui en dérivent
+
+    Le contexte fournit un random.Random (tirages unitaires du moteur python)
+    et des numpy.random.Generator dérivés par clé (moteur vectorisé, anomalies,
+    partitions, entreprises). Sans graine, l'entropie est tirée une fois à la
+    création du contexte : tous ses flux restent cohérents entre eux.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Initialise le contexte
+
+        Args:
+            seed (int | SeedSequence | None): Graine (None = entropie fraîche)
+        """
+        self.seed = as_seed_sequence(seed)
+        self.random = random.Random(int(self.seed.generate_state(1, np.uint64)[0]))
+
+    def __repr__(self):
+        return f"<RandomContext entropy={self.seed.entropy} spawn_key={tuple(self.seed.spawn_key)}>"
+
+    def numpy(self, *key):
+        """
+        Retourne un générateur NumPy pour un flux dérivé du contexte
+
+        Args:
+            *key (int): Identifiant du flux (ex. STREAM_ANOMALIES, ou journal et mois)
+
+        Returns:
+            numpy.random.Generator: Générateur aléatoire
+        """
+        return np.random.default_rng(derive_seed(self.seed, *key))
+
+    def spawn(self, *key):
+        """
+        Crée un sous-contexte indépendant (une partition, une entreprise)
+
+        Args:
+            *key (int): Chemin de dérivation
+
+        Returns:
+            RandomContext: Sous-contexte
+        """
+        return RandomContext(derive_seed(self.seed, *key))
+
+
+# Contexte partagé des appels sans contexte explicite (non reproductible)
+_default_context = None
+
+
+def default_context():
+    """
+    Retourne le contexte aléatoire par défaut du processus (créé au premier appel)
+
+    Returns:
+        RandomContext: Contexte non reproductible
+    """
+    global _default_context
+    if _default_context is None:
+        _default_context = RandomContext()
+    return _default_context
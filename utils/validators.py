@@ -2,35 +2,195 @@
 Fonctions de validation pour le générateur FEC
 """
 
+import os
+
+import numpy as np
+
+from .formatters import format_cents, parse_cents, to_cents
+
+
+def _is_batch(export_data):
+    """Indique si les données sont un TransactionBatch (import local : évite un import circulaire)"""
+    from models.transaction_batch import TransactionBatch
+    return isinstance(export_data, TransactionBatch)
+
+
+def entry_balances(batch):
+    """
+    Calcule le solde (débit - crédit, en centimes) de chaque écriture d'un lot
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+
+    Returns:
+        tuple: (indices de début d'écriture, soldes en centimes)
+    """
+    starts = batch.entry_starts()
+    if not len(starts):
+        return starts, np.empty(0, dtype=np.int64)
+    return starts, np.add.reduceat(batch.debit - batch.credit, starts)
+
+
+def balance_batch(batch):
+    """
+    Vérifie et corrige en place, en une passe, l'équilibre des écritures d'un lot
+
+    Les soldes sont calculés une seule fois, en centimes : une écriture non
+    équilibrée est corrigée exactement, sans nouvelle validation. L'écart est
+    absorbé de préférence par une ligne sans anomalie : la ligne de montant
+    maximal du côté excédentaire (montant diminué), sinon celle de l'autre côté
+    (montant augmenté), ce qui préserve les anomalies de montant injectées.
+    À défaut, une ligne avec anomalie est corrigée et perd son label. Seules
+    les écritures sans aucun montant restent en erreur.
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures complètes
+
+    Returns:
+        tuple: (écritures corrigées, écritures restant non équilibrées)
+    """
+    starts, balances = entry_balances(batch)
+    unbalanced = np.flatnonzero(balances)
+    if not len(unbalanced):
+        return 0, 0
+
+    # Lignes des seules écritures déséquilibrées
+    sizes = np.diff(np.append(starts, len(batch)))
+    entry_of_line = np.repeat(np.arange(len(starts)), sizes)
+    lines = np.flatnonzero(balances[entry_of_line])
+    line_entries = entry_of_line[lines]
+    excess = balances[line_entries]
+    excess_side = np.where(excess > 0, batch.debit[lines], batch.credit[lines])
+    other_side = np.where(excess > 0, batch.credit[lines], batch.debit[lines])
+
+    # Rang de chaque ligne : côté excédentaire (0) puis autre côté (1), lignes
+    # avec anomalie ensuite (+2), lignes sans montant exclues (4)
+    on_excess = excess_side > 0
+    on_other = ~on_excess & (other_side > 0)
+    rank = np.where(on_excess, 0, np.where(on_other, 1, 4))
+    rank[(rank < 4) & (batch.anomaly[lines] >= 0)] += 2
+    amounts = np.where(on_excess, excess_side, other_side)
+
+    # Par écriture : première ligne de meilleur rang, puis de montant maximal
+    order = np.lexsort((lines, -amounts, rank, line_entries))
+    first = order[np.concatenate(([True], line_entries[order][1:] != line_entries[order][:-1]))]
+    targets, excess, rank = lines[first], excess[first], rank[first]
+
+    fixable = rank < 4
+    decrease = fixable & (rank % 2 == 0)
+    increase = fixable & (rank % 2 == 1)
+    # Débit diminué ou crédit augmenté si l'écriture est excédentaire au débit, et inversement
+    to_debit = (decrease & (excess > 0)) | (increase & (excess < 0))
+    batch.debit[targets[to_debit]] -= excess[to_debit]
+    batch.credit[targets[fixable & ~to_debit]] += excess[fixable & ~to_debit]
+    batch.anomaly[targets[fixable & (rank >= 2)]] = -1
+
+    fixed_count = int(fixable.sum())
+    return fixed_count, len(unbalanced) - fixed_count
+
+
+def iter_balanced_batches(batches):
+    """
+    Équilibre un flux de lots écriture par écriture, dès qu'une écriture est complète
+
+    Les lignes d'une écriture étant contiguës, seule la dernière écriture de
+    chaque lot est retenue jusqu'au lot suivant (elle peut s'y prolonger) :
+    la mémoire supplémentaire est celle d'une écriture, pas celle du fichier.
+
+    Args:
+        batches (iterable): Flux de TransactionBatch, dans l'ordre final
+
+    Yields:
+        tuple: (lot d'écritures complètes et équilibrées, écritures corrigées, erreurs restantes)
+    """
+    from models.transaction_batch import TransactionBatch
+
+    pending = None
+    for batch in batches:
+        if pending is not None and len(pending):
+            batch = TransactionBatch.concat([pending, batch], pending.base_date)
+        if not len(batch):
+            continue
+        starts = batch.entry_starts()
+        last = int(starts[-1])
+        complete, pending = batch[:last], batch[last:]
+        if len(complete):
+            yield (complete,) + balance_batch(complete)
+    if pending is not None and len(pending):
+        yield (pending,) + balance_batch(pending)
+
+
+def validate_batch(batch):
+    """
+    Vérifie l'équilibre des écritures d'un TransactionBatch (comparaison exacte en centimes)
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+
+    Returns:
+        tuple: (bool, list) - Validité et liste des erreurs
+    """
+    from models.vectorized import get_tables
+
+    starts, balances = entry_balances(batch)
+    unbalanced = np.flatnonzero(balances)
+    codes = get_tables().journal_codes
+    errors = []
+    for entry in unbalanced.tolist():
+        line = starts[entry]
+        journal_code = codes[batch.journal[line]]
+        ecr_key = (journal_code, f"{journal_code}{int(batch.ecr_id[line]):05d}")
+        errors.append(f"Écriture {ecr_key} non équilibrée: {balances[entry] / 100}")
+    return (len(errors) == 0), errors
+
+
+def fix_unbalanced_batch(batch):
+    """
+    Corrige en place les écritures non équilibrées d'un TransactionBatch
+
+    Comme pour le CSV, la ligne de débit (ou de crédit) la plus élevée absorbe l'écart.
+
+    Args:
+        batch (TransactionBatch): Lignes d'écritures en colonnes
+
+    Returns:
+        TransactionBatch: Lot corrigé
+    """
+    balance_batch(batch)
+    return batch
+
+
 def validate_fec(export_data):
     """
     Vérifie la validité du FEC généré (équilibre des écritures)
     
     Args:
-        export_data (list): Liste des lignes d'écritures au format FEC
+        export_data (list | TransactionBatch | str): Liste des lignes d'écritures au format FEC,
+            lot en colonnes, ou fichier FEC existant (contrôles de structure en plus, voir
+            utils.fec_reader.validate_fec_file)
         
     Returns:
         tuple: (bool, list) - Validité et liste des erreurs
     """
+    if isinstance(export_data, (str, os.PathLike)):
+        from .fec_reader import validate_fec_file
+        report = validate_fec_file(export_data)
+        return report.valid, [str(error) for error in report.errors]
+
+    if _is_batch(export_data):
+        return validate_batch(export_data)
+    
     errors = []
     
-    # Vérifier l'équilibre des écritures
+    # Vérifier l'équilibre des écritures (en centimes : comparaison exacte)
     ecr_balances = {}
     for row in export_data:
         ecr_key = (row["JournalCode"], row["EcritureNum"])
-        if ecr_key not in ecr_balances:
-            ecr_balances[ecr_key] = 0
-        
-        # Convertir les montants de texte à nombres
-        debit = float(row["Debit"].replace(",", "."))
-        credit = float(row["Credit"].replace(",", "."))
-        
-        ecr_balances[ecr_key] += debit - credit
+        ecr_balances[ecr_key] = ecr_balances.get(ecr_key, 0) + parse_cents(row["Debit"]) - parse_cents(row["Credit"])
     
-    # Vérifier l'équilibre (avec tolérance pour les erreurs d'arrondi)
     for ecr_key, balance in ecr_balances.items():
-        if abs(balance) > 0.01:
-            errors.append(f"Écriture {ecr_key} non équilibrée: {balance}")
+        if balance:
+            errors.append(f"Écriture {ecr_key} non équilibrée: {balance / 100}")
     
     return (len(errors) == 0), errors
 
@@ -40,11 +200,15 @@ def fix_unbalanced_entries(export_data):
     Corrige les écritures non équilibrées dans un FEC (format CSV)
     
     Args:
-        export_data (list): Liste des lignes d'écritures au format FEC
+        export_data (list | TransactionBatch): Liste des lignes d'écritures au format FEC,
+            ou lot en colonnes
         
     Returns:
         list: Liste des lignes d'écritures corrigées
     """
+    if _is_batch(export_data):
+        return fix_unbalanced_batch(export_data)
+    
     # Regrouper les lignes par écriture
     entries = {}
     for row in export_data:
@@ -53,29 +217,17 @@ def fix_unbalanced_entries(export_data):
             entries[key] = []
         entries[key].append(row)
     
-    # Vérifier et corriger l'équilibre de chaque écriture
+    # Vérifier et corriger l'équilibre de chaque écriture (en centimes)
     for key, rows in entries.items():
-        total_debit = sum(float(row["Debit"].replace(",", ".")) for row in rows)
-        total_credit = sum(float(row["Credit"].replace(",", ".")) for row in rows)
-        
-        difference = total_debit - total_credit
+        difference = sum(parse_cents(row["Debit"]) - parse_cents(row["Credit"]) for row in rows)
         
-        if abs(difference) > 0.01:  # Si déséquilibre significatif
+        if difference:
             # Trouver la ligne avec le montant le plus élevé pour ajuster
-            if difference > 0:  # Trop de débit
-                # Trouver la ligne de débit la plus élevée
-                target_rows = [r for r in rows if float(r["Debit"].replace(",", ".")) > 0]
-                if target_rows:
-                    target_row = max(target_rows, key=lambda r: float(r["Debit"].replace(",", ".")))
-                    new_amount = float(target_row["Debit"].replace(",", ".")) - difference
-                    target_row["Debit"] = f"{new_amount:.2f}".replace(".", ",")
-            else:  # Trop de crédit
-                # Trouver la ligne de crédit la plus élevée
-                target_rows = [r for r in rows if float(r["Credit"].replace(",", ".")) > 0]
-                if target_rows:
-                    target_row = max(target_rows, key=lambda r: float(r["Credit"].replace(",", ".")))
-                    new_amount = float(target_row["Credit"].replace(",", ".")) + difference
-                    target_row["Credit"] = f"{new_amount:.2f}".replace(".", ",")
+            column = "Debit" if difference > 0 else "Credit"
+            target_rows = [r for r in rows if parse_cents(r[column]) > 0]
+            if target_rows:
+                target_row = max(target_rows, key=lambda r: parse_cents(r[column]))
+                target_row[column] = format_cents([parse_cents(target_row[column]) - abs(difference)])[0]
     
     return export_data
 
@@ -85,11 +237,15 @@ def fix_unbalanced_entries_excel(export_data):
     Corrige les écritures non équilibrées pour l'export Excel (valeurs numériques)
     
     Args:
-        export_data (list): Liste des lignes d'écritures au format Excel
+        export_data (list | TransactionBatch): Liste des lignes d'écritures au format Excel,
+            ou lot en colonnes
         
     Returns:
         list: Liste des lignes d'écritures corrigées
     """
+    if _is_batch(export_data):
+        return fix_unbalanced_batch(export_data)
+    
     # Regrouper les lignes par écriture
     entries = {}
     for row in export_data:
@@ -98,24 +254,16 @@ def fix_unbalanced_entries_excel(export_data):
             entries[key] = []
         entries[key].append(row)
     
-    # Vérifier et corriger l'équilibre de chaque écriture
+    # Vérifier et corriger l'équilibre de chaque écriture (en centimes)
     for key, rows in entries.items():
-        total_debit = sum(row["Debit"] for row in rows)
-        total_credit = sum(row["Credit"] for row in rows)
-        
-        difference = total_debit - total_credit
+        difference = sum(to_cents(row["Debit"]) - to_cents(row["Credit"]) for row in rows)
         
-        if abs(difference) > 0.01:  # Si déséquilibre significatif
+        if difference:
             # Trouver la ligne avec le montant le plus élevé pour ajuster
-            if difference > 0:  # Trop de débit
-                target_rows = [r for r in rows if r["Debit"] > 0]
-                if target_rows:
-                    target_row = max(target_rows, key=lambda r: r["Debit"])
-                    target_row["Debit"] = target_row["Debit"] - difference
-            else:  # Trop de crédit
-                target_rows = [r for r in rows if r["Credit"] > 0]
-                if target_rows:
-                    target_row = max(target_rows, key=lambda r: r["Credit"])
-                    target_row["Credit"] = target_row["Credit"] + difference
+            column = "Debit" if difference > 0 else "Credit"
+            target_rows = [r for r in rows if r[column] > 0]
+            if target_rows:
+                target_row = max(target_rows, key=lambda r: r[column])
+                target_row[column] = (to_cents(target_row[column]) - abs(difference)) / 100
     
     return export_data
\ No newline at end of file